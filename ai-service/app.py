@@ -1,45 +1,188 @@
 # AI Recommender Service - FastAPI + Gemini AI + FAISS
+import time
+
+# Reported as the import part of the cold start (/health/ready, startup_import_seconds)
+_IMPORT_STARTED = time.perf_counter()
+
 import os
 import re
+import json
+import asyncio
+import importlib
+from contextlib import asynccontextmanager, aclosing
 from pathlib import Path
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
-import httpx
 import numpy as np
 from urllib.parse import quote_plus, urlparse
 import uvicorn
 
-from text_extractor import extract_text_from_url
-from vector_store import VectorStore
+from http_client import get_http_pool, close_http_pool
+from http_cache import HttpCache, configure_http_cache, cached_get
+from text_extractor import (fetch_page, parse_html_async, parse_page_async, extraction_error, shutdown_extractor,
+                            download_stats, TEXT_BUDGET)
+from pipeline import StageGraph, StageLimits
+from cache import TTLCache, SingleFlight
+from url_utils import normalize_url
+from llm_cache import LLMCache
+from embeddings import create_embedding_provider, EmbeddingError
+from near_duplicates import simhash
+from youtube_parser import search_videos, video_title
+from content_index import ContentIndex
+from index_server import IndexClient
+from llm_client import LLMClient, LLMOverloaded, GoogleProvider, OpenRouterProvider
+from job_queue import JobQueue, JobRunner, JobFailed
+from logs import configure_logging, get_logger
+from metrics import REGISTRY, CONTENT_TYPE, stats_gauges
+from profiler import profiler
+from startup import Warmup, module_available
 
 # Load environment variables from parent directory's .env file
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
+# LOG_LEVEL / LOG_FORMAT may come from .env
+configure_logging()
+log = get_logger('app')
+
+# Prometheus metrics served on /metrics (caches, pool and index gauges are collected at scrape time)
+STAGE_SECONDS = REGISTRY.histogram('extract_stage_seconds', '/extract pipeline stage run time', ['stage'])
+STAGE_FAILURES = REGISTRY.counter('extract_stage_failures_total', '/extract pipeline stages that raised', ['stage'])
+LLM_SECONDS = REGISTRY.histogram('llm_call_seconds', 'Analysis LLM call time per provider', ['provider'])
+NEAR_DUPLICATES = REGISTRY.counter('extract_near_duplicates_total', 'Pages answered from a near-duplicate\'s analysis')
+LLM_FAILURES = REGISTRY.counter('llm_call_failures_total', 'Failed analysis LLM calls per provider', ['provider'])
+SEARCH_SECONDS = REGISTRY.histogram('search_seconds', 'Recommendation search call time', ['backend'])
+VECTOR_SEARCH_SECONDS = REGISTRY.histogram('vector_search_seconds', 'Vector index query time (/recommend)')
+HTTP_REQUESTS = REGISTRY.counter('http_requests_total', 'Requests served', ['method', 'route', 'status'])
+HTTP_SECONDS = REGISTRY.histogram('http_request_seconds', 'Request handling time', ['method', 'route'])
+
 # API Keys - supports both Google AI direct and OpenRouter
 GOOGLE_AI_API_KEY = os.getenv("GOOGLE_AI_API_KEY", "")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
 
-# Configure Google Gemini AI if key is available
-if GOOGLE_AI_API_KEY:
-    try:
-        import google.generativeai as genai
+# External service endpoints - overridable so benchmarks can point them at local stubs
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")  # e.g. http://127.0.0.1:9001 (REST transport)
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL", "https://www.youtube.com")
+YOUTUBE_HOSTS = [h.strip() for h in os.getenv("YOUTUBE_HOSTS", "youtube.com,youtu.be").split(",") if h.strip()]
+WEB_SEARCH_URL = os.getenv("WEB_SEARCH_URL", "")  # JSON search endpoint used instead of DuckDuckGo when set
+
+# google-generativeai takes about a second to import - it is loaded and configured while warming up
+if GOOGLE_AI_API_KEY and not module_available('google.generativeai'):
+    log.warning('google_ai_unavailable', reason='google-generativeai not installed')
+    GOOGLE_AI_API_KEY = ""
+
+
+def configure_google_ai():
+    """Import and configure google-generativeai (warm-up step, runs in a worker thread)"""
+    import google.generativeai as genai
+    if GEMINI_API_ENDPOINT:
+        genai.configure(api_key=GOOGLE_AI_API_KEY, transport='rest', client_options={'api_endpoint': GEMINI_API_ENDPOINT})
+    else:
         genai.configure(api_key=GOOGLE_AI_API_KEY)
-        print("✅ Google AI API configured")
-    except ImportError:
-        print("⚠️ google-generativeai not installed, using OpenRouter")
-        GOOGLE_AI_API_KEY = ""
+    log.info('google_ai_configured', endpoint=GEMINI_API_ENDPOINT or 'default')
+
+# Models used for content analysis
+GEMINI_MODEL = 'gemini-2.0-flash'
+OPENROUTER_MODEL = 'google/gemini-2.0-flash-exp:free'
+
+# Local state (caches, snapshots) lives here
+DATA_DIR = Path(os.getenv('DATA_DIR', Path(__file__).parent / 'data'))
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+# Parsed Gemini answers keyed by hash(model, prompt) - repeat content skips the model round-trip
+llm_cache = LLMCache(
+    os.getenv('LLM_CACHE_PATH', str(DATA_DIR / 'llm_cache.db')),
+    ttl=float(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600)),
+    max_bytes=int(float(os.getenv('LLM_CACHE_MAX_MB', 64)) * 1024 * 1024)
+)
+
+# Fetched pages (articles, YouTube watch / search pages), revalidated with ETag / Last-Modified
+# HTTP_CACHE_PATH= (empty) turns it off
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', str(DATA_DIR / 'http_cache.db'))
+http_cache = configure_http_cache(HttpCache(
+    HTTP_CACHE_PATH,
+    max_bytes=int(float(os.getenv('HTTP_CACHE_MAX_MB', 256)) * 1024 * 1024),
+    stale_if_error=float(os.getenv('HTTP_CACHE_STALE_IF_ERROR', 24 * 3600)),
+    heuristic_max=float(os.getenv('HTTP_CACHE_HEURISTIC_MAX', 24 * 3600)),
+    revalidate_timeout=float(os.getenv('HTTP_CACHE_REVALIDATE_TIMEOUT', 5)),
+    override_no_store=os.getenv('HTTP_CACHE_OVERRIDE_NO_STORE', '0') == '1'
+) if HTTP_CACHE_PATH else None)
+# YouTube sends no validators and max-age=0 - keep its pages fresh this long regardless
+# (it also sends no-store: they are only cached at all with HTTP_CACHE_OVERRIDE_NO_STORE=1)
+YOUTUBE_CACHE_TTL = float(os.getenv('YOUTUBE_CACHE_TTL', 3600))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup / shutdown hooks for shared resources
+    The server accepts connections at once (/health/live); the index,
+    models and connection pools load in the background and /health/ready
+    turns 200 when they are done.
+    """
+    get_http_pool()
+    warming = asyncio.create_task(warmup.run(warm_up))
+    yield
+    warming.cancel()
+    await asyncio.gather(warming, return_exceptions=True)
+    await job_runner.stop()
+    job_queue.close()
+    for task in background_tasks:
+        task.cancel()
+    if content_index is not None:
+        await content_index.close()
+    shutdown_extractor()
+    search_cache.close()
+    llm_cache.close()
+    llm_client.close()
+    if http_cache is not None:
+        http_cache.close()
+    await close_http_pool()
+
 
 # FastAPI app initialization
 app = FastAPI(
     title="AI Recommender Service",
     description="AI-powered content analysis and recommendation system using Gemini AI and FAISS",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+# Answered while warming up: probes, metrics, API docs and the profiler
+UNGATED_PATHS = ('/health', '/metrics', '/docs', '/redoc', '/openapi.json', '/admin/profiler')
+
+
+@app.middleware("http")
+async def wait_until_ready(request, call_next):
+    """Hold other requests until warm-up is done - 503 when it takes longer than WARMUP_WAIT or failed"""
+    if not warmup.ready and not request.url.path.startswith(UNGATED_PATHS):
+        if not await warmup.wait(WARMUP_WAIT):
+            return JSONResponse({'detail': f'Service is {warmup.status}'}, status_code=503,
+                                headers={'Retry-After': '5'})
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """Count and time every request by route template (not raw path, to keep label cardinality bounded)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        path = route.path if route is not None else 'unmatched'
+        HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, route=path)
+        HTTP_REQUESTS.inc(method=request.method, route=path, status=status)
+
+
 # CORS configuration - allows all origins
 app.add_middleware(
     CORSMiddleware,
@@ -55,6 +198,11 @@ class ExtractRequest(BaseModel):
     url: str
 
 
+class JobRequest(BaseModel):
+    url: str
+    priority: int = 0
+
+
 class HealthResponse(BaseModel):
     status: str
 
@@ -66,6 +214,8 @@ class RecommendationItem(BaseModel):
     snippet: Optional[str] = None
     videoId: Optional[str] = None
     thumbnail: Optional[str] = None
+    duration: Optional[str] = None
+    channel: Optional[str] = None
 
 
 class Recommendations(BaseModel):
@@ -82,55 +232,68 @@ class ExtractResponse(BaseModel):
     recommendations: Recommendations
 
 
+class RecommendRequest(BaseModel):
+    url: Optional[str] = None
+    text: Optional[str] = None
+    k: int = 10
+    category: Optional[str] = None
+    is_youtube: Optional[bool] = None
+
+
+class SimilarItem(BaseModel):
+    id: int
+    url: str
+    title: str
+    summary: Optional[str] = None
+    category: Optional[str] = None
+    keywords: Optional[str] = None
+    is_youtube: bool = False
+    score: float
+
+
 class RecommendResponse(BaseModel):
-    message: str
+    recommendations: list[SimilarItem]
+    took_ms: float
 
 
-async def call_gemini(prompt: str) -> str:
-    """Call Gemini AI - tries Google AI first, falls back to OpenRouter"""
-    
-    # Try Google AI first
-    if GOOGLE_AI_API_KEY:
-        try:
-            import google.generativeai as genai
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            print(f"⚠️ Google AI error: {e}, trying OpenRouter...")
-    
-    # Fallback to OpenRouter
-    if OPENROUTER_API_KEY:
-        try:
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            data = {
-                "model": "google/gemini-2.0-flash-exp:free",
-                "messages": [{"role": "user", "content": prompt}]
-            }
-            
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(url, headers=headers, json=data)
-                result = response.json()
-            
-            if 'choices' in result:
-                return result['choices'][0]['message']['content']
-            elif 'error' in result:
-                raise Exception(result['error'].get('message', str(result['error'])))
-        except Exception as e:
-            print(f"❌ OpenRouter error: {e}")
-            raise
-    
-    raise Exception("No AI API key configured. Set GOOGLE_AI_API_KEY or OPENROUTER_API_KEY in .env")
+class BatchExtractRequest(BaseModel):
+    urls: list[str]
+    concurrency: int = 8
+    fetch_concurrency: Optional[int] = None
+    llm_concurrency: Optional[int] = None
+    search_concurrency: Optional[int] = None
+
+
+def record_llm_call(provider: str, seconds: float, ok: bool):
+    LLM_SECONDS.observe(seconds, provider=provider)
+    if not ok:
+        LLM_FAILURES.inc(provider=provider)
+
+
+# Analysis LLMs in preference order - Google AI direct, then OpenRouter (fallback and hedge)
+llm_providers = []
+if GOOGLE_AI_API_KEY:
+    # The custom endpoint uses the REST transport, which has no async client
+    llm_providers.append(GoogleProvider(GEMINI_MODEL, native_async=not GEMINI_API_ENDPOINT,
+                                        max_workers=int(os.getenv('LLM_MAX_CONCURRENCY', 16))))
+if OPENROUTER_API_KEY:
+    llm_providers.append(OpenRouterProvider(OPENROUTER_API_URL, OPENROUTER_API_KEY, OPENROUTER_MODEL))
+llm_client = LLMClient.from_env(llm_providers, observer=record_llm_call)
+LLM_CHAIN = ' | '.join(provider.model_name for provider in llm_providers)
+
+
+async def call_gemini(prompt: str) -> tuple[str, str]:
+    """
+    Call Gemini AI - Google AI first, OpenRouter on failure or once Google is slower than usual
+    Returns (answer text, model that answered)
+    """
+    return await llm_client.answer(prompt)
 
 
 # YouTube URL detection
 def is_youtube_url(url: str) -> bool:
     parsed = urlparse(url)
-    return any(h in parsed.netloc for h in ['youtube.com', 'youtu.be'])
+    return any(h in parsed.netloc for h in YOUTUBE_HOSTS)
 
 
 async def get_youtube_video_title(url: str) -> Optional[str]:
@@ -138,172 +301,353 @@ async def get_youtube_video_title(url: str) -> Optional[str]:
     try:
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, headers=headers)
-        
-        # Try multiple patterns to find the title
-        patterns = [
-            r'<title>([^<]+)</title>',
-            r'"title":"([^"]+)"',
-            r'<meta name="title" content="([^"]+)"',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, response.text)
-            if match:
-                title = match.group(1)
-                # Clean up the title
-                title = title.replace(' - YouTube', '').strip()
-                if title and len(title) > 5:
-                    return title
-        
-        return None
+        response = await cached_get(url, headers=headers, timeout=10.0, min_fresh=YOUTUBE_CACHE_TTL)
+        return video_title(response.text)
     except:
         return None
 
 
-# DuckDuckGo article search
-def search_web(query: str, num_results: int = 6) -> list[dict]:
-    try:
-        from duckduckgo_search import DDGS
-        
-        print(f'🔍 Searching web for: {query}')
+# DuckDuckGo results cache - popular topics produce the same keywords over and over
+search_cache = TTLCache(
+    'search',
+    max_size=int(os.getenv('SEARCH_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('SEARCH_CACHE_TTL', 6 * 3600)),
+    stale_ttl=float(os.getenv('SEARCH_CACHE_STALE_TTL', 7 * 24 * 3600)),
+    disk_path=os.getenv('SEARCH_CACHE_PATH') or None
+)
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a search query - case, punctuation and spacing insensitive"""
+    return ' '.join(re.sub(r'[^\w\s-]', ' ', query.lower()).split())
+
+
+async def _raw_search_results(query: str, max_results: int):
+    """DuckDuckGo text results ({title, href, body}), or the WEB_SEARCH_URL endpoint's when configured"""
+    if WEB_SEARCH_URL:
+        response = await get_http_pool().get(WEB_SEARCH_URL, params={'q': query, 'max_results': max_results}, timeout=10.0)
+        response.raise_for_status()
+        for r in response.json():
+            yield r
+        return
+
+    from duckduckgo_search import AsyncDDGS
+    async with AsyncDDGS() as ddgs:
+        # Simple search - let DuckDuckGo choose the best results
+        async for r in ddgs.text(query, max_results=max_results):
+            yield r
+
+
+async def _search_web_uncached(query: str, num_results: int) -> list[dict]:
+    log.debug('web_search', query=query)
+    
+    # List of domains to exclude (spam, cheat, non-English sites)
+    excluded_domains = ['artificialaiming', 'aimbot', 'cheat', 'hack', 'csdn.net', 'zhihu.com', 'baidu.com', 'justwatch', 'moviepilot']
+    
+    results = []
+    start = time.perf_counter()
+    # aclosing: leaving the loop early still closes the DuckDuckGo session
+    async with aclosing(_raw_search_results(query, num_results + 12)) as raw_results:
+        async for r in raw_results:
+            url = r.get('href', '').lower()
+            title = r.get('title', '')
         
-        # List of domains to exclude (spam, cheat, non-English sites)
-        excluded_domains = ['artificialaiming', 'aimbot', 'cheat', 'hack', 'csdn.net', 'zhihu.com', 'baidu.com', 'justwatch', 'moviepilot']
+            # Filter out excluded domains  
+            is_excluded = any(domain in url for domain in excluded_domains)
         
-        results = []
-        with DDGS() as ddgs:
-            # Simple search - let DuckDuckGo choose the best results
-            for r in ddgs.text(query, max_results=num_results + 12):
-                url = r.get('href', '').lower()
-                title = r.get('title', '')
-                
-                # Filter out excluded domains  
-                is_excluded = any(domain in url for domain in excluded_domains)
-                
-                if url and title and len(title) > 10 and not is_excluded:
-                    results.append({
-                        'title': r.get('title', ''),
-                        'url': r.get('href', ''),
-                        'snippet': r.get('body', '')[:200],
-                        'type': 'article'
-                    })
-                
-                if len(results) >= num_results:
-                    break
+            if url and title and len(title) > 10 and not is_excluded:
+                results.append({
+                    'title': r.get('title', ''),
+                    'url': r.get('href', ''),
+                    'snippet': r.get('body', '')[:200],
+                    'type': 'article'
+                })
         
-        print(f'✅ Found {len(results)} web results')
-        return results
+            if len(results) >= num_results:
+                break
+    
+    SEARCH_SECONDS.observe(time.perf_counter() - start, backend='web')
+    log.debug('web_search_done', query=query, results=len(results))
+    return results
+
+
+# DuckDuckGo article search (async, cached)
+async def search_web(query: str, num_results: int = 6) -> list[dict]:
+    try:
+        key = f'{num_results}:{normalize_query(query)}'
+        # No results is as likely a silent DuckDuckGo throttle as a real answer - don't pin it for hours
+        return await search_cache.get_or_load(key, lambda: _search_web_uncached(query, num_results), keep=bool)
     except Exception as e:
-        print(f'❌ Web search error: {e}')
+        log.warning('web_search_failed', query=query, error=str(e))
         return []
 
 
 # YouTube video search (async)
 async def search_youtube(query: str, num_results: int = 6) -> list[dict]:
     try:
-        search_url = f"https://www.youtube.com/results?search_query={quote_plus(query)}"
+        search_url = f"{YOUTUBE_BASE_URL}/results?search_query={quote_plus(query)}"
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
         
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(search_url, headers=headers)
-        
-        results = []
-        video_ids = re.findall(r'"videoId":"([a-zA-Z0-9_-]{11})"', response.text)
-        titles = re.findall(r'"title":\{"runs":\[\{"text":"([^"]+)"\}', response.text)
+        with SEARCH_SECONDS.time(backend='youtube'):
+            response = await cached_get(search_url, headers=headers, timeout=10.0, min_fresh=YOUTUBE_CACHE_TTL)
         
-        seen = set()
-        for i, vid in enumerate(video_ids[:30]):
-            if vid not in seen and len(results) < num_results:
-                seen.add(vid)
-                title = titles[i] if i < len(titles) else "Video"
-                results.append({
-                    'title': title,
-                    'url': f'https://www.youtube.com/watch?v={vid}',
-                    'type': 'youtube',
-                    'videoId': vid,
-                    'thumbnail': f'https://img.youtube.com/vi/{vid}/mqdefault.jpg'
-                })
-        
-        return results
+        return [
+            {
+                'title': video['title'] or 'Video',
+                'url': f"{YOUTUBE_BASE_URL}/watch?v={video['videoId']}",
+                'type': 'youtube',
+                'videoId': video['videoId'],
+                'thumbnail': f"https://img.youtube.com/vi/{video['videoId']}/mqdefault.jpg",
+                'duration': video['duration'],
+                'channel': video['channel']
+            }
+            for video in search_videos(response.text, num_results)
+        ]
     except Exception as e:
-        print(f'❌ YouTube search error: {e}')
+        log.warning('youtube_search_failed', query=query, error=str(e))
         return []
 
 
-# Generate 768D vector embedding
+# Embedding backend ('hashing' local or 'gemini') behind a persistent content-hash cache
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'hashing')
+embedding_options = {
+    'hashing': {
+        'ngram_range': (1, int(os.getenv('EMBEDDING_MAX_NGRAM', 1))),
+        'tf': os.getenv('EMBEDDING_TF', 'raw')
+    }
+}.get(EMBEDDING_BACKEND, {})
+embedding_provider = create_embedding_provider(
+    EMBEDDING_BACKEND,
+    cache_dir=DATA_DIR / 'embedding_cache' if os.getenv('EMBEDDING_CACHE', '1') == '1' else None,
+    cache_max_vectors=int(os.getenv('EMBEDDING_CACHE_MAX_VECTORS', 100_000)),
+    **embedding_options
+)
+
+
+# Generate 768D vector embedding (raises EmbeddingError instead of returning a zero vector)
 def generate_embedding(text: str) -> np.ndarray:
-    words = text.lower().split()[:500]
-    embedding = np.zeros(768, dtype='float32')
-    for word in words:
-        idx = hash(word) % 768
-        embedding[idx] += 1
-    norm = np.linalg.norm(embedding)
-    if norm > 0:
-        embedding = embedding / norm
-    return embedding
+    return embedding_provider.embed_documents([text])[0]
+
+
+# Vector index + analysed-page records: in-process, or one index server shared by every worker
+# (uvicorn --workers N must use INDEX_SOCKET - workers would otherwise each keep a partial index)
+INDEX_SOCKET = os.getenv('INDEX_SOCKET', '')
+VECTOR_SNAPSHOT_INTERVAL = float(os.getenv('VECTOR_SNAPSHOT_INTERVAL', 300))
+if INDEX_SOCKET:
+    content_index = IndexClient(INDEX_SOCKET, connections=int(os.getenv('INDEX_CONNECTIONS', 8)))
+else:
+    # Loaded while warming up - reading snapshots and replaying the WAL is most of a cold start
+    content_index = None
 
+# Near-duplicate pages (syndicated / mirrored articles) reuse an earlier page's analysis and recommendations
+NEAR_DUP_MAX_DISTANCE = int(os.getenv('NEAR_DUP_MAX_DISTANCE', 6))  # SimHash bits; -1 disables
+NEAR_DUP_MIN_WORDS = int(os.getenv('NEAR_DUP_MIN_WORDS', 50))
 
-# Initialize FAISS vector store
-vector_store = VectorStore(dimension=768)
-content_database = {}
+
+def content_fingerprint(content: str) -> Optional[int]:
+    """SimHash of the analysis input, or None when it is too short to compare reliably (e.g. a video title)"""
+    if NEAR_DUP_MAX_DISTANCE < 0 or len(content.split()) < NEAR_DUP_MIN_WORDS:
+        return None
+    return simhash(content)
+
+
+async def find_near_duplicate(url: str, fingerprint: Optional[int]) -> Optional[dict]:
+    """Stored record of an earlier page with (almost) the same content, if any"""
+    if fingerprint is None:
+        return None
+    match = await content_index.find_duplicate(url, fingerprint)
+    if match is None:
+        return None
+    record, distance = match
+    log.info('near_duplicate', url=url, duplicate_of=record['url'], distance=distance)
+    return record
+
+
+# Finished /extract payloads per normalized URL, plus one in-flight computation per URL
+response_cache = TTLCache(
+    'response',
+    max_size=int(os.getenv('RESPONSE_CACHE_SIZE', 2048)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 3600)),
+    max_bytes=int(float(os.getenv('RESPONSE_CACHE_MAX_MB', 32)) * 1024 * 1024)
+)
+extract_flight = SingleFlight()
 
 
 @app.get("/health", response_model=HealthResponse)
+@app.get("/health/live", response_model=HealthResponse)
 async def health():
-    """Health check endpoint"""
+    """Liveness - answers while warming up; 503 once warm-up failed (restart the process)"""
+    if warmup.status == 'failed':
+        raise HTTPException(status_code=503, detail=warmup.errors)
     return {"status": "ok"}
 
 
-# Main API endpoint
-@app.post("/extract", response_model=ExtractResponse)
-async def extract(request: ExtractRequest):
-    """Extract content from URL and get AI-powered recommendations"""
-    try:
-        url = request.url
-        
-        if not url:
-            raise HTTPException(status_code=400, detail="URL is required")
-        
-        print(f'📥 Analyzing: {url}')
-        
-        # Check if it's a YouTube video
-        is_youtube = is_youtube_url(url)
-        youtube_title = None
-        
-        if is_youtube:
-            print('📺 Detected YouTube video')
-            youtube_title = await get_youtube_video_title(url)
-            print(f'📺 Video title: {youtube_title}')
-        
-        # STEP 1: Extract content using BeautifulSoup web scraper
-        extracted = extract_text_from_url(url)
-        
-        # For YouTube, use the video title as primary content
-        if is_youtube and youtube_title:
-            content_for_analysis = f"YouTube Video: {youtube_title}"
-            search_query = youtube_title
-        else:
-            content_for_analysis = extracted['text'][:3000] if extracted['text'] else extracted['title']
-            search_query = None
-        
-        if not content_for_analysis or len(content_for_analysis) < 10:
-            raise HTTPException(status_code=400, detail="Could not extract content from URL")
-        
-        # STEP 2: Call Gemini AI for analysis & keyword extraction
-        print('🤖 Generating analysis...')
-        
-        if is_youtube and youtube_title:
-            prompt = f"""This is a YouTube video titled: "{youtube_title}"
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness - 200 once the index, models and connection pools are warm, 503 (with progress) until then"""
+    stats = warmup.stats()
+    if not warmup.ready:
+        return JSONResponse(stats, status_code=503)
+    return stats
+
+
+@app.get("/admin/search-cache")
+async def search_cache_stats():
+    """Web search cache size and hit / miss counters"""
+    return search_cache.stats()
+
+
+@app.get("/admin/response-cache")
+async def response_cache_stats():
+    """Whole-response cache and single-flight stats for /extract"""
+    return {**response_cache.stats(), 'single_flight': extract_flight.stats()}
+
+
+@app.get("/admin/llm-cache")
+async def llm_cache_info(limit: int = 50, offset: int = 0):
+    """LLM cache stats plus the most recently used entries"""
+    stats = await asyncio.to_thread(llm_cache.stats)
+    return {**stats, 'items': await asyncio.to_thread(llm_cache.entries, limit, offset)}
+
+
+@app.delete("/admin/llm-cache")
+async def llm_cache_purge(key: Optional[str] = None, expired_only: bool = False):
+    """Purge one entry (?key=), expired entries (?expired_only=true) or the whole LLM cache"""
+    removed = await asyncio.to_thread(llm_cache.purge, key, expired_only)
+    return {'removed': removed}
+
+
+@app.get("/admin/vector-store")
+async def vector_store_stats():
+    """Vector count, removed slots, current index tier and snapshot generation (plus index server counters)"""
+    stats = await content_index.stats()
+    return {**stats['vector_store'], **({'index_server': stats['index_server']} if 'index_server' in stats else {})}
+
+
+@app.post("/admin/vector-store/compact")
+async def vector_store_compact():
+    """Rebuild the index without removed vectors (runs in the background)"""
+    return await content_index.compact()
+
+
+@app.get("/admin/http-cache")
+async def http_cache_stats():
+    """Fetched-page cache stats (fresh hits, 304 revalidations, stale-if-error serves)"""
+    if http_cache is None:
+        return {'enabled': False}
+    return {'enabled': True, **http_cache.stats()}
+
+
+@app.delete("/admin/http-cache")
+async def http_cache_purge(url: Optional[str] = None):
+    """Drop one cached URL, or the whole cache"""
+    if http_cache is None:
+        return {'removed': 0}
+    return {'removed': http_cache.purge(url)}
+
+
+@app.get("/admin/downloads")
+async def downloads_stats():
+    """Page download budget stats (early stops, byte-cap truncations, bytes saved)"""
+    return download_stats.stats()
+
+
+# Index stats fetched (possibly from the index server) just before each scrape
+index_stats = {}
+
+
+@REGISTRY.collector
+def service_gauges():
+    """Cache hit rates, index size, download budget and connection pool state, read at scrape time"""
+    yield from stats_gauges('search_cache', search_cache.stats(), 'DuckDuckGo result cache')
+    yield from stats_gauges('response_cache', response_cache.stats(), '/extract response cache')
+    yield from stats_gauges('extract_single_flight', extract_flight.stats(), '/extract single-flight')
+    yield from stats_gauges('llm_cache', llm_cache.stats(), 'LLM analysis cache')
+    llm = llm_client.stats()
+    yield from stats_gauges('llm_client', llm, 'Analysis LLM client')
+    for field in ('rate_waits', 'hedge_after', 'samples'):
+        yield (f'llm_provider_{field}', f'Analysis LLM provider {field}',
+               [({'provider': name}, provider[field]) for name, provider in llm['providers'].items()
+                if provider[field] is not None])
+    if http_cache is not None:
+        yield from stats_gauges('http_cache', http_cache.stats(), 'Fetched-page cache')
+    embedding_cache = getattr(embedding_provider, 'cache', None)
+    if embedding_cache is not None:
+        yield from stats_gauges('embedding_cache', embedding_cache.stats(), 'Embedding cache')
+    yield from stats_gauges('page_download', download_stats.stats(), 'Page download budget')
+    yield from stats_gauges('vector_store', index_stats.get('vector_store', {}), 'Vector store')
+    yield from stats_gauges('near_duplicates', index_stats.get('near_duplicates', {}), 'Near-duplicate index')
+    yield from stats_gauges('index_server', index_stats.get('index_server', {}), 'Shared index server')
+    yield from stats_gauges('job_queue', job_queue.stats(), 'Extract job queue')
+    yield from stats_gauges('job_runner', job_runner.stats(), 'Extract job workers (this process)')
+    pool = get_http_pool().stats()
+    yield from stats_gauges('http_pool', pool, 'Outbound HTTP pool')
+    for field in ('requests', 'connections', 'errors'):
+        yield (f'http_pool_host_{field}', f'Outbound HTTP pool {field} per host',
+               [({'host': host}, counts[field]) for host, counts in pool['hosts'].items()])
+    startup = warmup.stats()
+    yield from stats_gauges('startup', startup, 'Cold start')
+    yield ('startup_step_seconds', 'Warm-up step time',
+           [({'step': step}, seconds) for step, seconds in startup['steps'].items()])
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition"""
+    if warmup.ready:
+        index_stats.update(await content_index.stats())
+    # Collectors query SQLite and take store locks - keep them off the event loop
+    return Response(await asyncio.to_thread(REGISTRY.render), headers={'Content-Type': CONTENT_TYPE})
+
+
+@app.post("/admin/profiler/start")
+async def profiler_start(interval_ms: float = 5.0, seconds: Optional[float] = None):
+    """Start the sampling profiler (replaces the previous profile); stops by itself after `seconds`"""
+    started = profiler.start(interval=interval_ms / 1000, duration=seconds)
+    if started:
+        log.info('profiler_started', interval_ms=interval_ms, seconds=seconds)
+    return {'started': started, **profiler.report(limit=0)}
+
+
+@app.post("/admin/profiler/stop")
+async def profiler_stop(limit: int = 30):
+    """Stop sampling and return the hottest functions"""
+    report = await asyncio.to_thread(profiler.stop)
+    log.info('profiler_stopped', samples=report['samples'])
+    return profiler.report(limit=limit)
+
+
+@app.get("/admin/profiler")
+async def profiler_report(limit: int = 30, collapsed: bool = False):
+    """Current profile: top functions, or collapsed stacks (flamegraph.pl / speedscope input)"""
+    if collapsed:
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.report(limit=limit)
+
+
+@app.get("/admin/llm")
+async def llm_stats():
+    """Analysis LLM client: admission queue, rate-limit waits, fallbacks, hedges and per-provider hedge delay"""
+    return llm_client.stats()
+
+
+@app.get("/admin/http-pool")
+async def http_pool_stats():
+    """Outbound connection pool stats (requests, new connections, reuse ratio per host)"""
+    return get_http_pool().stats()
+
+
+def build_analysis_prompt(content_for_analysis: str, youtube_title: Optional[str]) -> str:
+    """Prompt asking Gemini for TITLE / SUMMARY / CATEGORY / KEYWORDS"""
+    if youtube_title:
+        return f"""This is a YouTube video titled: "{youtube_title}"
 
 Analyze what this video is about and provide:
 TITLE: [the video title, cleaned up, max 80 chars]
 SUMMARY: [brief description of what this video is likely about, max 150 chars]
 CATEGORY: [one of: Music, Dance, Gaming, Education, Entertainment, News, Sports, Technology, Comedy, Other]
 KEYWORDS: [5 specific search terms to find similar videos - focus on the main topic, artist, or content type]"""
-        else:
-            prompt = f"""Analyze this content:
+    return f"""Analyze this content:
 
 {content_for_analysis}
 
@@ -312,101 +656,512 @@ TITLE: [short descriptive title, max 80 chars]
 SUMMARY: [brief summary, max 150 chars]
 CATEGORY: [one of: Technology, News, Entertainment, Education, Science, Business, Health, Sports, Music, Other]
 KEYWORDS: [Write a single specific search query (3-6 words) to find similar articles. Be very specific - include the main topic. For example: "machine learning neural networks tutorial" or "climate change effects research". Do NOT use generic words like "article" or "information".]"""
-        
-        ai_response = await call_gemini(prompt)
-        
-        title = youtube_title or extracted['title']
-        summary = 'Content analyzed'
-        category = 'General'
-        keywords = ''
-        
-        for line in ai_response.split('\n'):
-            if 'TITLE:' in line:
-                title = line.split('TITLE:')[1].strip().strip('*').strip('"')
-            elif 'SUMMARY:' in line:
-                summary = line.split('SUMMARY:')[1].strip().strip('*').strip('"')
-            elif 'CATEGORY:' in line:
-                category = line.split('CATEGORY:')[1].strip().strip('*').strip('"')
-            elif 'KEYWORDS:' in line:
-                keywords = line.split('KEYWORDS:')[1].strip().strip('*').strip('"')
-        
-        print(f'🏷️ Keywords from AI: {keywords}')
-        print(f'📂 Category: {category}')
-        
-        # Build better search query - use keywords + category for context
-        if not search_query:
-            # For articles: use keywords with category context
-            if keywords and len(keywords) > 5:
-                # Clean up keywords - remove brackets, extra punctuation
-                clean_keywords = keywords.replace('[', '').replace(']', '').replace('"', '').strip()
-                search_query = f"{clean_keywords}"
-            else:
-                # Fallback to title + category
-                search_query = f"{title[:50]} {category}"
+
+
+def parse_analysis(ai_response: str) -> dict:
+    """Parse the TITLE / SUMMARY / CATEGORY / KEYWORDS lines of a Gemini answer (only fields present)"""
+    analysis = {}
+    
+    for line in ai_response.split('\n'):
+        for field in ('TITLE', 'SUMMARY', 'CATEGORY', 'KEYWORDS'):
+            if f'{field}:' in line:
+                analysis[field.lower()] = line.split(f'{field}:')[1].strip().strip('*').strip('"')
+                break
+    
+    return analysis
+
+
+async def analyze_content(prompt: str, default_title: str) -> dict:
+    """Gemini analysis of a prompt, served from the LLM cache when the prompt was seen before"""
+    # Keyed on the whole provider chain - any of its models may answer (fallback, hedge)
+    key = LLMCache.key(LLM_CHAIN, prompt)
+    
+    # SQLite reads and writes (hit counts, eviction) stay off the event loop
+    parsed = await asyncio.to_thread(llm_cache.get, key)
+    if parsed is None:
+        answer, model = await call_gemini(prompt)
+        parsed = parse_analysis(answer)
+        # An answer without any of the fields is not worth keeping for the whole TTL
+        if parsed:
+            await asyncio.to_thread(llm_cache.set, key, model, parsed)
+    else:
+        log.debug('llm_cache_hit', chain=LLM_CHAIN)
+    
+    return {
+        'title': default_title,
+        'summary': 'Content analyzed',
+        'category': 'General',
+        'keywords': '',
+        **parsed
+    }
+
+
+def build_search_query(analysis: dict, youtube_title: Optional[str]) -> str:
+    """Search query for related content - AI keywords first, title as fallback"""
+    keywords = analysis['keywords']
+    if keywords and len(keywords) > 5:
+        # Clean up keywords - remove brackets, extra punctuation
+        return keywords.replace('[', '').replace(']', '').replace('"', '').strip()
+    if youtube_title:
+        return youtube_title
+    # Fallback to title + category
+    return f"{analysis['title'][:50]} {analysis['category']}"
+
+
+def record_stage_metrics(stage: str, seconds: float, ok: bool):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if not ok:
+        STAGE_FAILURES.inc(stage=stage)
+
+
+# Callbacks fn(stage, seconds, ok) told about every /extract stage run (metrics, benchmarks)
+STAGE_OBSERVERS = [record_stage_metrics]
+
+
+def observe_stage(stage: str, seconds: float, ok: bool):
+    for observer in STAGE_OBSERVERS:
+        observer(stage, seconds, ok)
+
+
+async def run_extract_pipeline(url: str, limits: Optional[StageLimits] = None) -> dict:
+    """
+    /extract as a dependency graph of stages:
+
+        page ─┬─ youtube_title ─┐
+              └─────────────────┴─ extracted ─ content ─┬─ duplicate ─ analysis ─┬─ recommendations ─┬─ reuse
+                                                        └─ embedding ────────────┴─ store ───────────┘
+
+    The page is downloaded once and shared by the title and text
+    extractors; the embedding overlaps the Gemini call, and storing it
+    overlaps the recommendation search (whose results are attached to the
+    stored record afterwards, for near-duplicate reuse). A page whose content is a near duplicate of
+    one already stored reuses that page's analysis and recommendations
+    instead of calling the LLM and searching. `limits` caps how many runs
+    may be in the fetch / llm / search stages at once.
+    """
+    limits = limits or StageLimits()
+    is_youtube = is_youtube_url(url)
+    if is_youtube:
+        log.debug('youtube_detected', url=url)
+
+    async def page():
+        # One download for every consumer; a failed fetch degrades to metadata-only extraction
+        try:
+            async with limits.limit('fetch'):
+                # Articles are parsed while streaming and stop downloading once there is enough text
+                return await fetch_page(url, extract=not is_youtube, min_fresh=YOUTUBE_CACHE_TTL if is_youtube else 0), None
+        except Exception as e:
+            return None, e
+
+    async def youtube_title(page):
+        response, _ = page
+        if not is_youtube or response is None:
+            return None
+        title = video_title(response.text)
+        log.debug('youtube_title', url=url, title=title)
+        return title
+
+    async def extracted(page, youtube_title):
+        response, error = page
+        if youtube_title:
+            # The video title is the analysis input - skip the full-page parse
+            return {'text': '', 'title': youtube_title, 'url': url}
+        if response is None:
+            return extraction_error(url, error)
+        return await parse_page_async(response, url)
+
+    async def content(youtube_title, extracted):
+        # For YouTube, use the video title as primary content
+        if youtube_title:
+            content_for_analysis = f"YouTube Video: {youtube_title}"
         else:
-            # For YouTube, enhance with AI keywords
-            if keywords and len(keywords) > 5:
-                clean_keywords = keywords.replace('[', '').replace(']', '').replace('"', '').strip()
-                search_query = clean_keywords
-            else:
-                search_query = youtube_title
+            content_for_analysis = extracted['text'][:TEXT_BUDGET] if extracted['text'] else extracted['title']
         
-        print(f'🔍 Final search query: {search_query}')
+        if not content_for_analysis or len(content_for_analysis) < 10:
+            raise HTTPException(status_code=400, detail="Could not extract content from URL")
+        return content_for_analysis
+
+    async def duplicate(content):
+        fingerprint = content_fingerprint(content)
+        return fingerprint, await find_near_duplicate(url, fingerprint)
+
+    async def analysis(content, youtube_title, extracted, duplicate):
+        _, original = duplicate
+        if original is not None:
+            NEAR_DUPLICATES.inc()
+            return {field: original[field] for field in ('title', 'summary', 'category', 'keywords')}
+        # Call Gemini AI for analysis & keyword extraction
+        try:
+            async with limits.limit('llm'):
+                result = await analyze_content(build_analysis_prompt(content, youtube_title), youtube_title or extracted['title'])
+        except LLMOverloaded as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        log.debug('analysis_done', url=url, category=result['category'], keywords=result['keywords'])
+        return result
+
+    async def embedding(content):
+        # Off the event loop - the Gemini backend is a blocking network call
+        try:
+            return await asyncio.to_thread(generate_embedding, content)
+        except EmbeddingError as e:
+            log.warning('embedding_failed', url=url, error=str(e))
+            return None
+
+    async def recommendations(analysis, youtube_title, duplicate):
+        _, original = duplicate
+        if original is not None and original.get('recommendations'):
+            return original['recommendations']
+        search_query = build_search_query(analysis, youtube_title)
+        log.debug('recommendation_search', url=url, query=search_query)
         
-        # STEP 3: Search for related content (DuckDuckGo or YouTube)
+        # Search for related content (DuckDuckGo or YouTube)
         if is_youtube:
             # For YouTube videos, only search for similar videos
-            youtube_results = await search_youtube(search_query, num_results=6)
-            web_results = []
-            print(f'📺 Found {len(youtube_results)} similar videos')
-        else:
-            # For articles, only search for similar articles
-            web_results = search_web(search_query, num_results=6)
-            youtube_results = []
-            print(f'📰 Found {len(web_results)} similar articles')
-        
-        # STEP 4: Generate embedding & store in FAISS vector database
-        embedding = generate_embedding(content_for_analysis)
-        content_id = vector_store.add(embedding, url)
-        content_database[url] = {
-            'id': content_id,
-            'title': title,
-            'summary': summary,
-            'category': category,
-            'keywords': keywords,
-            'is_youtube': is_youtube
+            async with limits.limit('search'):
+                youtube_results = await search_youtube(search_query, num_results=6)
+            log.debug('recommendations_found', url=url, kind='youtube', count=len(youtube_results))
+            return {'articles': [], 'youtube': youtube_results}
+        # For articles, only search for similar articles
+        async with limits.limit('search'):
+            web_results = await search_web(search_query, num_results=6)
+        log.debug('recommendations_found', url=url, kind='article', count=len(web_results))
+        return {'articles': web_results, 'youtube': []}
+
+    async def store(embedding, analysis, duplicate):
+        if embedding is None:
+            return None
+        # Store embedding in FAISS vector database - replaces any earlier vector for this URL
+        fingerprint, _ = duplicate
+        record = {
+            'url': url,
+            **analysis,
+            'is_youtube': is_youtube,
+            'simhash': f'{fingerprint:016x}' if fingerprint is not None else None
         }
+        return await content_index.add(url, embedding, record)
+
+    async def reuse(store, recommendations):
+        # Near duplicates of this page get its recommendations without searching again
+        if store is not None:
+            await content_index.attach(url, {'recommendations': recommendations})
+
+    graph = StageGraph(observer=observe_stage if STAGE_OBSERVERS else None)
+    graph.stage('page', page)
+    graph.stage('youtube_title', youtube_title, deps=['page'])
+    graph.stage('extracted', extracted, deps=['page', 'youtube_title'])
+    graph.stage('content', content, deps=['youtube_title', 'extracted'])
+    graph.stage('duplicate', duplicate, deps=['content'])
+    graph.stage('analysis', analysis, deps=['content', 'youtube_title', 'extracted', 'duplicate'])
+    graph.stage('embedding', embedding, deps=['content'])
+    graph.stage('recommendations', recommendations, deps=['analysis', 'youtube_title', 'duplicate'])
+    graph.stage('store', store, deps=['embedding', 'analysis', 'duplicate'])
+    graph.stage('reuse', reuse, deps=['store', 'recommendations'])
+    results = await graph.run()
+
+    return {
+        **results['analysis'],
+        'contentType': 'youtube' if is_youtube else 'article',
+        'recommendations': results['recommendations']
+    }
+
+
+async def extract_cached(url: str, limits: Optional[StageLimits] = None) -> dict:
+    """
+    run_extract_pipeline behind single-flight and the response cache:
+    concurrent requests for one URL share a single computation
+    The normalized URL is only the cache key - the page fetched (and stored) is the one submitted
+    """
+    key = normalize_url(url)
+    return await extract_flight.do(
+        key, lambda: response_cache.get_or_load(key, lambda: run_extract_pipeline(url, limits))
+    )
+
+
+# Main API endpoint
+@app.post("/extract", response_model=ExtractResponse)
+async def extract(request: ExtractRequest):
+    """Extract content from URL and get AI-powered recommendations"""
+    try:
+        url = request.url
         
-        return {
-            'title': title,
-            'summary': summary,
-            'category': category,
-            'keywords': keywords,
-            'contentType': 'youtube' if is_youtube else 'article',
-            'recommendations': {
-                'articles': web_results,
-                'youtube': youtube_results
-            }
-        }
+        if not url:
+            raise HTTPException(status_code=400, detail="URL is required")
+        
+        log.info('extract_request', url=url)
+        return await extract_cached(url)
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f'❌ Error: {e}')
-        import traceback
-        traceback.print_exc()
+        log.exception('extract_failed', url=request.url, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+BATCH_MAX_URLS = int(os.getenv('BATCH_MAX_URLS', 5000))
+
+
+@app.post("/extract/batch")
+async def extract_batch(request: BatchExtractRequest):
+    """
+    Run /extract over many URLs, streaming one NDJSON line per URL as soon as it finishes:
+    {"index", "url", "status": "ok", "result": ExtractResponse}
+    or {"index", "url", "status": "error", "status_code", "error"}
+    """
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="urls is required")
+    if len(request.urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_URLS} urls per batch")
+    
+    limits = StageLimits(
+        fetch=request.fetch_concurrency or int(os.getenv('BATCH_FETCH_CONCURRENCY', 16)),
+        llm=request.llm_concurrency or int(os.getenv('BATCH_LLM_CONCURRENCY', 4)),
+        search=request.search_concurrency or int(os.getenv('BATCH_SEARCH_CONCURRENCY', 2))
+    )
+    in_flight = asyncio.Semaphore(max(1, request.concurrency))
+    log.info('extract_batch', urls=len(request.urls), concurrency=request.concurrency, stages=limits.limits)
+    
+    async def process(index: int, url: str) -> dict:
+        async with in_flight:
+            try:
+                result = await extract_cached(url, limits)
+                return {'index': index, 'url': url, 'status': 'ok',
+                        'result': ExtractResponse(**result).model_dump()}
+            except HTTPException as e:
+                return {'index': index, 'url': url, 'status': 'error', 'status_code': e.status_code, 'error': e.detail}
+            except Exception as e:
+                log.warning('extract_batch_item_failed', url=url, error=str(e))
+                return {'index': index, 'url': url, 'status': 'error', 'status_code': 500, 'error': str(e)}
+    
+    async def stream():
+        tasks = [asyncio.ensure_future(process(i, url)) for i, url in enumerate(request.urls)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + '\n'
+        finally:
+            # Client went away - stop the remaining work
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
+
+
+# Asynchronous /extract: jobs go into a durable SQLite queue drained by background workers
+job_queue = JobQueue(
+    os.getenv('JOB_QUEUE_PATH', str(DATA_DIR / 'jobs.db')),
+    max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', 3)),
+    backoff=float(os.getenv('JOB_RETRY_BACKOFF', 5)),
+    retention=float(os.getenv('JOB_RETENTION', 7 * 24 * 3600))
+)
+# Shared by every job this process runs, so a backlog cannot starve interactive /extract
+job_limits = StageLimits(
+    fetch=int(os.getenv('JOB_FETCH_CONCURRENCY', 8)),
+    llm=int(os.getenv('JOB_LLM_CONCURRENCY', 2)),
+    search=int(os.getenv('JOB_SEARCH_CONCURRENCY', 2))
+)
+JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', 60))
+
+
+async def run_extract_job(payload: dict) -> dict:
+    try:
+        result = await extract_cached(payload['url'], job_limits)
+    except HTTPException as e:
+        # Bad input (no content, ...) will not get better on retry; 5xx (LLM overloaded, ...) may
+        if e.status_code < 500:
+            raise JobFailed(e.detail)
+        raise
+    return ExtractResponse(**result).model_dump()
+
+
+job_runner = JobRunner.from_env(job_queue, {'extract': run_extract_job})
+
+
+@app.post("/jobs/extract", status_code=202)
+async def submit_extract_job(request: JobRequest):
+    """
+    Queue /extract for `url` and return the job at once; poll GET /jobs/{id}
+    or subscribe to GET /jobs/{id}/events. A URL already queued or running
+    returns that job. Higher `priority` runs first.
+    """
+    if not request.url:
+        raise HTTPException(status_code=400, detail="URL is required")
+    job = await asyncio.to_thread(job_queue.submit, 'extract', {'url': request.url}, key=normalize_url(request.url),
+                                  priority=request.priority)
+    job_runner.notify()
+    log.info('job_submitted', id=job['id'], url=request.url, priority=request.priority, status=job['status'])
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """The job and, once done, its ExtractResponse in `result`; `wait` long-polls up to that many seconds"""
+    if wait > 0:
+        job = await job_runner.wait(job_id, min(wait, JOB_MAX_WAIT))
+    else:
+        job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one `status` event per state change, the last one with the result or error"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        current, seen, sent = job, None, time.monotonic()
+        while True:
+            state = (current['status'], current['attempts'])
+            if state != seen:
+                seen, sent = state, time.monotonic()
+                yield f"event: status\ndata: {json.dumps(current)}\n\n"
+            if current['status'] in ('done', 'failed'):
+                return
+            if time.monotonic() - sent > 15:
+                # Keep proxies from closing an idle stream
+                sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            # Returns at once when this process finishes the job, else after one poll interval
+            current = await job_runner.wait(job_id, job_runner.poll_interval) or current
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.get("/admin/jobs")
+async def jobs_stats():
+    """Queue depth by status, age of the oldest runnable job and this process's worker counters"""
+    return {**await asyncio.to_thread(job_queue.stats), 'runner': job_runner.stats()}
+
+
+@app.delete("/admin/jobs")
+async def jobs_purge():
+    """Delete finished jobs older than JOB_RETENTION"""
+    return {'removed': await asyncio.to_thread(job_queue.purge)}
+
+
+def similarity(distance: float) -> float:
+    """Cosine similarity from a search distance (embeddings are L2-normalized)"""
+    return float(distance) if content_index.metric == 'ip' else 1.0 - float(distance) / 2
+
+
 @app.post("/recommend", response_model=RecommendResponse)
-async def recommend():
-    """Redirect to /extract endpoint"""
-    return {"message": "Use /extract endpoint"}
+async def recommend(request: RecommendRequest):
+    """
+    Closest already-analysed items from the local vector index - no network calls
+    Query by a stored `url` (its vector is reused) or free `text`, optionally
+    filtered by category / is_youtube
+    """
+    start = time.perf_counter()
+    k = max(1, min(request.k, 100))
+    where = {field: value for field, value in (('category', request.category), ('is_youtube', request.is_youtube))
+             if value is not None}
+
+    results = None
+    if request.url:
+        # A stored URL's own vector is the query
+        with VECTOR_SEARCH_SECONDS.time():
+            results = await content_index.similar(k, where=where, url=request.url)
+    if results is None:
+        if request.text:
+            try:
+                query = await asyncio.to_thread(embedding_provider.embed_query, request.text)
+            except EmbeddingError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            with VECTOR_SEARCH_SECONDS.time():
+                results = await content_index.similar(k, where=where, vector=query)
+        elif request.url:
+            raise HTTPException(status_code=404, detail="URL has not been analysed yet - POST it to /extract first")
+        else:
+            raise HTTPException(status_code=400, detail="url or text is required")
+
+    recommendations = [
+        {
+            'id': vector_id,
+            'url': record['url'],
+            'title': record.get('title') or record['url'],
+            'summary': record.get('summary'),
+            'category': record.get('category'),
+            'keywords': record.get('keywords'),
+            'is_youtube': bool(record.get('is_youtube')),
+            'score': round(similarity(distance), 4)
+        }
+        for vector_id, distance, record in results
+    ]
+
+    took_ms = (time.perf_counter() - start) * 1000
+    log.debug('recommend_done', results=len(recommendations), took_ms=round(took_ms, 2))
+    return {'recommendations': recommendations[:k], 'took_ms': round(took_ms, 2)}
+
+
+# Cold start: the server listens at once, this loads what the first requests would otherwise wait for
+WARMUP_WAIT = float(os.getenv('WARMUP_WAIT', 30))  # seconds a request waits for readiness before 503
+WARMUP_PRECONNECT = os.getenv('WARMUP_PRECONNECT', '1') == '1'
+WARMUP_PAGE = b'<html><head><title>Warm up</title></head><body><p>Warm up the parse pool.</p></body></html>'
+warmup = Warmup()
+background_tasks = []
+
+
+async def open_content_index():
+    global content_index
+    if INDEX_SOCKET:
+        await content_index.start()
+        if content_index.dimension != embedding_provider.dimension:
+            raise RuntimeError(f'Index server dimension {content_index.dimension} != '
+                               f'embedding dimension {embedding_provider.dimension}')
+    else:
+        content_index = await asyncio.to_thread(ContentIndex.from_env, embedding_provider.dimension, DATA_DIR)
+
+
+def warm_embeddings():
+    """Build the local embedder's tables; the Gemini backend is left alone (one call would cost quota)"""
+    if EMBEDDING_BACKEND != 'gemini':
+        getattr(embedding_provider, 'provider', embedding_provider).embed_query('warm up')
+
+
+async def preconnect():
+    """Open pooled connections (TCP + TLS) to the upstreams most /extract calls reach"""
+    origins = [YOUTUBE_BASE_URL]
+    if WEB_SEARCH_URL:
+        origins.append(WEB_SEARCH_URL)
+    if OPENROUTER_API_KEY:
+        origins.append(OPENROUTER_API_URL)
+    pool = get_http_pool()
+
+    async def touch(url):
+        parsed = urlparse(url)
+        try:
+            await pool.request('HEAD', f'{parsed.scheme}://{parsed.netloc}/', timeout=5.0)
+        except Exception as e:
+            log.debug('preconnect_failed', host=parsed.netloc, error=str(e))
+
+    await asyncio.gather(*(touch(url) for url in origins))
+
+
+async def warm_up(warmup: Warmup):
+    """Steps in the order requests need them; only the LLM client and the index are required"""
+    connecting = asyncio.create_task(warmup.step('http', preconnect, required=False)) if WARMUP_PRECONNECT else None
+    if GOOGLE_AI_API_KEY:
+        await warmup.step('google_ai', configure_google_ai)
+    await warmup.step('llm', llm_client.start)
+    await warmup.step('index', open_content_index)
+    await warmup.step('embeddings', warm_embeddings, required=False)
+    await warmup.step('parser', parse_html_async, WARMUP_PAGE, 'about:blank', required=False)
+    if not WEB_SEARCH_URL:
+        await warmup.step('search', importlib.import_module, 'duckduckgo_search', required=False)
+    purged = await warmup.step('jobs', job_queue.purge, required=False)
+    if purged:
+        log.info('jobs_purged', count=purged)
+    if connecting is not None:
+        await connecting
+    background_tasks.append(asyncio.create_task(content_index.snapshot_periodically(VECTOR_SNAPSHOT_INTERVAL)))
+    job_runner.start()
+
+
+warmup.import_seconds = round(time.perf_counter() - _IMPORT_STARTED, 4)
 
 
 if __name__ == '__main__':
-    print('🚀 AI Service starting on port 8000')
-    print('📺 YouTube: Smart video detection')
-    print('📰 Articles: DuckDuckGo search')
-    print('⚡ Powered by FastAPI')
+    log.info('service_starting', port=8000, web_search=WEB_SEARCH_URL or 'duckduckgo')
     uvicorn.run(app, host='0.0.0.0', port=8000)
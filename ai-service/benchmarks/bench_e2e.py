@@ -0,0 +1,222 @@
+# Benchmark - offline end-to-end /extract with local stand-ins for every external service
+#
+# Starts the stubs in e2e_stubs.py (article sites, Gemini or OpenRouter,
+# web search, YouTube) with configurable latency, points app.py at them
+# through its environment variables and drives the FastAPI app in-process
+# at each concurrency level. Reports throughput and p50/p95/p99 latency
+# overall and per pipeline stage (StageGraph timings).
+#
+# --out writes the numbers as sorted, rounded JSON so two commits' reports
+# diff cleanly; --compare prints the change against an earlier report.
+#
+#   python benchmarks/bench_e2e.py [--levels 1 8 32] [--requests 64] [--llm openrouter]
+#   python benchmarks/bench_e2e.py --out before.json
+#   python benchmarks/bench_e2e.py --compare before.json --latency gemini=2000
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+import numpy as np
+
+from e2e_stubs import DEFAULT_LATENCY_MS, start_stubs, stop_stubs
+from bench_html_extract import load_corpus
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_latency(values):
+    """['gemini=2000', 'site=50'] -> {'gemini': 2000.0, 'site': 50.0}"""
+    latency = {}
+    for value in values or []:
+        name, _, ms = value.partition('=')
+        if name not in DEFAULT_LATENCY_MS:
+            raise SystemExit(f'unknown service {name!r} (one of {", ".join(DEFAULT_LATENCY_MS)})')
+        latency[name] = float(ms)
+    return latency
+
+
+def summarize(samples):
+    """Seconds -> {'count', 'p50', 'p95', 'p99'} in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    values = np.percentile(np.array(samples) * 1000, PERCENTILES)
+    return {'count': len(samples), **{f'p{p}': round(float(v), 1) for p, v in zip(PERCENTILES, values)}}
+
+
+def build_urls(total, stubs, args, rng, run):
+    """Request URLs for one level: corpus articles and YouTube watch pages, hot_ratio of them repeats"""
+    pages = list(load_corpus())
+    urls = []
+    for i in range(total):
+        if urls and rng.random() < args.hot_ratio:
+            urls.append(rng.choice(urls))
+        elif rng.random() < args.youtube_ratio:
+            urls.append(f"{stubs['youtube'].url}/watch?v={run}x{i:06d}")
+        else:
+            urls.append(f"{stubs['site'].url}/page/{rng.choice(pages)}?i={run}-{i}")
+    return urls
+
+
+async def run_level(service, urls, concurrency, stage_samples):
+    """Fire every URL at /extract with `concurrency` in flight; returns (seconds, latencies, errors)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=service.app)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def one(url):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post('/extract', json={'url': url})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        stage_samples.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(url) for url in urls))
+        elapsed = time.perf_counter() - start
+
+    return elapsed, latencies, errors
+
+
+async def run(args, stubs):
+    import app as service
+
+    stage_samples = defaultdict(list)
+    service.STAGE_OBSERVERS.append(lambda stage, seconds, ok: stage_samples[stage].append(seconds))
+
+    rng = random.Random(args.seed)
+    levels = {}
+    # ASGITransport does not run the lifespan - start it (and wait out the warm-up) like uvicorn would
+    async with service.app.router.lifespan_context(service.app):
+        if not await service.warmup.wait(120):
+            raise SystemExit(f'warm-up {service.warmup.status}: {service.warmup.errors}')
+        for concurrency in args.levels:
+            urls = build_urls(args.requests, stubs, args, rng, run=f'c{concurrency}')
+            llm_before = dict(service.llm_client.counters)
+            elapsed, latencies, errors = await run_level(service, urls, concurrency, stage_samples)
+            levels[str(concurrency)] = {
+                'throughput_rps': round(len(urls) / elapsed, 2),
+                'errors': errors,
+                'overall': summarize(latencies),
+                'stages': {stage: summarize(samples) for stage, samples in sorted(stage_samples.items())},
+                'llm': {name: count - llm_before[name] for name, count in service.llm_client.counters.items()},
+            }
+    return levels
+
+
+def print_report(report):
+    print(f"commit {report['commit']}  llm={report['config']['llm']}  latency={report['config']['latency_ms']}\n")
+    for level, result in report['levels'].items():
+        overall = result['overall']
+        print(f"in-flight {level}: {result['throughput_rps']} req/s, {result['errors']} errors, "
+              f"p50 {overall.get('p50')} / p95 {overall.get('p95')} / p99 {overall.get('p99')} ms")
+        print('  llm ' + ', '.join(f'{name} {count}' for name, count in result.get('llm', {}).items()))
+        print(f"  {'stage':<16} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, summary in result['stages'].items():
+            print(f"  {stage:<16} {summary['count']:>6} {summary.get('p50', 0):>9.1f} "
+                  f"{summary.get('p95', 0):>9.1f} {summary.get('p99', 0):>9.1f}")
+        print()
+
+
+def print_comparison(base, report):
+    """Throughput and p95 changes, level by level and stage by stage"""
+    def change(old, new):
+        return f'{(new - old) / old:+.0%}' if old else 'n/a'
+
+    print(f"vs {base['commit']}:")
+    for level, result in report['levels'].items():
+        before = base['levels'].get(level)
+        if before is None:
+            continue
+        print(f"  in-flight {level}: req/s {before['throughput_rps']} -> {result['throughput_rps']} "
+              f"({change(before['throughput_rps'], result['throughput_rps'])}), "
+              f"p95 {before['overall'].get('p95')} -> {result['overall'].get('p95')} ms")
+        for stage, summary in result['stages'].items():
+            old = before['stages'].get(stage, {}).get('p95')
+            if old is not None and 'p95' in summary:
+                print(f"    {stage:<16} p95 {old:>8.1f} -> {summary['p95']:>8.1f} ms ({change(old, summary['p95'])})")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=64, help='requests per concurrency level')
+    parser.add_argument('--latency', nargs='*', metavar='SERVICE=MS',
+                        help=f'stub latency overrides, defaults {DEFAULT_LATENCY_MS}')
+    parser.add_argument('--jitter', type=float, default=0.25, help='log-normal sigma of stub latency')
+    parser.add_argument('--llm', choices=['openrouter', 'gemini', 'hedged'], default='openrouter',
+                        help='gemini goes through google-generativeai (REST transport); '
+                             'hedged = gemini with OpenRouter as fallback / hedge')
+    parser.add_argument('--youtube-ratio', type=float, default=0.2)
+    parser.add_argument('--hot-ratio', type=float, default=0.0, help='share of requests repeating an earlier URL')
+    parser.add_argument('--http-cache', action='store_true', help='keep the on-disk page cache on')
+    parser.add_argument('--near-dup', action='store_true',
+                        help='keep near-duplicate reuse on (stub pages of one corpus template are near duplicates)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the report as JSON')
+    parser.add_argument('--compare', help='earlier --out report to compare against')
+    parser.add_argument('--verbose', action='store_true', help="show the service's own logging")
+    args = parser.parse_args()
+
+    latency = {**DEFAULT_LATENCY_MS, **parse_latency(args.latency)}
+    stubs, env = start_stubs(latency, args.jitter)
+
+    # Configuration has to be in place before app.py is imported
+    os.environ.update(env)
+    os.environ['LOG_LEVEL'] = 'DEBUG' if args.verbose else os.environ.get('LOG_LEVEL', 'WARNING')
+    os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='bench-e2e-')
+    os.environ['HTTP_PER_HOST_LIMIT'] = os.environ.get('HTTP_PER_HOST_LIMIT', '1000')  # every stub site is one host
+    if not args.http_cache:
+        os.environ['HTTP_CACHE_PATH'] = ''
+    if not args.near_dup:
+        os.environ['NEAR_DUP_MAX_DISTANCE'] = '-1'
+    os.environ['GOOGLE_AI_API_KEY'] = 'bench' if args.llm in ('gemini', 'hedged') else ''
+    os.environ['OPENROUTER_API_KEY'] = 'bench' if args.llm in ('openrouter', 'hedged') else ''
+
+    try:
+        levels = asyncio.run(run(args, stubs))
+    finally:
+        stop_stubs(stubs)
+
+    report = {
+        'commit': git_commit(),
+        'config': {
+            'llm': args.llm, 'latency_ms': latency, 'jitter': args.jitter, 'requests': args.requests,
+            'youtube_ratio': args.youtube_ratio, 'hot_ratio': args.hot_ratio, 'http_cache': args.http_cache,
+            'near_dup': args.near_dup,
+            'seed': args.seed,
+        },
+        'levels': levels,
+    }
+    print_report(report)
+    if args.compare:
+        print_comparison(json.loads(Path(args.compare).read_text()), report)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+        print(f'report written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# Benchmark - /extract throughput vs number of in-flight requests
+#
+# Serves a synthetic article from a local HTTP server with a fixed delay and
+# drives the FastAPI app in-process. Gemini and the recommendation search are
+# replaced by instant fakes so only the fetch + parse stage is measured.
+# Every request uses a distinct URL so the response cache never short-circuits it.
+#
+#   python benchmarks/bench_extract_concurrency.py [--delay 0.2] [--requests 32]
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Throwaway caches / vector store so runs don't see each other's state
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='bench-extract-'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import httpx
+import requests
+
+import app as service
+from text_extractor import BROWSER_HEADERS, parse_html
+
+PARAGRAPH = '<p>' + 'Vector databases make similarity search over embeddings fast. ' * 8 + '</p>'
+PAGE = f"""<html><head><title>Benchmark article</title>
+<meta name="description" content="Synthetic page for benchmarking"></head>
+<body><article><h1>Benchmark article</h1>{PARAGRAPH * 40}</article></body></html>""".encode()
+
+# text_extractor creates its requests session lazily - the blocking baseline keeps its own
+session = requests.Session()
+
+FAKE_ANALYSIS = """TITLE: Benchmark article
+SUMMARY: Synthetic content
+CATEGORY: Technology
+KEYWORDS: vector database similarity search"""
+
+
+def start_origin(delay):
+    """Local origin server that answers every GET after `delay` seconds"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def fake_gemini(prompt):
+    return FAKE_ANALYSIS, 'fake'
+
+
+async def fake_search(query, num_results=6):
+    return []
+
+
+async def blocking_fetch(url, extract=False, min_fresh=0):
+    """The pre-async behaviour: blocking fetch on the event loop"""
+    response = session.get(url, headers=BROWSER_HEADERS, timeout=15)
+    response.raise_for_status()
+    return response
+
+
+async def blocking_parse(page, url):
+    """The pre-async behaviour: parse on the event loop"""
+    return parse_html(page.content, url)
+
+
+async def run_level(base_url, concurrency, total, run):
+    """Fire `total` requests keeping `concurrency` in flight, return req/s"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=service.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def one(i):
+            async with semaphore:
+                response = await client.post('/extract', json={'url': f'{base_url}/article?run={run}&i={i}'})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return total / elapsed
+
+
+async def main(args):
+    origin = start_origin(args.delay)
+    base_url = f'http://127.0.0.1:{origin.server_address[1]}'
+
+    service.call_gemini = fake_gemini
+    service.search_web = fake_search
+    async_fetch, async_parse = service.fetch_page, service.parse_page_async
+
+    print(f'origin delay={args.delay * 1000:.0f}ms requests/level={args.requests}')
+    print(f"{'in-flight':>10} {'blocking req/s':>15} {'async req/s':>12} {'speedup':>8}")
+    # ASGITransport does not run the lifespan - start it (and wait out the warm-up) like uvicorn would
+    async with service.app.router.lifespan_context(service.app):
+        if not await service.warmup.wait(120):
+            raise SystemExit(f'warm-up {service.warmup.status}: {service.warmup.errors}')
+        for concurrency in args.levels:
+            service.fetch_page, service.parse_page_async = blocking_fetch, blocking_parse
+            blocking = await run_level(base_url, concurrency, args.requests, f'blocking-{concurrency}')
+            service.fetch_page, service.parse_page_async = async_fetch, async_parse
+            non_blocking = await run_level(base_url, concurrency, args.requests, f'async-{concurrency}')
+            print(f'{concurrency:>10} {blocking:>15.1f} {non_blocking:>12.1f} {non_blocking / blocking:>7.1f}x')
+
+    origin.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--delay', type=float, default=0.2, help='origin response delay in seconds')
+    parser.add_argument('--requests', type=int, default=32, help='requests per concurrency level')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    asyncio.run(main(parser.parse_args()))
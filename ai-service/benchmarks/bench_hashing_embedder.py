@@ -0,0 +1,88 @@
+# Benchmark - hashing embedder vs the original per-word Python loop
+#
+# Also checks that vectors are identical across processes with different
+# PYTHONHASHSEED values (the original hash()-based embedder is not).
+#
+#   python benchmarks/bench_hashing_embedder.py [--texts 1000] [--words 500]
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from hashing_embedder import HashingEmbedder
+
+VOCABULARY = [f'word{i}' for i in range(20000)]
+
+
+def legacy_embedding(text):
+    """The original app.generate_embedding"""
+    words = text.lower().split()[:500]
+    embedding = np.zeros(768, dtype='float32')
+    for word in words:
+        idx = hash(word) % 768
+        embedding[idx] += 1
+    norm = np.linalg.norm(embedding)
+    if norm > 0:
+        embedding = embedding / norm
+    return embedding
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fingerprint(seed_env):
+    """Embed a fixed text in a fresh interpreter and return the vector checksum"""
+    code = (
+        'import sys; sys.path.insert(0, sys.argv[1]);'
+        'from hashing_embedder import HashingEmbedder;'
+        'print(HashingEmbedder().embed("stable vectors across workers").tobytes().hex()[:64])'
+    )
+    env = {**os.environ, 'PYTHONHASHSEED': seed_env}
+    root = str(Path(__file__).resolve().parent.parent)
+    return subprocess.run([sys.executable, '-c', code, root], env=env, capture_output=True, text=True).stdout
+
+
+def main(args):
+    rng = random.Random(0)
+    texts = [' '.join(rng.choices(VOCABULARY, k=args.words)) for _ in range(args.texts)]
+
+    embedder = HashingEmbedder()
+    bigrams = HashingEmbedder(ngram_range=(1, 2), tf='sublinear')
+
+    results = [
+        ('legacy loop (per text)', timed(lambda: [legacy_embedding(t) for t in texts])),
+        ('HashingEmbedder.embed (per text)', timed(lambda: [embedder.embed(t) for t in texts])),
+        ('HashingEmbedder.embed_batch', timed(lambda: embedder.embed_batch(texts))),
+        ('embed_batch, 1-2 grams + sublinear tf', timed(lambda: bigrams.embed_batch(texts))),
+    ]
+
+    print(f'{args.texts} texts x {args.words} words')
+    baseline = results[0][1]
+    for name, seconds in results:
+        print(f'{name:<40} {seconds * 1000:>9.1f} ms  {args.texts / seconds:>10.0f} texts/s  {baseline / seconds:>5.1f}x')
+
+    # Sanity: batch and single-text paths agree
+    assert np.allclose(embedder.embed_batch(texts[:10]), np.stack([embedder.embed(t) for t in texts[:10]]))
+
+    stable = fingerprint('1') == fingerprint('2')
+    print(f'identical vectors across PYTHONHASHSEED values: {stable}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--texts', type=int, default=1000)
+    parser.add_argument('--words', type=int, default=500)
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+# Benchmark - single-pass lxml extractor vs the BeautifulSoup extractor
+#
+# Runs both parse_html paths over the saved-page corpus (benchmarks/corpus,
+# regenerate with corpus/make_corpus.py; plain .html pages saved there are
+# picked up too) and reports per-page parse time plus how the outputs differ:
+# extracted length, share of repeated sentences, and how much of the lxml
+# text is also in the bs4 text (coverage).
+#
+# Both select the same elements; lxml keeps each piece of text once. A page
+# whose text is under 100 characters once de-duplicated falls back to title
+# + meta description - bs4 only cleared that bar by repeating itself
+# ("meta" in the last column).
+#
+#   python benchmarks/bench_html_extract.py [--repeat 5] [--show news_article]
+import argparse
+import gzip
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from text_extractor import parse_html_bs4, parse_html_lxml, clean_text
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'corpus'
+
+
+def load_corpus():
+    pages = {}
+    for path in sorted(CORPUS_DIR.glob('*.html*')):
+        data = path.read_bytes()
+        pages[path.name.split('.html')[0]] = gzip.decompress(data) if path.suffix == '.gz' else data
+    return pages
+
+
+def timed(parse, content, repeat):
+    """Best-of-N wall time in ms"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(content, 'https://example.com/page')
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def sentences(text):
+    return [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if len(s.strip()) > 20]
+
+
+def repeated_share(text):
+    """Fraction of sentences that are extra copies of an earlier sentence"""
+    found = sentences(text)
+    if not found:
+        return 0.0
+    return sum(n - 1 for n in Counter(found).values()) / len(found)
+
+
+def coverage(text, reference):
+    """Fraction of distinct sentences in text that also appear in reference"""
+    found, ref = set(sentences(text)), set(sentences(reference))
+    return len(found & ref) / len(found) if found else 1.0
+
+
+def source(result):
+    """'meta' when the extractor fell back to title + description, else 'text'"""
+    return 'meta' if result['text'].startswith(clean_text(f"{result['title']}. ")) else 'text'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--show', help='print both extracted texts for one page')
+    args = parser.parse_args()
+
+    pages = load_corpus()
+    if not pages:
+        sys.exit(f'No pages in {CORPUS_DIR} - run benchmarks/corpus/make_corpus.py')
+
+    print(f'{len(pages)} pages, best of {args.repeat}\n')
+    print(f'{"page":<18} {"KB":>6} {"bs4 ms":>8} {"lxml ms":>8} {"speedup":>8} '
+          f'{"bs4 chars":>10} {"lxml chars":>10} {"bs4 dup":>8} {"lxml dup":>8} {"cover":>6} {"title":>6} {"source":>9}')
+    totals = [0.0, 0.0]
+    for name, content in pages.items():
+        bs4_ms, bs4 = timed(parse_html_bs4, content, args.repeat)
+        lxml_ms, lxml = timed(parse_html_lxml, content, args.repeat)
+        totals[0] += bs4_ms
+        totals[1] += lxml_ms
+        print(f'{name:<18} {len(content) / 1024:>6.0f} {bs4_ms:>8.1f} {lxml_ms:>8.1f} {bs4_ms / lxml_ms:>7.1f}x '
+              f'{len(bs4["text"]):>10} {len(lxml["text"]):>10} {repeated_share(bs4["text"]):>8.0%} '
+              f'{repeated_share(lxml["text"]):>8.0%} {coverage(lxml["text"], bs4["text"]):>6.0%} '
+              f'{"same" if bs4["title"] == lxml["title"] else "diff":>6} {source(bs4):>4}/{source(lxml)}')
+        if name == args.show:
+            print(f'\n--- bs4 ---\n{bs4["text"]}\n\n--- lxml ---\n{lxml["text"]}\n')
+    print(f'\n{"total":<18} {"":>6} {totals[0]:>8.1f} {totals[1]:>8.1f} {totals[0] / totals[1]:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
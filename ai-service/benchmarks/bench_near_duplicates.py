@@ -0,0 +1,79 @@
+# Benchmark - SimHash near-duplicate detection: accuracy on the corpus and lookup time at scale
+#
+# Fingerprints each corpus page's extracted text (what /extract analyses)
+# and a syndicated-style copy of it (extra byline, trailing link, last
+# sentences cut), then reports the bit distance to the copy and to the
+# nearest other page. Then fills a SimHashIndex with --size random
+# fingerprints and times query() for misses and for planted near matches.
+#
+#   python benchmarks/bench_near_duplicates.py [--size 1000000] [--max-distance 6]
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from near_duplicates import SimHashIndex, simhash
+from text_extractor import TEXT_BUDGET, parse_html
+from bench_html_extract import load_corpus
+
+
+def syndicated_copy(text):
+    return f'By Staff Writer, Example Wire. {text[:len(text) - 120]} Originally published at example.com.'
+
+
+def accuracy(max_distance):
+    texts = {name: parse_html(content, 'https://example.com/page')['text'][:TEXT_BUDGET]
+             for name, content in load_corpus().items()}
+    fingerprints = {name: simhash(text) for name, text in texts.items()}
+    print(f"{'page':<18} {'words':>6} {'copy bits':>10} {'nearest other':>14}  detected")
+    for name, text in texts.items():
+        copy = (fingerprints[name] ^ simhash(syndicated_copy(text))).bit_count()
+        other = min((fingerprints[name] ^ f).bit_count() for n, f in fingerprints.items() if n != name)
+        print(f'{name:<18} {len(text.split()):>6} {copy:>10} {other:>14}  {"yes" if copy <= max_distance else "no"}')
+
+    start = time.perf_counter()
+    for text in texts.values():
+        simhash(text)
+    print(f'\nsimhash: {(time.perf_counter() - start) / len(texts) * 1000:.3f} ms per page\n')
+
+
+def lookup_time(size, max_distance, queries=5000):
+    rng = random.Random(0)
+    index = SimHashIndex(max_distance=max_distance)
+    stored = [rng.getrandbits(64) for _ in range(size)]
+    start = time.perf_counter()
+    for key, fingerprint in enumerate(stored):
+        index.add(key, fingerprint)
+    print(f'index of {size:,} fingerprints built in {time.perf_counter() - start:.1f} s')
+
+    misses = [rng.getrandbits(64) for _ in range(queries)]
+    near = []
+    for _ in range(queries):
+        key = rng.randrange(size)
+        fingerprint = stored[key]
+        for bit in rng.sample(range(64), rng.randint(0, max_distance)):
+            fingerprint ^= 1 << bit
+        near.append((key, fingerprint))
+
+    start = time.perf_counter()
+    false_matches = sum(index.query(fingerprint) is not None for fingerprint in misses)
+    miss_us = (time.perf_counter() - start) / queries * 1e6
+    start = time.perf_counter()
+    found = sum((index.query(fingerprint) or (None,))[0] == key for key, fingerprint in near)
+    near_us = (time.perf_counter() - start) / queries * 1e6
+    print(f'query, unrelated: {miss_us:.1f} us ({false_matches} false matches)')
+    print(f'query, within {max_distance} bits: {near_us:.1f} us (recall {found / queries:.3f})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--max-distance', type=int, default=6)
+    args = parser.parse_args()
+    accuracy(args.max_distance)
+    lookup_time(args.size, args.max_distance)
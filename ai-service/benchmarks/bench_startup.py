@@ -0,0 +1,167 @@
+# Benchmark - cold start: import time, time to live / ready, first vs second /extract
+#
+# Part 1 runs `python -X importtime -c "import app"` and lists the modules
+# that cost the most (cumulative, top-level imports of app.py and the
+# service modules), so a heavy import creeping back onto the startup path
+# shows up here.
+#
+# Part 2 starts `uvicorn app:app` against the e2e stubs --runs times, each
+# with a data directory holding --vectors stored pages (the snapshot load is
+# part of warm-up), and measures from process start:
+#   live    first 200 from /health/live (the server is accepting connections)
+#   ready   first 200 from /health/ready (index, models and pools are warm)
+# then the latency of the first /extract after ready and of a second one
+# (a different page, so nothing is cached).
+#
+#   python benchmarks/bench_startup.py [--runs 3] [--vectors 2000] [--top 15]
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from e2e_stubs import start_stubs, stop_stubs
+from bench_e2e import parse_latency
+from bench_html_extract import load_corpus
+from bench_workers import FAST_LATENCY_MS, free_port, stop
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+_IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_profile(env):
+    """[(cumulative us, self us, depth, module)] of `import app` in a fresh interpreter"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=SERVICE_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((int(cumulative_us), int(self_us), (len(indent) - 1) // 2, module))
+    return rows
+
+
+def wait_for(url, deadline):
+    """Seconds until `url` answers 200 (polled every 10 ms), None past the deadline"""
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+async def seed_vectors(base_url, site_url, count):
+    """Store `count` analysed pages, so later runs load a non-empty snapshot"""
+    pages = list(load_corpus())
+    semaphore = asyncio.Semaphore(16)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def one(i):
+            async with semaphore:
+                await client.post('/extract', json={'url': f'{site_url}/page/{pages[i % len(pages)]}?seed={i}'})
+        await asyncio.gather(*(one(i) for i in range(count)))
+
+
+def start_service(env, port):
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning', '--no-access-log'],
+        cwd=SERVICE_DIR, env=env,
+    )
+
+
+def cold_start(env, site_url, run, timeout=120.0):
+    """{'live', 'ready', 'first', 'second'} seconds for one service start"""
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    start = time.monotonic()
+    service = start_service(env, port)
+    try:
+        deadline = start + timeout
+        live = wait_for(f'{base_url}/health/live', deadline)
+        ready = wait_for(f'{base_url}/health/ready', deadline)
+        if live is None or ready is None:
+            raise SystemExit(f'service did not become ready within {timeout:.0f} s')
+        page = next(iter(load_corpus()))
+        latencies = []
+        for i in range(2):
+            t = time.perf_counter()
+            response = httpx.post(f'{base_url}/extract', json={'url': f'{site_url}/page/{page}?cold={run}-{i}'},
+                                  timeout=120)
+            latencies.append(time.perf_counter() - t)
+            response.raise_for_status()
+        stats = httpx.get(f'{base_url}/health/ready', timeout=5).json()
+    finally:
+        stop(service)
+    return {'live': live - start, 'ready': ready - start, 'first': latencies[0], 'second': latencies[1],
+            'import': stats['import_seconds'], 'warmup': stats['warmup_seconds'], 'steps': stats['steps']}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--vectors', type=int, default=2000, help='stored pages loaded on each start')
+    parser.add_argument('--top', type=int, default=15, help='modules listed in the import profile')
+    parser.add_argument('--latency', nargs='*', metavar='SERVICE=MS', help=f'stub latencies, defaults {FAST_LATENCY_MS}')
+    args = parser.parse_args()
+
+    stubs, stub_env = start_stubs({**FAST_LATENCY_MS, **parse_latency(args.latency)}, jitter=0)
+    data_dir = tempfile.mkdtemp(prefix='bench-startup-')
+    env = {
+        **os.environ, **stub_env,
+        'DATA_DIR': data_dir,
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+        'HTTP_CACHE_PATH': '',
+        'NEAR_DUP_MAX_DISTANCE': '-1',
+        'VECTOR_SNAPSHOT_INTERVAL': '1',
+        'GOOGLE_AI_API_KEY': '',
+        'OPENROUTER_API_KEY': 'bench',
+    }
+    try:
+        rows = import_profile(env)
+        total = next(cumulative for cumulative, _, depth, module in rows if module == 'app' and depth == 0)
+        print(f'import app: {total / 1000:.0f} ms - heaviest imports (cumulative):')
+        for cumulative, self_us, depth, module in sorted((r for r in rows if r[2] == 1), reverse=True)[:args.top]:
+            print(f'  {cumulative / 1000:>8.1f} ms  {self_us / 1000:>7.1f} ms self  {module}')
+
+        if args.vectors:
+            port = free_port()
+            service = start_service(env, port)
+            try:
+                wait_for(f'http://127.0.0.1:{port}/health/ready', time.monotonic() + 120)
+                asyncio.run(seed_vectors(f'http://127.0.0.1:{port}', stubs['site'].url, args.vectors))
+                time.sleep(2)  # one more snapshot, so the next start loads instead of replaying
+            finally:
+                stop(service)
+
+        print(f"\n{args.vectors} stored pages, {args.runs} cold starts\n")
+        print(f"{'run':>3} {'live s':>7} {'ready s':>8} {'import s':>9} {'warmup s':>9} "
+              f"{'1st extract ms':>15} {'2nd extract ms':>15}")
+        results = []
+        for run in range(args.runs):
+            r = cold_start(env, stubs['site'].url, run)
+            results.append(r)
+            print(f"{run + 1:>3} {r['live']:>7.2f} {r['ready']:>8.2f} {r['import']:>9.2f} {r['warmup']:>9.2f} "
+                  f"{r['first'] * 1000:>15.1f} {r['second'] * 1000:>15.1f}")
+        median = {key: statistics.median(r[key] for r in results) for key in ('live', 'ready', 'first', 'second')}
+        print(f"med {median['live']:>7.2f} {median['ready']:>8.2f} {'':>9} {'':>9} "
+              f"{median['first'] * 1000:>15.1f} {median['second'] * 1000:>15.1f}")
+        print(f"\nwarm-up steps (last run): {results[-1]['steps']}")
+    finally:
+        stop_stubs(stubs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# Benchmark - budgeted streaming download vs reading the whole page
+#
+# Serves the saved-page corpus from a local HTTP server (throttled to
+# --mbps so transfer time matters) and fetches every page twice through
+# fetch_page: once reading the full body and parsing afterwards, once with
+# extract=True so the parser runs on the chunks and stops the download
+# when it has TEXT_BUDGET characters. Reports bytes read, time, and
+# whether the text the analysis sees (text[:TEXT_BUDGET]) is unchanged.
+#
+#   python benchmarks/bench_streaming_fetch.py [--mbps 20]
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from http_client import close_http_pool
+from text_extractor import TEXT_BUDGET, download_stats, fetch_page, parse_page_async
+from bench_html_extract import load_corpus
+
+
+def start_origin(pages, mbps):
+    """Local origin serving each corpus page at /<name>, at most `mbps` megabits/s per response"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = pages[self.path.strip('/').split('?')[0]]
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            step = 16 * 1024
+            try:
+                for i in range(0, len(body), step):
+                    self.wfile.write(body[i:i + step])
+                    time.sleep(step * 8 / (mbps * 1e6))
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client stopped reading - the point of the exercise
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def extract(url, streaming):
+    before = download_stats.bytes_downloaded
+    start = time.perf_counter()
+    page = await fetch_page(url, extract=streaming)
+    result = await parse_page_async(page, url)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000, download_stats.bytes_downloaded - before, result
+
+
+async def main(args):
+    pages = load_corpus()
+    origin = start_origin(pages, args.mbps)
+    base_url = f'http://127.0.0.1:{origin.server_address[1]}'
+
+    print(f'{len(pages)} pages at {args.mbps} Mbit/s, text budget {TEXT_BUDGET} chars\n')
+    print(f'{"page":<18} {"full KB":>8} {"read KB":>8} {"full ms":>8} {"stream ms":>10} {"same text":>10}')
+    totals = [0, 0, 0.0, 0.0]
+    for name in pages:
+        full_ms, full_bytes, full = await extract(f'{base_url}/{name}?full', False)
+        stream_ms, stream_bytes, streamed = await extract(f'{base_url}/{name}?stream', True)
+        same = full['text'][:TEXT_BUDGET] == streamed['text'][:TEXT_BUDGET] and full['title'] == streamed['title']
+        for i, value in enumerate((full_bytes, stream_bytes, full_ms, stream_ms)):
+            totals[i] += value
+        print(f'{name:<18} {full_bytes / 1024:>8.0f} {stream_bytes / 1024:>8.0f} {full_ms:>8.1f} {stream_ms:>10.1f} {"yes" if same else "NO":>10}')
+    print(f'\n{"total":<18} {totals[0] / 1024:>8.0f} {totals[1] / 1024:>8.0f} {totals[2]:>8.1f} {totals[3]:>10.1f}')
+    print(f'\ndownload stats: {download_stats.stats()}')
+
+    await close_http_pool()
+    origin.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mbps', type=float, default=20.0, help='origin bandwidth per response')
+    asyncio.run(main(parser.parse_args()))
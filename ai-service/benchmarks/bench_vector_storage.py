@@ -0,0 +1,67 @@
+# Benchmark - compressed vector storage (fp16 / SQ8 / PQ) vs the exact float32 baseline
+#
+# Reports memory per vector, build time, search latency and recall@k for
+# each storage mode, with and without exact re-ranking of k*N candidates
+# from the float32 vectors (what VectorStore(rerank=N) does).
+#
+#   python benchmarks/bench_vector_storage.py [--vectors 100000] [--dim 768] [--rerank 4 16]
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import faiss
+import numpy as np
+
+from vector_store import METRICS, metric_type, STORAGE_CODECS, exact_rerank
+from bench_vector_tiers import synthetic, recall_at_k
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vectors', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--metric', choices=sorted(METRICS), default='ip')
+    parser.add_argument('--pq-m', type=int, default=48)
+    parser.add_argument('--rerank', type=int, nargs='+', default=[4, 16])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = synthetic(args.vectors + args.queries, args.dim, rng)
+    base, queries = data[:args.vectors], data[args.vectors:]
+    metric = metric_type(args.metric)
+
+    truth = None
+    print(f'{args.vectors} x {args.dim} vectors, {args.queries} queries, k={args.k}, metric={args.metric}\n')
+    print(f'{"storage":<10} {"rerank":>6} {"B/vector":>9} {"build s":>8} {"ms/query":>9} {"recall@k":>9} {"loss":>7}')
+    for storage, codec in STORAGE_CODECS.items():
+        index = faiss.index_factory(args.dim, codec.format(m=args.pq_m), metric)
+        start = time.perf_counter()
+        if not index.is_trained:
+            index.train(base[rng.choice(args.vectors, min(args.vectors, 100_000), replace=False)])
+        index.add(base)
+        build = time.perf_counter() - start
+        per_vector = faiss.serialize_index(index).nbytes / args.vectors
+
+        for rerank in ([0] if storage == 'float32' else [0, *args.rerank]):
+            start = time.perf_counter()
+            _, found = index.search(queries, args.k * rerank if rerank else args.k)
+            if rerank:
+                # Batches keep the gathered (nq, k*N, dim) candidate block small
+                found = np.vstack([
+                    exact_rerank(queries[i:i + 64], found[i:i + 64], base, args.k, args.metric)[1]
+                    for i in range(0, args.queries, 64)
+                ])
+            latency = (time.perf_counter() - start) * 1000 / args.queries
+            if truth is None:
+                truth = found
+            recall = recall_at_k(found, truth, args.k)
+            print(f'{storage:<10} {rerank or "-":>6} {per_vector:>9.0f} {build:>8.1f} {latency:>9.3f} {recall:>9.3f} {1 - recall:>7.3f}')
+
+
+if __name__ == '__main__':
+    main()
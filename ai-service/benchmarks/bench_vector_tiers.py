@@ -0,0 +1,83 @@
+# Benchmark - recall@k vs queries/second for each VectorStore index tier
+#
+# Synthetic clustered, L2-normalized vectors; ground truth from an exact
+# flat search. Each tier is built directly (no promotion) and swept over
+# its search parameter (efSearch for HNSW, nprobe for IVF).
+#
+#   python benchmarks/bench_vector_tiers.py [--vectors 200000] [--dim 768] [--metric ip]
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import faiss
+import numpy as np
+
+from vector_store import METRICS, metric_type
+
+TIERS = {
+    'Flat': ('Flat', None, [None]),
+    'HNSW32': ('HNSW32', 'efSearch', [16, 32, 64, 128]),
+    'IVF-Flat': ('IVF{nlist},Flat', 'nprobe', [4, 16, 64]),
+    'IVF-PQ': ('IVF{nlist},PQ{m}', 'nprobe', [4, 16, 64]),
+}
+
+
+def synthetic(n, dim, rng, clusters=256):
+    """Clustered data looks more like real embeddings than uniform noise"""
+    centers = rng.standard_normal((clusters, dim)).astype('float32')
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype('float32')
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vectors', type=int, default=200_000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--metric', choices=sorted(METRICS), default='ip')
+    parser.add_argument('--pq-m', type=int, default=48)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = synthetic(args.vectors + args.queries, args.dim, rng)
+    base, queries = data[:args.vectors], data[args.vectors:]
+    metric = metric_type(args.metric)
+    nlist = max(16, int(4 * np.sqrt(args.vectors)))
+
+    exact = faiss.index_factory(args.dim, 'Flat', metric)
+    exact.add(base)
+    _, truth = exact.search(queries, args.k)
+
+    print(f'{args.vectors} x {args.dim} vectors, {args.queries} queries, k={args.k}, metric={args.metric}, nlist={nlist}\n')
+    print(f'{"tier":<10} {"param":>12} {"build s":>8} {"recall@k":>9} {"QPS":>10} {"MB":>8}')
+    for name, (template, param, values) in TIERS.items():
+        index = faiss.index_factory(args.dim, template.format(nlist=nlist, m=args.pq_m), metric)
+        start = time.perf_counter()
+        if not index.is_trained:
+            index.train(base[rng.choice(args.vectors, min(args.vectors, 100_000), replace=False)])
+        index.add(base)
+        build = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        for value in values:
+            if param:
+                faiss.ParameterSpace().set_index_parameter(index, param, value)
+            start = time.perf_counter()
+            _, found = index.search(queries, args.k)
+            qps = args.queries / (time.perf_counter() - start)
+            label = f'{param}={value}' if param else 'exact'
+            print(f'{name:<10} {label:>12} {build:>8.1f} {recall_at_k(found, truth, args.k):>9.3f} {qps:>10.0f} {size_mb:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+# Benchmark - /extract + /recommend throughput against uvicorn worker count, one shared index server
+#
+# Starts the e2e stubs (short latencies, so the service's own CPU work -
+# parsing, embedding, search - is what limits throughput), one
+# index_server.py process on a Unix socket, then `uvicorn app:app
+# --workers N` for each N and drives a mix of /extract (new pages) and
+# /recommend (free-text queries) over HTTP. After each level every
+# extracted URL is looked up with /recommend {url} - each lookup may land
+# on any worker, so a miss means the workers do not share one index.
+#
+#   python benchmarks/bench_workers.py [--workers 1 2 4] [--requests 400] [--concurrency 32]
+#   python benchmarks/bench_workers.py --workers 1 --no-index-server    # in-process index baseline
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from e2e_stubs import start_stubs, stop_stubs
+from bench_e2e import parse_latency, summarize
+from bench_html_extract import load_corpus
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+FAST_LATENCY_MS = {'site': 20, 'gemini': 20, 'openrouter': 20, 'search': 20, 'youtube': 20}
+QUERIES = ('vector index recall', 'semantic search latency', 'embedding quantization memory',
+           'retrieval ranking benchmark', 'graph cluster shard cache')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until(check, timeout=60.0, what='service'):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except (OSError, httpx.HTTPError):
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f'{what} did not start within {timeout:.0f} s')
+
+
+def start_index_server(env, sock):
+    process = subprocess.Popen([sys.executable, 'index_server.py', '--socket', sock], cwd=SERVICE_DIR, env=env)
+    wait_until(lambda: os.path.exists(sock), what='index server')
+    return process
+
+
+def start_workers(env, workers, port):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=SERVICE_DIR, env=env,
+    )
+    wait_until(lambda: httpx.get(f'http://127.0.0.1:{port}/health/ready', timeout=1).status_code == 200,
+               what=f'uvicorn --workers {workers}')
+    return process
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def drive(base_url, site_url, args, run, rng):
+    """Returns (seconds, {endpoint: latencies}, errors, extracted urls)"""
+    pages = list(load_corpus())
+    jobs = []
+    for i in range(args.requests):
+        if rng.random() < args.recommend_ratio:
+            jobs.append(('/recommend', {'text': rng.choice(QUERIES), 'k': 10}))
+        else:
+            jobs.append(('/extract', {'url': f'{site_url}/page/{rng.choice(pages)}?i={run}-{i}'}))
+
+    latencies = {'/extract': [], '/recommend': []}
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def one(path, body):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, json=body)
+                latencies[path].append(time.perf_counter() - start)
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(path, body) for path, body in jobs))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, errors, [body['url'] for path, body in jobs if path == '/extract']
+
+
+async def misses(base_url, urls, concurrency):
+    """Extracted URLs that /recommend (on whichever worker answers) does not know"""
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def one(url):
+            async with semaphore:
+                return (await client.post('/recommend', json={'url': url, 'k': 1})).status_code == 404
+        return sum(await asyncio.gather(*(one(url) for url in urls)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--recommend-ratio', type=float, default=0.5)
+    parser.add_argument('--latency', nargs='*', metavar='SERVICE=MS', help=f'stub latencies, defaults {FAST_LATENCY_MS}')
+    parser.add_argument('--no-index-server', action='store_true',
+                        help='each worker keeps its own in-process index (only meaningful with one worker)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stubs, stub_env = start_stubs({**FAST_LATENCY_MS, **parse_latency(args.latency)}, jitter=0.25)
+    data_dir = tempfile.mkdtemp(prefix='bench-workers-')
+    sock = os.path.join(data_dir, 'index.sock')
+    env = {
+        **os.environ, **stub_env,
+        'DATA_DIR': data_dir,
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING'),
+        'HTTP_CACHE_PATH': '',
+        'HTTP_PER_HOST_LIMIT': '1000',
+        'NEAR_DUP_MAX_DISTANCE': '-1',  # stub pages of one template are near duplicates
+        'GOOGLE_AI_API_KEY': '',
+        'OPENROUTER_API_KEY': 'bench',
+    }
+    if not args.no_index_server:
+        env['INDEX_SOCKET'] = sock
+    print(f'{os.cpu_count()} CPUs, {args.requests} requests per level, {args.concurrency} in flight, '
+          f'{args.recommend_ratio:.0%} /recommend, index: {"in-process" if args.no_index_server else "shared server"}\n')
+    print(f"{'workers':>7} {'req/s':>8} {'errors':>6} {'extract p50/p95 ms':>20} {'recommend p50/p95 ms':>22} {'misses':>7}")
+
+    index_server = None if args.no_index_server else start_index_server(env, sock)
+    rng = random.Random(args.seed)
+    try:
+        for workers in args.workers:
+            port = free_port()
+            service = start_workers(env, workers, port)
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                elapsed, latencies, errors, urls = asyncio.run(drive(base_url, stubs['site'].url, args, f'w{workers}', rng))
+                missed = asyncio.run(misses(base_url, urls, args.concurrency))
+            finally:
+                stop(service)
+            extract, recommend = summarize(latencies['/extract']), summarize(latencies['/recommend'])
+            print(f"{workers:>7} {args.requests / elapsed:>8.1f} {errors:>6} "
+                  f"{extract.get('p50', 0):>10.1f} / {extract.get('p95', 0):<7.1f} "
+                  f"{recommend.get('p50', 0):>11.1f} / {recommend.get('p95', 0):<8.1f} {missed:>7}")
+    finally:
+        if index_server is not None:
+            stop(index_server)
+        stop_stubs(stubs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Benchmark - structured ytInitialData parsing vs the regex scans it replaced
+#
+# Runs over the saved YouTube pages in benchmarks/corpus/youtube (regenerate
+# with corpus/make_corpus.py; each page has a .expected.json next to it):
+#
+#   results page  regex_search_videos (videoId / title findall zipped by position)
+#                 vs search_videos (ytInitialData, first --limit renderers)
+#   watch page    regex_video_title (three pattern scans) vs video_title (ytInitialPlayerResponse)
+#
+# search_videos decodes only the renderers it returns, straight from the
+# page text (lazy_values); the full-decode rows (orjson / stdlib json, then
+# a walk of the whole tree) are its fallback for unknown layouts and what
+# video_details always does. "correct" counts
+# results whose ID and title match the expected video at that position,
+# "details" those whose duration and channel match too.
+#
+#   python benchmarks/bench_youtube_parser.py [--limit 6] [--repeat 20]
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import youtube_parser
+
+PAGES_DIR = Path(__file__).resolve().parent / 'corpus' / 'youtube'
+FIELDS = ('videoId', 'title', 'duration', 'channel')
+
+
+def load_pages():
+    pages = {}
+    for path in sorted(PAGES_DIR.glob('*.html.gz')):
+        name = path.name.split('.html')[0]
+        expected = json.loads((PAGES_DIR / f'{name}.expected.json').read_text(encoding='utf-8'))
+        pages[name] = gzip.decompress(path.read_bytes()).decode('utf-8'), expected
+    return pages
+
+
+def timed(parse, page, repeat):
+    """Best-of-N wall time in ms"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(page)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def with_decoder(parse, use_orjson):
+    saved = youtube_parser.orjson
+
+    def run(page):
+        youtube_parser.orjson = saved if use_orjson else None
+        try:
+            return parse(page)
+        finally:
+            youtube_parser.orjson = saved
+    return run
+
+
+def full_search(page, limit):
+    """search_videos' fallback path: decode all of ytInitialData, then walk it"""
+    data = youtube_parser.initial_data(page)
+    return youtube_parser._first_videos(youtube_parser.iter_video_renderers(data), limit)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--limit', type=int, default=6, help='videos per results page (search_youtube asks for 6)')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    if youtube_parser.orjson is None:
+        print('orjson not installed - the orjson rows use the stdlib decoder too\n')
+
+    print(f"{'page':<16} {'KB':>5}  {'parser':<24} {'ms':>7} {'correct':>9} {'details':>9}")
+    for name, (page, expected) in load_pages().items():
+        if isinstance(expected, list):
+            expected = expected[:args.limit]
+            candidates = {
+                'regex': lambda p: youtube_parser.regex_search_videos(p, args.limit),
+                'lazy ytInitialData': lambda p: youtube_parser.search_videos(p, args.limit),
+                'full decode (orjson)': with_decoder(lambda p: full_search(p, args.limit), True),
+                'full decode (json)': with_decoder(lambda p: full_search(p, args.limit), False),
+            }
+        else:
+            expected = [expected]
+            candidates = {
+                'regex title': lambda p: [{'videoId': expected[0]['videoId'], 'title': youtube_parser.regex_video_title(p)}],
+                'player response (orjson)': with_decoder(lambda p: [youtube_parser.video_details(p)], True),
+                'player response (json)': with_decoder(lambda p: [youtube_parser.video_details(p)], False),
+            }
+        for label, parse in candidates.items():
+            ms, videos = timed(parse, page, args.repeat)
+            correct = sum(all(got.get(field) == want[field] for field in FIELDS[:2]) for got, want in zip(videos, expected))
+            details = sum(all(got.get(field) == want[field] for field in FIELDS) for got, want in zip(videos, expected))
+            print(f'{name:<16} {len(page.encode("utf-8")) / 1024:>5.0f}  {label:<24} {ms:>7.2f} '
+                  f'{correct:>4}/{len(expected):<4} {details:>4}/{len(expected):<4}')
+        print()
+
+    # The first result set, side by side - regex titles drift because each renderer repeats its videoId
+    page, expected = load_pages()['youtube_results']
+    regex = youtube_parser.regex_search_videos(page, 3)
+    structured = youtube_parser.search_videos(page, 3)
+    for want, got_regex, got in zip(expected, regex, structured):
+        print(f"{want['videoId']}  expected   {want['title']!r}\n{'':13}regex      {got_regex['title']!r}\n"
+              f"{'':13}structured {got['title']!r} ({got['duration']}, {got['channel']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+# Regenerates the saved-page corpus used by bench_html_extract.py
+#
+# Each page mimics the markup of a common site layout (news article, blog with
+# wrapper-div soup, docs page, forum thread, video watch page, product listing,
+# paywall stub) with deterministic filler text. The pages are committed as
+# .html.gz so the benchmark runs offline and results are comparable over time.
+#
+# The youtube/ pages (results and watch page with YouTube's inline JSON
+# state, plus the expected videos as .expected.json) feed
+# bench_youtube_parser.py.
+#
+#   python benchmarks/corpus/make_corpus.py
+import gzip
+import html
+import json
+import random
+from pathlib import Path
+
+CORPUS_DIR = Path(__file__).resolve().parent
+
+WORDS = """vector search embedding index query latency recall cluster memory cache
+model training dataset article research network server request response parser
+stream pipeline throughput benchmark database storage compression token language
+system design performance scaling replica shard consistency algorithm graph
+neighbor distance metric quantization product engineer team release feature""".split()
+
+
+def sentence(rng, lo=8, hi=22):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(lo, hi))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def paragraph(rng, sentences=4):
+    return ' '.join(sentence(rng) for _ in range(rng.randint(sentences - 1, sentences + 2)))
+
+
+def head(title, description=None, og=True, scripts=2, script_kb=4, rng=None):
+    meta = [f'<meta charset="utf-8"><title>{html.escape(title)}</title>']
+    if description:
+        meta.append(f'<meta name="description" content="{html.escape(description)}">')
+        if og:
+            meta.append(f'<meta property="og:title" content="{html.escape(title)}">')
+            meta.append(f'<meta property="og:description" content="{html.escape(description)}">')
+    meta.append('<link rel="stylesheet" href="/static/site.css">')
+    meta.append('<style>' + '.c{margin:0;padding:0} ' * 200 + '</style>')
+    for i in range(scripts):
+        blob = ','.join(f'"k{j}":"{sentence(rng)}"' for j in range(script_kb * 8))
+        meta.append(f'<script>window.__DATA_{i}__ = {{{blob}}}; if (a < b && c > d) {{ render("<p>x</p>"); }}</script>')
+    return '<head>' + '\n'.join(meta) + '</head>'
+
+
+def site_chrome(rng):
+    links = ''.join(f'<li><a href="/s/{w}">{w.title()}</a></li>' for w in rng.sample(WORDS, 12))
+    header = f'<header class="site-header"><div class="logo">Daily Vector</div><nav><ul>{links}</ul></nav></header>'
+    footer = ('<footer><div class="footer-cols">'
+              + ''.join(f'<div><h4>{w.title()}</h4><p>{sentence(rng)}</p></div>' for w in rng.sample(WORDS, 4))
+              + '</div><p>&copy; 2024 Daily Vector. All rights reserved.</p></footer>')
+    return header, footer
+
+
+def news_article(rng):
+    header, footer = site_chrome(rng)
+    body = [f'<h1>{sentence(rng, 6, 10)}</h1>',
+            f'<div class="byline"><span>By Jane Doe</span> <time>June 3, 2024</time></div>']
+    for i in range(14):
+        body.append(f'<p>{paragraph(rng)} <a href="/related/{i}">Read more</a> about {rng.choice(WORDS)}.</p>')
+        if i % 5 == 4:
+            body.append(f'<figure><img src="/img/{i}.jpg"><figcaption>{sentence(rng)}</figcaption></figure>')
+            body.append(f'<h2>{sentence(rng, 4, 8)}</h2>')
+    aside = '<aside class="related"><h3>Related</h3><ul>' + ''.join(
+        f'<li><a href="/a/{i}">{sentence(rng, 6, 10)}</a></li>' for i in range(8)) + '</ul></aside>'
+    return (f'<!DOCTYPE html><html lang="en">{head(sentence(rng, 6, 10), sentence(rng), rng=rng, scripts=4)}<body>'
+            f'{header}<div class="page"><article class="story">{"".join(body)}</article>{aside}</div>{footer}</body></html>')
+
+
+def wrapped(inner, depth, rng):
+    for d in range(depth):
+        inner = f'<div class="wrap-{d} {rng.choice(WORDS)}"><span class="inner">{inner}</span></div>'
+    return inner
+
+
+def blog_nested_divs(rng):
+    """Page-builder markup: every paragraph sits under several wrapper divs and spans"""
+    header, footer = site_chrome(rng)
+    blocks = []
+    for i in range(40):
+        text = f'<span class="text">{paragraph(rng, 3)}</span>'
+        if i % 3 == 0:
+            text += f' <span class="note"><em>{sentence(rng)}</em></span>'
+        blocks.append(wrapped(text, rng.randint(2, 6), rng))
+    sidebar = '<div class="sidebar">' + ''.join(f'<div class="widget"><p>{sentence(rng)}</p></div>' for _ in range(10)) + '</div>'
+    return (f'<html>{head(sentence(rng, 5, 9), sentence(rng), og=False, rng=rng)}<body>{header}'
+            f'<div id="page"><div class="row"><div class="col"><div class="post-content">{"".join(blocks)}</div></div>'
+            f'{sidebar}</div></div>{footer}</body></html>')
+
+
+def docs_page(rng):
+    sections = []
+    for s in range(10):
+        items = ''.join(f'<li><code>{rng.choice(WORDS)}()</code> - {sentence(rng)}</li>' for _ in range(5))
+        rows = ''.join(f'<tr><td>{rng.choice(WORDS)}</td><td>{sentence(rng)}</td></tr>' for _ in range(4))
+        sections.append(f'<section id="s{s}"><h2>{sentence(rng, 3, 6)}</h2><p>{paragraph(rng)}</p><ul>{items}</ul>'
+                        f'<pre><code>index = build({rng.choice(WORDS)}, k=10)\nresult = index.search(query)</code></pre>'
+                        f'<table><tbody>{rows}</tbody></table></section>')
+    toc = '<nav class="toc"><ol>' + ''.join(f'<li><a href="#s{i}">{sentence(rng, 3, 5)}</a></li>' for i in range(10)) + '</ol></nav>'
+    return (f'<html>{head(sentence(rng, 3, 6), sentence(rng), rng=rng, scripts=1)}<body>{toc}'
+            f'<main><h1>{sentence(rng, 3, 6)}</h1>{"".join(sections)}</main></body></html>')
+
+
+def forum_thread(rng):
+    """No article/main - content hangs off a generic .content container, replies nest deeply"""
+    def post(depth):
+        replies = ''.join(post(depth + 1) for _ in range(rng.randint(0, 2))) if depth < 4 else ''
+        return (f'<div class="post"><div class="meta"><span class="user">user{rng.randint(1, 999)}</span>'
+                f'<span class="score">{rng.randint(1, 500)} points</span></div>'
+                f'<div class="body"><p>{paragraph(rng, 2)}</p></div><div class="replies">{replies}</div></div>')
+    posts = ''.join(post(0) for _ in range(20))
+    return (f'<html>{head(sentence(rng, 6, 10), None, rng=rng, scripts=2)}<body>'
+            f'<div id="top"><a href="/">forum</a> | <a href="/new">new</a></div>'
+            f'<div class="content"><h1>{sentence(rng, 6, 10)}</h1>{posts}</div></body></html>')
+
+
+def video_watch(rng):
+    """Watch page: megabytes of inline player state, almost no visible text"""
+    blob = ','.join(f'{{"videoId":"v{i:05d}","title":"{sentence(rng)}","views":{rng.randint(1, 10**7)}}}' for i in range(6000))
+    scripts = (f'<script>var ytInitialPlayerResponse = {{"videoDetails":{{"shortDescription":"{paragraph(rng)}"}}}};</script>'
+               f'<script>var ytInitialData = {{"contents":[{blob}]}};</script>')
+    description = paragraph(rng)
+    return (f'<html>{head(sentence(rng, 5, 9), description, rng=rng, scripts=6, script_kb=16)}<body>'
+            f'<div id="player"></div>{scripts}<div id="masthead"><span>Search</span></div>'
+            f'<div id="meta"><h1><span>{sentence(rng, 5, 9)}</span></h1></div></body></html>')
+
+
+def product_listing(rng):
+    """Large page of small cards - every card is a short span soup"""
+    cards = ''.join(
+        f'<li class="card"><div class="card-body"><a href="/p/{i}"><span class="name">{sentence(rng, 3, 6)}</span></a>'
+        f'<span class="price">${rng.randint(5, 500)}.99</span><div class="desc"><span>{sentence(rng, 10, 20)}</span></div>'
+        f'<div class="rating"><span>{rng.randint(1, 5)} stars</span><span>({rng.randint(1, 9000)} reviews)</span></div></div></li>'
+        for i in range(3000))
+    header, footer = site_chrome(rng)
+    return (f'<html>{head("Products - " + sentence(rng, 2, 4), sentence(rng), rng=rng, scripts=8, script_kb=8)}'
+            f'<body>{header}<div role="main"><h1>Search results</h1><ul class="grid">{cards}</ul></div>{footer}</body></html>')
+
+
+def paywall_stub(rng):
+    """Teaser only - extraction has to fall back to the meta description"""
+    header, footer = site_chrome(rng)
+    return (f'<html>{head(sentence(rng, 6, 10), paragraph(rng, 2), rng=rng)}<body>{header}'
+            f'<article><h1>{sentence(rng, 6, 10)}</h1><div class="paywall"><p>Subscribe to continue.</p></div></article>'
+            f'{footer}</body></html>')
+
+
+CHANNELS = ('Vector Labs', 'Search Engineering Daily', 'Café Systems', 'Q&A with Quinn', 'Index Internals')
+TITLE_TEMPLATES = ('{} explained in {} minutes', 'Why "{}" beats everything ({} min)', '{} & friends - part {}',
+                   "Don't ship {} before watching this #{}", '{} — a deep dive, episode {}')
+
+
+def video_id(rng):
+    return ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_') for _ in range(11))
+
+
+def video_title(rng):
+    return rng.choice(TITLE_TEMPLATES).format(sentence(rng, 2, 4).rstrip('.'), rng.randint(2, 59))
+
+
+def length_text(seconds):
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}' if seconds >= 3600 else f'{seconds // 60}:{seconds % 60:02d}'
+
+
+def yt_text(value, runs=True):
+    return {'runs': [{'text': value}]} if runs else {'simpleText': value}
+
+
+def yt_json(data):
+    """Serialized the way YouTube inlines it: compact, UTF-8, & and < escaped"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('&', '\\u0026').replace('<', '\\u003c')
+
+
+def tracking(rng, n):
+    return [{'service': rng.choice(('GFEEDBACK', 'CSI', 'GUIDED_HELP', 'ECATCHER')),
+             'params': [{'key': f'k{i}', 'value': rng.randbytes(24).hex()} for i in range(8)]} for _ in range(n)]
+
+
+def watch_endpoint(vid, rng):
+    return {'clickTrackingParams': rng.randbytes(40).hex(), 'commandMetadata': {'webCommandMetadata': {
+        'url': f'/watch?v={vid}', 'webPageType': 'WEB_PAGE_TYPE_WATCH', 'rootVe': 3832}},
+        'watchEndpoint': {'videoId': vid, 'params': rng.randbytes(12).hex()}}
+
+
+def video_renderer(rng, vid, title, channel, seconds):
+    """A search result as YouTube sends it - the ID repeats in the nested endpoints"""
+    length = length_text(seconds)
+    return {
+        'videoId': vid,
+        'thumbnail': {'thumbnails': [{'url': f'https://i.ytimg.com/vi/{vid}/hq720.jpg?sqp={rng.randbytes(30).hex()}',
+                                      'width': w, 'height': w * 9 // 16} for w in (360, 720)]},
+        'title': {'runs': [{'text': title}], 'accessibility': {'accessibilityData': {
+            'label': f'{title} by {channel} {seconds // 60} minutes'}}},
+        'longBylineText': yt_text(channel),
+        'publishedTimeText': yt_text(f'{rng.randint(1, 11)} months ago', runs=False),
+        'lengthText': {'accessibility': {'accessibilityData': {'label': f'{seconds // 60} minutes'}}, 'simpleText': length},
+        'viewCountText': yt_text(f'{rng.randint(1, 999):,} views', runs=False),
+        'navigationEndpoint': watch_endpoint(vid, rng),
+        'ownerText': yt_text(channel),
+        'detailedMetadataSnippets': [{'snippetText': {'runs': [{'text': sentence(rng)}, {'text': rng.choice(WORDS), 'bold': True},
+                                                               {'text': sentence(rng)}]}}],
+        'thumbnailOverlays': [{'thumbnailOverlayTimeStatusRenderer': {'text': {'simpleText': length}, 'style': 'DEFAULT'}},
+                              {'thumbnailOverlayToggleButtonRenderer': {'toggledServiceEndpoint': {
+                                  'playlistEditEndpoint': {'playlistId': 'WL', 'actions': [{'addedVideoId': vid}]}}}}],
+        'inlinePlaybackEndpoint': watch_endpoint(vid, rng),
+        'trackingParams': rng.randbytes(64).hex(),
+    }
+
+
+def youtube_results(rng):
+    """Results page: ytcfg + ytInitialData with a channel, shorts shelf and a 'related' shelf between the videos"""
+    videos, items = [], []
+
+    def add_video():
+        seconds = rng.randint(60, 5400)
+        video = {'videoId': video_id(rng), 'title': video_title(rng), 'duration': length_text(seconds),
+                 'channel': rng.choice(CHANNELS)}
+        videos.append(video)
+        return {'videoRenderer': video_renderer(rng, video['videoId'], video['title'], video['channel'], seconds)}
+
+    items.append({'channelRenderer': {'channelId': 'UC' + video_id(rng), 'title': yt_text(CHANNELS[0], runs=False),
+                                      'descriptionSnippet': yt_text(sentence(rng))}})
+    for _ in range(3):
+        items.append(add_video())
+    items.append({'reelShelfRenderer': {'title': yt_text('Shorts', runs=False), 'items': [
+        {'reelItemRenderer': {'videoId': video_id(rng), 'headline': yt_text(sentence(rng, 3, 6), runs=False)}}
+        for _ in range(8)]}})
+    for _ in range(4):
+        items.append(add_video())
+    items.append({'shelfRenderer': {'title': yt_text('People also watched', runs=False), 'content': {
+        'verticalListRenderer': {'items': [add_video() for _ in range(4)]}}}})
+    for _ in range(12):
+        items.append(add_video())
+    data = {
+        'responseContext': {'serviceTrackingParams': tracking(rng, 40)},
+        'estimatedResults': str(rng.randint(10**5, 10**7)),
+        'contents': {'twoColumnSearchResultsRenderer': {'primaryContents': {'sectionListRenderer': {
+            'contents': [{'itemSectionRenderer': {'contents': items}},
+                         {'continuationItemRenderer': {'continuationEndpoint': {'continuationCommand': {
+                             'token': rng.randbytes(400).hex()}}}}],
+            'subMenu': {'searchSubMenuRenderer': {'groups': [{'searchFilterGroupRenderer': {
+                'title': yt_text(group, runs=False),
+                'filters': [{'searchFilterRenderer': {'label': yt_text(rng.choice(WORDS), runs=False)}} for _ in range(6)]}}
+                for group in ('Upload date', 'Type', 'Duration', 'Features', 'Sort by')]}}}}}},
+        'header': {'searchHeaderRenderer': {'chipBar': {'chipCloudRenderer': {'chips': [
+            {'chipCloudChipRenderer': {'text': yt_text(w)}} for w in rng.sample(WORDS, 10)]}}}},
+        'topbar': {'desktopTopbarRenderer': {'searchbox': {'fusionSearchboxRenderer': {
+            'placeholderText': yt_text('Search')}}, 'trackingParams': rng.randbytes(64).hex()}},
+        'frameworkUpdates': {'entityBatchUpdate': {'mutations': [
+            {'entityKey': rng.randbytes(32).hex(), 'payload': {'macroMarkersListEntity': {'markersList': {
+                'markers': [{'startMillis': str(rng.randint(0, 10**6)), 'intensityScoreNormalized': rng.random()}
+                            for _ in range(40)]}}}} for _ in range(60)]}},
+    }
+    page = (f'<!DOCTYPE html><html lang="en">{head("vector search - YouTube", None, rng=rng, scripts=12, script_kb=32)}'
+            f'<body><div id="content"></div><script nonce="x">var ytInitialData = {yt_json(data)};</script>'
+            f'<script nonce="x">if (window.ytcsi) {{window.ytcsi.tick("pdr", null, "");}}</script></body></html>')
+    return page, videos[:20]
+
+
+def youtube_watch(rng):
+    """Watch page: a large ytInitialPlayerResponse (stream formats) followed by the sidebar's ytInitialData"""
+    vid, title, channel, seconds = video_id(rng), video_title(rng), rng.choice(CHANNELS), rng.randint(60, 5400)
+    formats = [{'itag': 133 + i, 'mimeType': 'video/mp4; codecs="avc1.4d401e"', 'bitrate': rng.randint(10**5, 10**7),
+                'signatureCipher': f's={rng.randbytes(300).hex()}&sp=sig&url=https://rr1.example/videoplayback?' + rng.randbytes(400).hex()}
+               for i in range(40)]
+    player = {
+        'responseContext': {'serviceTrackingParams': tracking(rng, 20)},
+        'streamingData': {'expiresInSeconds': '21540', 'adaptiveFormats': formats},
+        'videoDetails': {'videoId': vid, 'title': title, 'lengthSeconds': str(seconds), 'keywords': rng.sample(WORDS, 12),
+                         'channelId': 'UC' + video_id(rng), 'shortDescription': paragraph(rng, 6), 'author': channel,
+                         'viewCount': str(rng.randint(1000, 10**7))},
+        'microformat': {'playerMicroformatRenderer': {'title': yt_text(title, runs=False), 'description': yt_text(paragraph(rng), runs=False)}},
+    }
+    related = {'contents': {'twoColumnWatchNextResults': {'secondaryResults': {'secondaryResults': {'results': [
+        {'compactVideoRenderer': {'videoId': v, 'title': yt_text(video_title(rng), runs=False),
+                                  'longBylineText': yt_text(rng.choice(CHANNELS)),
+                                  'navigationEndpoint': watch_endpoint(v, rng)}}
+        for v in (video_id(rng) for _ in range(20))]}}}}}
+    page = (f'<!DOCTYPE html><html lang="en">{head(title + " - YouTube", paragraph(rng), rng=rng, scripts=12, script_kb=32)}'
+            f'<body><div id="player"></div>'
+            f'<script nonce="x">var ytInitialPlayerResponse = {yt_json(player)};var meta = document.createElement(\'meta\');</script>'
+            f'<script nonce="x">var ytInitialData = {yt_json(related)};</script></body></html>')
+    return page, {'videoId': vid, 'title': title, 'duration': length_text(seconds), 'channel': channel}
+
+
+YOUTUBE_PAGES = {
+    'youtube_results': youtube_results,
+    'youtube_watch': youtube_watch,
+}
+
+PAGES = {
+    'news_article': news_article,
+    'blog_nested_divs': blog_nested_divs,
+    'docs_page': docs_page,
+    'forum_thread': forum_thread,
+    'video_watch': video_watch,
+    'product_listing': product_listing,
+    'paywall_stub': paywall_stub,
+}
+
+
+def main():
+    for seed, (name, build) in enumerate(PAGES.items()):
+        page = build(random.Random(seed)).encode('utf-8')
+        path = CORPUS_DIR / f'{name}.html.gz'
+        # mtime=0 keeps the gzip bytes stable across regenerations
+        path.write_bytes(gzip.compress(page, mtime=0))
+        print(f'{path.name:<28} {len(page) / 1024:>8.0f} KB')
+    (CORPUS_DIR / 'youtube').mkdir(exist_ok=True)
+    for seed, (name, build) in enumerate(YOUTUBE_PAGES.items()):
+        page, expected = build(random.Random(seed))
+        path = CORPUS_DIR / 'youtube' / f'{name}.html.gz'
+        path.write_bytes(gzip.compress(page.encode('utf-8'), mtime=0))
+        (CORPUS_DIR / 'youtube' / f'{name}.expected.json').write_text(json.dumps(expected, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        print(f'youtube/{path.name:<20} {len(page.encode("utf-8")) / 1024:>8.0f} KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# Local stand-ins for every service /extract talks to, with configurable latency
+#
+# One threaded HTTP server per service, each serving saved fixtures
+# (benchmarks/fixtures, the HTML corpus for article pages):
+#
+#   site        GET  /page/<corpus name>?i=N   article pages (unique text per i, ETag / 304)
+#   gemini      POST /v1beta/models/<model>:generateContent   (google-generativeai REST transport)
+#   openrouter  POST /chat/completions
+#   search      GET  /search?q=&max_results=   DuckDuckGo-shaped JSON results (WEB_SEARCH_URL)
+#   youtube     GET  /results?search_query=, GET /watch?v=
+#
+# Used by bench_e2e.py; start_stubs() returns the servers and the environment
+# variables that point app.py at them.
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from bench_html_extract import load_corpus
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+DEFAULT_LATENCY_MS = {'site': 150, 'gemini': 900, 'openrouter': 1100, 'search': 400, 'youtube': 250}
+
+# Vocabulary the fake LLM builds search keywords from, so every distinct page gets its own query
+KEYWORD_WORDS = ('vector index recall latency quantization graph embedding cluster shard cache '
+                 'retrieval ranking semantic search benchmark throughput memory').split()
+
+# Where the per-request marker paragraph goes - the first main-content container, else <body>
+CONTENT_MARKERS = ('<article', '<main', 'role="main"', 'class="post-content"', 'class="content"', '<body')
+
+
+def fixture(name):
+    return (FIXTURES_DIR / name).read_text(encoding='utf-8')
+
+
+def fake_analysis(prompt):
+    """The analysis fixture with a title / keywords derived from the prompt (same prompt, same answer)"""
+    digest = hashlib.sha1(prompt.encode('utf-8')).digest()
+    keywords = ' '.join(KEYWORD_WORDS[b % len(KEYWORD_WORDS)] for b in digest[:4])
+    return fixture('gemini_analysis.txt').replace('{title}', f'Vector search notes {digest.hex()[:8]}').replace('{keywords}', keywords)
+
+
+def mark_page(page, token):
+    """Insert a paragraph unique to `token` at the top of the page's main content"""
+    text = page.decode('utf-8')
+    for marker in CONTENT_MARKERS:
+        at = text.find(marker)
+        if at >= 0:
+            end = text.index('>', at) + 1
+            note = f'<p>Reference {token}: this copy of the page was served for one benchmark request only.</p>'
+            return (text[:end] + note + text[end:]).encode('utf-8')
+    return page
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded server that sleeps latency_ms (log-normal jitter) before every answer"""
+
+    daemon_threads = True
+
+    def __init__(self, name, handler, latency_ms, jitter, seed=0):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def delay(self):
+        with self._lock:
+            self.requests += 1
+            factor = self._rng.lognormvariate(0, self.jitter) if self.jitter else 1.0
+        time.sleep(self.latency_ms * factor / 1000)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, content_type, status=200, headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the streaming fetcher stops reading once it has enough text
+
+    def read_json(self):
+        return json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+
+def site_handler(pages):
+    class Handler(StubHandler):
+        def do_GET(self):
+            self.server.delay()
+            url = urlparse(self.path)
+            name = url.path.rsplit('/', 1)[-1]
+            if name not in pages:
+                return self.send_body('not found', 'text/plain', 404)
+            token = parse_qs(url.query).get('i', ['0'])[0]
+            etag = f'"{name}-{token}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                return self.end_headers()
+            self.send_body(mark_page(pages[name], token), 'text/html; charset=utf-8',
+                           headers={'ETag': etag, 'Cache-Control': 'max-age=0'})
+    return Handler
+
+
+class GeminiHandler(StubHandler):
+    def do_POST(self):
+        self.server.delay()
+        body = self.read_json()
+        prompt = ''.join(part.get('text', '') for content in body.get('contents', []) for part in content.get('parts', []))
+        self.send_body(json.dumps({
+            'candidates': [{'content': {'parts': [{'text': fake_analysis(prompt)}], 'role': 'model'},
+                            'finishReason': 'STOP', 'index': 0}],
+        }), 'application/json')
+
+
+class OpenRouterHandler(StubHandler):
+    def do_POST(self):
+        self.server.delay()
+        body = self.read_json()
+        prompt = ''.join(m.get('content', '') for m in body.get('messages', []))
+        self.send_body(json.dumps({
+            'id': 'stub', 'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': fake_analysis(prompt)}}],
+        }), 'application/json')
+
+
+class SearchHandler(StubHandler):
+    def do_GET(self):
+        self.server.delay()
+        query = parse_qs(urlparse(self.path).query)
+        limit = int(query.get('max_results', ['18'])[0])
+        self.send_body(json.dumps(json.loads(fixture('search_results.json'))[:limit]), 'application/json')
+
+
+class YouTubeHandler(StubHandler):
+    def do_GET(self):
+        self.server.delay()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/results':
+            page = fixture('youtube_search.html').replace('{query}', query.get('search_query', [''])[0])
+        elif url.path == '/watch':
+            video_id = query.get('v', ['stub'])[0]
+            title = re.sub(r'[^\w ]', '', f'Vector search deep dive {video_id}')
+            page = fixture('youtube_watch.html').replace('{title}', title).replace('{video_id}', video_id)
+        else:
+            return self.send_body('not found', 'text/plain', 404)
+        self.send_body(page, 'text/html; charset=utf-8')
+
+
+def start_stubs(latency_ms=None, jitter=0.25):
+    """Start every stub; returns ({service: server}, {env var: value} pointing app.py at them)"""
+    latency_ms = {**DEFAULT_LATENCY_MS, **(latency_ms or {})}
+    handlers = {
+        'site': site_handler(load_corpus()),
+        'gemini': GeminiHandler,
+        'openrouter': OpenRouterHandler,
+        'search': SearchHandler,
+        'youtube': YouTubeHandler,
+    }
+    servers = {name: StubServer(name, handler, latency_ms[name], jitter, seed=i).start()
+               for i, (name, handler) in enumerate(handlers.items())}
+    youtube_host = urlparse(servers['youtube'].url).netloc
+    env = {
+        'GEMINI_API_ENDPOINT': servers['gemini'].url,
+        'OPENROUTER_API_URL': f"{servers['openrouter'].url}/chat/completions",
+        'WEB_SEARCH_URL': f"{servers['search'].url}/search",
+        'YOUTUBE_BASE_URL': servers['youtube'].url,
+        'YOUTUBE_HOSTS': youtube_host,
+    }
+    return servers, env
+
+
+def stop_stubs(servers):
+    for server in servers.values():
+        server.shutdown()
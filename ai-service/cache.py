@@ -0,0 +1,203 @@
+# In-process TTL/LRU cache with an optional SQLite disk tier and stale-while-revalidate
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries are fresh for `ttl` seconds,
+    then served stale for up to `stale_ttl` more while a refresh runs
+
+    With `max_bytes` set, entries are also evicted once their approximate
+    (JSON-encoded) size passes the budget. Values must be JSON-serializable
+    when `disk_path` or `max_bytes` is set.
+    """
+
+    def __init__(self, name, max_size=1024, ttl=3600, stale_ttl=0, disk_path=None, disk_max_size=None, max_bytes=None):
+        self.name = name
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.disk_max_size = disk_max_size or max_size * 10
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._disk_writes = 0
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._sizes = {}
+        self._bytes = 0
+        self._refreshing = {}
+        self._db = None
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'disk_hits': 0, 'evictions': 0, 'refreshes': 0}
+
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)')
+            self._db.commit()
+
+    def _state(self, stored_at, now):
+        age = now - stored_at
+        if age < self.ttl:
+            return 'fresh'
+        if age < self.ttl + self.stale_ttl:
+            return 'stale'
+        return None
+
+    def _load_from_disk(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute('SELECT value, stored_at FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _remember(self, key, value, stored_at):
+        self._forget(key)
+        self._entries[key] = (value, stored_at)
+        if self.max_bytes:
+            self._sizes[key] = len(json.dumps(value))
+            self._bytes += self._sizes[key]
+        while len(self._entries) > self.max_size or (self.max_bytes and self._bytes > self.max_bytes and len(self._entries) > 1):
+            self._forget(next(iter(self._entries)))
+            self.counters['evictions'] += 1
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        self._bytes -= self._sizes.pop(key, 0)
+
+    def lookup(self, key):
+        """Return (value, 'fresh' | 'stale') or (None, None) on a miss"""
+        now = time.time()
+        entry = self._entries.get(key)
+        from_disk = False
+        if entry is None:
+            entry = self._load_from_disk(key)
+            from_disk = entry is not None
+
+        if entry is not None:
+            value, stored_at = entry
+            state = self._state(stored_at, now)
+            if state is not None:
+                if from_disk:
+                    self.counters['disk_hits'] += 1
+                self._remember(key, value, stored_at)
+                self.counters['hits' if state == 'fresh' else 'stale_hits'] += 1
+                return value, state
+            self.delete(key)
+
+        self.counters['misses'] += 1
+        return None, None
+
+    def set(self, key, value):
+        now = time.time()
+        self._remember(key, value, now)
+        if self._db is not None:
+            self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (key, json.dumps(value), now))
+            self._disk_writes += 1
+            if self._disk_writes % 100 == 0:
+                self._prune_disk()
+            self._db.commit()
+
+    def _prune_disk(self):
+        # Drop the oldest rows beyond disk_max_size
+        self._db.execute(
+            'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (self.disk_max_size,)
+        )
+
+    def delete(self, key):
+        self._forget(key)
+        if self._db is not None:
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._db.commit()
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self._bytes = 0
+        if self._db is not None:
+            self._db.execute('DELETE FROM entries')
+            self._db.commit()
+
+    async def get_or_load(self, key, loader, keep=None):
+        """
+        Return the cached value for `key`, awaiting `loader()` on a miss
+        Stale entries are returned immediately and refreshed in the background
+        Loaded values for which keep(value) is false are returned but not cached
+        (a refresh that yields one leaves the stale entry in place)
+        """
+        value, state = self.lookup(key)
+        if state == 'fresh':
+            return value
+        if state == 'stale':
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.ensure_future(self._refresh(key, loader, keep))
+            return value
+
+        value = await loader()
+        if keep is None or keep(value):
+            self.set(key, value)
+        return value
+
+    async def _refresh(self, key, loader, keep=None):
+        try:
+            value = await loader()
+            if keep is not None and not keep(value):
+                return
+            self.set(key, value)
+            self.counters['refreshes'] += 1
+        except Exception as e:
+            log.warning('cache_refresh_failed', cache=self.name, key=key, error=str(e))
+        finally:
+            self._refreshing.pop(key, None)
+
+    def stats(self):
+        lookups = self.counters['hits'] + self.counters['stale_hits'] + self.counters['misses']
+        hit_rate = (self.counters['hits'] + self.counters['stale_hits']) / lookups if lookups else 0.0
+        return {
+            'name': self.name,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'bytes': self._bytes if self.max_bytes else None,
+            'disk': self._db is not None,
+            **self.counters,
+            'hit_rate': round(hit_rate, 4),
+        }
+
+    def close(self):
+        for task in self._refreshing.values():
+            task.cancel()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one in-flight computation
+    Every caller gets the leader's result (or exception); a cancelled caller
+    does not cancel the shared work
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {'in_flight': len(self._calls), 'leaders': self.leaders, 'followers': self.followers}
@@ -0,0 +1,125 @@
+# Content index - the vector store, analysed-page records and near-duplicate fingerprints behind one interface
+import asyncio
+import os
+
+from logs import get_logger
+from near_duplicates import SimHashIndex
+from vector_store import VectorStore, DEFAULT_TIERS, parse_tiers
+
+log = get_logger(__name__)
+
+
+class ContentIndex:
+    """
+    In-process index used by app.py (one worker) and by index_server.py
+    (shared by many workers through IndexClient, which has the same async
+    methods). Records are the vector metadata, so the url -> record map
+    and the SimHash index are rebuilt from the store on startup.
+    """
+
+    def __init__(self, vector_store, max_distance=6):
+        self.store = vector_store
+        self.near_duplicates = SimHashIndex(max_distance=max(max_distance, 0))
+        # url -> analysis record, rebuilt from the vector metadata so it always matches the index
+        self.records = {}
+        for vector_id, record in sorted(vector_store.metadata.items()):
+            if record and record.get('url'):
+                self._remember(vector_id, record)
+
+    @classmethod
+    def from_env(cls, dimension, data_dir):
+        """VECTOR_* / NEAR_DUP_* environment variables; durable under data_dir unless VECTOR_STORE_DIR is set empty"""
+        persist_dir = os.getenv('VECTOR_STORE_DIR', str(data_dir / 'vector_store'))
+        store = VectorStore(
+            dimension=dimension,
+            persist_dir=persist_dir or None,
+            mmap=os.getenv('VECTOR_STORE_MMAP', '1') == '1',
+            metric=os.getenv('VECTOR_METRIC', 'l2'),
+            tiers=parse_tiers(os.getenv('VECTOR_TIERS', '')) or DEFAULT_TIERS,
+            nprobe=int(os.getenv('VECTOR_NPROBE', 16)),
+            ef_search=int(os.getenv('VECTOR_EF_SEARCH', 64)),
+            storage=os.getenv('VECTOR_STORAGE', 'float32'),
+            pq_m=int(os.getenv('VECTOR_PQ_M', 48)),
+            rerank=int(os.getenv('VECTOR_RERANK', 0)),
+            wal_sync_interval=float(os.getenv('VECTOR_WAL_SYNC_INTERVAL', 0))
+        )
+        return cls(store, max_distance=int(os.getenv('NEAR_DUP_MAX_DISTANCE', 6)))
+
+    def _remember(self, vector_id, record):
+        self.records[record['url']] = {'id': vector_id, **record}
+        if record.get('simhash'):
+            self.near_duplicates.add(record['url'], int(record['simhash'], 16))
+
+    @property
+    def metric(self):
+        return self.store.metric
+
+    @property
+    def dimension(self):
+        return self.store.dimension
+
+    async def add(self, url, embedding, record):
+        """Store (or replace) the vector and record for `url`, returns its vector ID"""
+        # The WAL append fsyncs - off the event loop
+        vector_id = await asyncio.to_thread(self.store.upsert, url, embedding, record)
+        self._remember(vector_id, {**record, 'url': url})
+        return vector_id
+
+    async def attach(self, url, fields):
+        """Merge extra fields (e.g. recommendations) into the record stored for `url`; False if none is"""
+        vector_id = self.store.get_id(url)
+        if vector_id is None or not await asyncio.to_thread(self.store.update_metadata, vector_id, fields):
+            return False
+        if url in self.records:
+            self.records[url] = {**self.records[url], **fields}
+        return True
+
+    async def find_duplicate(self, url, fingerprint):
+        """(record, bit distance) of another stored page with (almost) the same content, else None"""
+        match = self.near_duplicates.query(fingerprint, exclude=url)
+        if match is None or match[0] not in self.records:
+            return None
+        return self.records[match[0]], match[1]
+
+    async def similar(self, k, where=None, url=None, vector=None):
+        """
+        Up to k (vector ID, distance, record) closest to the stored `url`
+        (itself excluded) or to `vector`; None when `url` is not stored
+        """
+        exclude = None
+        if url is not None:
+            exclude = self.store.get_id(url)
+            if exclude is None:
+                return None
+            vector = self.store.get_vector(exclude)
+        # One extra neighbour: the query item itself comes back first
+        ids, distances = await asyncio.to_thread(self.store.search, vector, k + (exclude is not None), where=where)
+        results = []
+        for vector_id, distance in zip(ids[0], distances[0]):
+            record = self.store.get_metadata(vector_id) if vector_id >= 0 else None
+            if record is None or vector_id == exclude:
+                continue
+            # Stored recommendations are only for near-duplicate reuse - keep search results small
+            results.append((int(vector_id), float(distance),
+                            {field: value for field, value in record.items() if field != 'recommendations'}))
+        return results[:k]
+
+    async def stats(self):
+        return {'vector_store': self.store.stats(), 'near_duplicates': self.near_duplicates.stats()}
+
+    async def compact(self):
+        """Rebuild the index without removed vectors (runs in the background)"""
+        self.store.compact()
+        return self.store.stats()
+
+    async def snapshot_periodically(self, interval):
+        """Snapshot the vector store every `interval` seconds when it changed"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.store.snapshot)
+            except Exception as e:
+                log.exception('vector_snapshot_failed', error=str(e))
+
+    async def close(self):
+        await asyncio.to_thread(self.store.close)
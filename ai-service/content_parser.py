@@ -0,0 +1,213 @@
+# Single-pass main-content extraction - lxml parser events, no DOM tree
+from lxml import etree
+
+# Subtrees that never hold article text (same set the BeautifulSoup path decomposes)
+SKIP_TAGS = {'script', 'style', 'nav', 'footer', 'header', 'aside', 'noscript', 'iframe', 'template', 'svg'}
+
+# Elements whose text is collected - the BeautifulSoup extractor's find_all list
+TEXT_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'li', 'span', 'div'}
+# ...when they have at most this many descendant elements (more looks like a container)
+MAX_DESCENDANTS = 5
+
+# Main-content containers in priority order: (tag, attribute, value) - the first element
+# matching the highest-priority rule wins, falling back to the whole body
+CONTENT_RULES = [
+    ('article', None, None),
+    ('main', None, None),
+    (None, 'role', 'main'),
+    (None, 'class', 'article-body'),
+    (None, 'class', 'story-body'),
+    (None, 'class', 'post-content'),
+    (None, 'class', 'entry-content'),
+    (None, 'id', 'article-body'),
+    (None, 'class', 'content'),
+]
+# Extra rule bit every element has: the whole-page fallback
+BODY_BIT = 1 << len(CONTENT_RULES)
+
+# Elements with less text than this are navigation crumbs, captions, buttons...
+MIN_BLOCK_CHARS = 30
+
+
+def _matches(rule, tag, attrib):
+    rule_tag, name, value = rule
+    if rule_tag is not None:
+        return tag == rule_tag
+    if name == 'class':
+        return value in attrib.get('class', '').split()
+    return attrib.get(name) == value
+
+
+class ContentParser:
+    """
+    lxml parser target: start/end/data callbacks arrive in document order.
+    Selects the same elements as the BeautifulSoup extractor - TEXT_TAGS
+    with at most MAX_DESCENDANTS descendants and more than MIN_BLOCK_CHARS
+    of text, inside the highest-priority content container - but keeps
+    only the outermost of nested selections: an inner element's text is
+    already part of its selected ancestor's, so bs4 emitted it twice.
+    Feed it the whole page or chunk by chunk.
+
+    After close(): .title, .description and .blocks(). has_enough() tells
+    a streaming caller when more input cannot change the metadata and would
+    only add text past its budget
+    """
+
+    def __init__(self):
+        self.title = None
+        self.og_title = None
+        self.description = None
+        self.og_description = None
+        self.in_body = False        # head metadata is final once the body starts
+        self._rule_chars = [0] * (len(CONTENT_RULES) + 1)  # selected text per container rule (+ body)
+        self._title_parts = None
+        self._skip_depth = 0
+        self._elements = 0          # elements opened so far (descendant counts)
+        self._pieces = []           # every text node outside skipped subtrees, in order
+        self._stack = []            # (tag, first piece, elements before it, rule mask, rule bits it opened)
+        self._active = BODY_BIT     # bitmask of content rules we are inside
+        self._seen = 0              # rules whose first element has been found
+        self._selected = []         # [start piece, text, rule mask, mask of rules it is covered in], post-order
+
+    # ---- parser target callbacks -------------------------------------------
+
+    def start(self, tag, attrib):
+        if self._skip_depth:
+            self._skip_depth += 1
+            return
+        if tag in SKIP_TAGS:
+            self._skip_depth = 1
+            return
+        if tag == 'body' or tag in TEXT_TAGS:
+            self.in_body = True
+        if tag == 'title' and self.title is None and self._title_parts is None:
+            self._title_parts = []
+        elif tag == 'meta':
+            self._meta(attrib)
+
+        opened = 0
+        for bit, rule in enumerate(CONTENT_RULES):
+            if not self._seen & (1 << bit) and _matches(rule, tag, attrib):
+                opened |= 1 << bit
+        self._elements += 1
+        # The container itself is not searched, only its descendants (like find_all)
+        self._stack.append((tag, len(self._pieces), self._elements, self._active, opened))
+        self._seen |= opened
+        self._active |= opened
+
+    def end(self, tag):
+        if self._skip_depth:
+            self._skip_depth -= 1
+            return
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_parts = None
+        if not self._stack:
+            return
+        tag, first, elements, mask, opened = self._stack.pop()
+        self._active &= ~opened
+        if tag in TEXT_TAGS and self._elements - elements <= MAX_DESCENDANTS:
+            text = ''.join(self._pieces[first:]).strip()
+            if len(text) > MIN_BLOCK_CHARS:
+                self._select(first, text, mask)
+
+    def data(self, text):
+        if self._skip_depth:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(text)
+        else:
+            self._pieces.append(text)
+
+    def close(self):
+        return self
+
+    # ---- helpers -----------------------------------------------------------
+
+    def _meta(self, attrib):
+        content = (attrib.get('content') or '').strip()
+        if not content:
+            return
+        prop, name = attrib.get('property'), attrib.get('name')
+        if prop == 'og:title':
+            self.og_title = self.og_title or content
+        elif prop == 'og:description':
+            self.og_description = self.og_description or content
+        elif name == 'description':
+            self.description = self.description or content
+
+    def _count(self, mask, chars):
+        while mask:
+            bit = mask & -mask
+            self._rule_chars[bit.bit_length() - 1] += chars
+            mask ^= bit
+
+    def _select(self, first, text, mask):
+        # Selected descendants end before their ancestor, so they are the tail of the list;
+        # in every container both are in, the ancestor's text replaces theirs
+        for inner in reversed(self._selected):
+            if inner[0] < first:
+                break
+            newly = inner[2] & mask & ~inner[3]
+            inner[3] |= newly
+            self._count(newly, -len(inner[1]))
+        self._selected.append([first, text, mask, 0])
+        self._count(mask, len(text))
+
+    def _container_bit(self):
+        """Highest-priority rule found so far, else the body"""
+        return (self._seen & -self._seen) or BODY_BIT
+
+    @property
+    def page_title(self):
+        """og:title, else <title>"""
+        return self.og_title or self.title
+
+    @property
+    def meta_description(self):
+        """og:description, else <meta name="description">"""
+        return self.og_description or self.description
+
+    def has_enough(self, budget):
+        """Head is complete and the best container so far holds at least budget characters"""
+        if not self.in_body:
+            return False
+        return self._rule_chars[self._container_bit().bit_length() - 1] >= budget
+
+    def blocks(self):
+        """Texts of the outermost selected elements in the chosen container, in document order"""
+        bit = self._container_bit()
+        return [text for _, text, mask, covered in self._selected if mask & bit and not covered & bit]
+
+
+class ContentStream:
+    """
+    Incremental front end for ContentParser: feed() raw bytes as they arrive,
+    check .done, close() to get the finished ContentParser
+    text_budget=None never reports done (parse everything)
+    """
+
+    def __init__(self, text_budget=None):
+        self.target = ContentParser()
+        self.text_budget = text_budget
+        self._parser = etree.HTMLParser(target=self.target, no_network=True, remove_comments=True, remove_pis=True)
+
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        self._parser.feed(chunk)
+
+    @property
+    def done(self):
+        # Text budget plus a margin for what clean_text strips
+        return self.text_budget is not None and self.target.has_enough(self.text_budget * 5 // 4)
+
+    def close(self):
+        return self._parser.close()
+
+
+def parse_content(content):
+    """Run ContentParser over a whole page (bytes or str)"""
+    stream = ContentStream()
+    stream.feed(content)
+    return stream.close()
@@ -1,74 +1,365 @@
 # embeddings.py
-# Generate embeddings using Google Gemini API
-import google.generativeai as genai
+# Embedding providers - local hashing or Google Gemini - behind a persistent vector cache
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # Windows: single-process only
+    fcntl = None
+
+from hashing_embedder import HashingEmbedder
+from logs import get_logger
+
+log = get_logger(__name__)
+
+GEMINI_EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Truncate text to avoid token limits (roughly 5000 chars = ~1250 tokens)
+MAX_CHARS = 5000
+
+
+class EmbeddingError(Exception):
+    """Raised when a backend cannot produce embeddings (never a silent zero vector)"""
+
+
+def _normalize(matrix):
+    """L2-normalize rows (for cosine similarity)"""
+    matrix = np.asarray(matrix, dtype='float32')
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class EmbeddingProvider:
+    """
+    Interface for embedding backends
+    embed_documents() takes a list of texts and returns a (n, dimension) float32 matrix
+    """
+
+    name = 'base'
+    dimension = 768
+
+    @property
+    def cache_namespace(self):
+        """Changes whenever vectors from this provider would change"""
+        return f'{self.name}:{self.dimension}'
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Local, deterministic hashing-trick embeddings (no network)"""
+
+    name = 'hashing'
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder or HashingEmbedder()
+        self.dimension = self.embedder.dimension
+
+    @property
+    def cache_namespace(self):
+        e = self.embedder
+        return f'{self.name}:{e.dimension}:{e.ngram_range}:{e.tf}:{e.max_tokens}:{e.seed}'
+
+    def embed_documents(self, texts):
+        return self.embedder.embed_batch(texts)
+
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """
+    Gemini text-embedding-004 through google-generativeai
+    Lists of texts go out as batchEmbedContents calls (up to 100 texts each)
+    """
+
+    name = 'gemini'
+
+    def __init__(self, model=GEMINI_EMBEDDING_MODEL, dimension=768):
+        self.model = model
+        self.dimension = dimension
+
+    @property
+    def cache_namespace(self):
+        return f'{self.name}:{self.model}:{self.dimension}'
+
+    def _embed(self, texts, task_type):
+        if not texts:
+            return np.zeros((0, self.dimension), dtype='float32')
+        try:
+            import google.generativeai as genai
+
+            result = genai.embed_content(
+                model=self.model,
+                content=[text[:MAX_CHARS] for text in texts],
+                task_type=task_type
+            )
+        except Exception as e:
+            raise EmbeddingError(f'Gemini embedding failed: {e}') from e
+
+        vectors = result.get('embedding', [])
+        if len(vectors) != len(texts):
+            raise EmbeddingError(f'Gemini returned {len(vectors)} embeddings for {len(texts)} texts')
+        return _normalize(vectors)
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), 'retrieval_document')
+
+    def embed_query(self, text):
+        return self._embed([text], 'retrieval_query')[0]
+
+
+class EmbeddingCache:
+    """
+    Content-hash keyed float32 vector cache on disk
+
+    vectors.f32 - raw float32 rows, memory-mapped for reads
+    index.tsv   - "<key>\\t<row>" lines, appended as rows are added
+
+    Appends hold an exclusive lock on the directory's lock file, so several
+    worker processes can share one cache directory (each only sees the
+    others' rows after a restart). Past `max_vectors` rows the oldest are
+    dropped: both files are rewritten with the newest three quarters and
+    swapped in; other processes notice the new file and reload the index.
+    """
+
+    def __init__(self, directory, dimension, max_vectors=100_000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self.max_vectors = max_vectors
+        self.vectors_path = self.directory / 'vectors.f32'
+        self.index_path = self.directory / 'index.tsv'
+        self.lock_path = self.directory / 'lock'
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._mmap = None
+        self._file_id = None
+
+        with self._file_lock():
+            self._finish_compaction()
+            # Drop a torn trailing row and index lines whose vector never made it to disk
+            if self.vectors_path.exists():
+                os.truncate(self.vectors_path, self._stored_rows() * 4 * self.dimension)
+            self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _vectors_file_id(self):
+        try:
+            stat = self.vectors_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _load(self):
+        """Read index.tsv (caller holds the file lock)"""
+        rows = {}
+        if self.index_path.exists():
+            with open(self.index_path) as f:
+                for line in f:
+                    key, _, row = line.rstrip('\n').partition('\t')
+                    if row:
+                        rows[key] = int(row)
+        stored = self._stored_rows()
+        self._rows = {key: row for key, row in rows.items() if row < stored}
+        self._mmap = None
+        self._file_id = self._vectors_file_id()
+
+    def _reload_if_compacted(self):
+        """Another process swapped in compacted files - our row numbers are stale"""
+        if self._vectors_file_id() != self._file_id:
+            with self._file_lock():
+                self._load()
+
+    def _finish_compaction(self):
+        """Complete or roll back a compaction interrupted between its two renames"""
+        vectors_tmp, index_tmp = self.vectors_path.with_suffix('.compact'), self.index_path.with_suffix('.compact')
+        if index_tmp.exists() and not vectors_tmp.exists():
+            os.replace(index_tmp, self.index_path)
+        vectors_tmp.unlink(missing_ok=True)
+        index_tmp.unlink(missing_ok=True)
+
+    def _compact(self):
+        """Keep the newest rows (caller holds the file lock and self._lock)"""
+        self._load()
+        stored = self._stored_rows()
+        keep_from = max(0, stored - self.max_vectors * 3 // 4)
+        vectors = np.memmap(self.vectors_path, dtype='float32', mode='r', shape=(stored, self.dimension))
+        vectors_tmp, index_tmp = self.vectors_path.with_suffix('.compact'), self.index_path.with_suffix('.compact')
+        kept = sorted(((row, key) for key, row in self._rows.items() if row >= keep_from))
+        with open(vectors_tmp, 'wb') as f:
+            f.write(np.ascontiguousarray(vectors[[row for row, _ in kept]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(index_tmp, 'w') as f:
+            f.writelines(f'{key}\t{new_row}\n' for new_row, (_, key) in enumerate(kept))
+            f.flush()
+            os.fsync(f.fileno())
+        del vectors
+        # Vectors first: a crash in between leaves index.compact, which _finish_compaction installs
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(index_tmp, self.index_path)
+        self._load()
+        self.compactions += 1
+        log.info('embedding_cache_compacted', kept=len(kept), dropped=stored - len(kept))
+
+    def _stored_rows(self):
+        if not self.vectors_path.exists():
+            return 0
+        return self.vectors_path.stat().st_size // (4 * self.dimension)
+
+    def _vectors(self):
+        stored = self._stored_rows()
+        if self._mmap is None or len(self._mmap) < stored:
+            self._mmap = np.memmap(self.vectors_path, dtype='float32', mode='r', shape=(stored, self.dimension))
+        return self._mmap
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys that are cached"""
+        with self._lock:
+            self._reload_if_compacted()
+            found = {key: self._rows[key] for key in keys if key in self._rows}
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if not found:
+                return {}
+            vectors = self._vectors()
+            return {key: np.array(vectors[row]) for key, row in found.items()}
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype='float32').reshape(-1, self.dimension)
+        with self._lock:
+            self._reload_if_compacted()
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._rows]
+            if not new:
+                return
+            with self._file_lock():
+                if self._vectors_file_id() != self._file_id:
+                    self._load()
+                # Row numbers come from the file itself - another process may have appended since
+                start = self._stored_rows()
+                with open(self.vectors_path, 'ab') as f:
+                    f.write(np.stack([vector for _, vector in new]).tobytes())
+                    f.flush()
+                if self._file_id is None:
+                    self._file_id = self._vectors_file_id()
+                with open(self.index_path, 'a') as index:
+                    for offset, (key, _) in enumerate(new):
+                        self._rows[key] = start + offset
+                        index.write(f'{key}\t{start + offset}\n')
+                if self.max_vectors and start + len(new) > self.max_vectors:
+                    self._compact()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'directory': str(self.directory),
+            'vectors': len(self._rows),
+            'max_vectors': self.max_vectors,
+            'compactions': self.compactions,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """Wraps a provider so each distinct text is embedded once, ever"""
+
+    def __init__(self, provider, cache, cache_queries=True):
+        self.provider = provider
+        self.cache = cache
+        self.cache_queries = cache_queries
+        self.name = provider.name
+        self.dimension = provider.dimension
+
+    @property
+    def cache_namespace(self):
+        return self.provider.cache_namespace
+
+    def _key(self, kind, text):
+        return hashlib.sha256(f'{self.cache_namespace}\0{kind}\0{text}'.encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        keys = [self._key('doc', text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # One backend call for every distinct miss
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            vectors = self.provider.embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing), vectors)
+            cached.update(zip(missing, vectors))
+
+        return np.stack([cached[key] for key in keys]) if keys else np.zeros((0, self.dimension), dtype='float32')
+
+    def embed_query(self, text):
+        if not self.cache_queries:
+            return self.provider.embed_query(text)
+        key = self._key('query', text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+        vector = self.provider.embed_query(text)
+        self.cache.put_many([key], [vector])
+        return vector
+
+
+def create_embedding_provider(backend='hashing', cache_dir=None, cache_max_vectors=100_000, **options):
+    """
+    Build the configured provider ('hashing' or 'gemini'),
+    wrapped in an EmbeddingCache when cache_dir is given
+    Ad-hoc query embeddings are only cached for remote backends - the
+    hashing embedder recomputes one faster than the cache grows
+    """
+    if backend == 'hashing':
+        provider = HashingEmbeddingProvider(HashingEmbedder(**options))
+    elif backend == 'gemini':
+        provider = GeminiEmbeddingProvider(**options)
+    else:
+        raise ValueError(f'Unknown embedding backend: {backend}')
+
+    if cache_dir:
+        provider = CachedEmbeddingProvider(provider, EmbeddingCache(cache_dir, provider.dimension, cache_max_vectors),
+                                           cache_queries=backend != 'hashing')
+    return provider
+
+
+_gemini = GeminiEmbeddingProvider()
+
+
 def generate_embedding(text, model=None):
     """
     Generate embedding vector for text using Gemini
-    
-    Process:
-    1. Truncate text if too long (Gemini has limits)
-    2. Call Gemini embedding API
-    3. Return normalized vector
-    
+
     Returns:
-        numpy array of shape (768,) - embedding vector
+        numpy array of shape (768,) - normalized embedding vector
+    Raises:
+        EmbeddingError if the API call fails
     """
-    try:
-        # Truncate text to avoid token limits (roughly 5000 chars = ~1250 tokens)
-        max_chars = 5000
-        if len(text) > max_chars:
-            text = text[:max_chars]
-        
-        # Generate embedding using Gemini
-        # Note: Using text-embedding-004 model
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_document"
-        )
-        
-        # Convert to numpy array
-        embedding = np.array(result['embedding'], dtype='float32')
-        
-        # Normalize (L2 normalization for cosine similarity)
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
-        
-        return embedding
-        
-    except Exception as e:
-        print(f'❌ Error generating embedding: {str(e)}')
-        # Return zero vector as fallback
-        return np.zeros(768, dtype='float32')
+    return _gemini.embed_documents([text])[0]
+
 
 def generate_query_embedding(text):
     """
     Generate embedding for query text
     Uses retrieval_query task type for better similarity matching
     """
-    try:
-        max_chars = 5000
-        if len(text) > max_chars:
-            text = text[:max_chars]
-        
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_query"
-        )
-        
-        embedding = np.array(result['embedding'], dtype='float32')
-        
-        # Normalize
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
-        
-        return embedding
-        
-    except Exception as e:
-        print(f'❌ Error generating query embedding: {str(e)}')
-        return np.zeros(768, dtype='float32')
+    return _gemini.embed_query(text)
@@ -0,0 +1,71 @@
+# Deterministic hashing-trick text embedder - stable across processes, vectorized with NumPy
+import zlib
+from itertools import chain, repeat
+import numpy as np
+
+
+class HashingEmbedder:
+    """
+    Bag-of-words embedding via the hashing trick
+
+    Tokens (and optional word n-grams) are hashed with CRC32 - stable
+    across processes and workers, unlike the salted built-in hash() -
+    then counted into `dimension` buckets with np.bincount and
+    L2-normalized.
+
+    tf: 'raw' counts, 'sublinear' (1 + log count) or 'binary'
+    """
+
+    def __init__(self, dimension=768, ngram_range=(1, 1), max_tokens=500, tf='raw', seed=0):
+        if tf not in ('raw', 'sublinear', 'binary'):
+            raise ValueError(f'Unknown tf weighting: {tf}')
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.max_tokens = max_tokens
+        self.tf = tf
+        self.seed = seed
+
+    def features(self, text):
+        """Words of `text` (first max_tokens) plus their n-grams"""
+        words = text.lower().split()[:self.max_tokens]
+        low, high = self.ngram_range
+        features = words if low == 1 else []
+        for n in range(max(low, 2), high + 1):
+            features = features + [' '.join(words[i:i + n]) for i in range(len(words) - n + 1)]
+        return features
+
+    def _buckets(self, features):
+        # map() keeps the per-token work in C: encode + crc32
+        hashes = np.fromiter(
+            map(zlib.crc32, map(str.encode, features), repeat(self.seed)), dtype=np.uint32, count=len(features)
+        )
+        return (hashes % self.dimension).astype(np.int64)
+
+    def _weight(self, counts):
+        if self.tf == 'binary':
+            return (counts > 0).astype(np.float32)
+        if self.tf == 'sublinear':
+            weighted = np.zeros_like(counts, dtype=np.float32)
+            nonzero = counts > 0
+            weighted[nonzero] = 1 + np.log(counts[nonzero])
+            return weighted
+        return counts.astype(np.float32)
+
+    def embed_batch(self, texts):
+        """Embed many texts into one (len(texts), dimension) float32 matrix"""
+        n = len(texts)
+        per_text = [self.features(text) for text in texts]
+        lengths = np.fromiter((len(f) for f in per_text), dtype=np.int64, count=n)
+        buckets = self._buckets(list(chain.from_iterable(per_text)))
+        rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+
+        counts = np.bincount(rows * self.dimension + buckets, minlength=n * self.dimension)
+        matrix = self._weight(counts.reshape(n, self.dimension))
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def embed(self, text):
+        """Embed one text into a (dimension,) float32 vector"""
+        return self.embed_batch([text])[0]
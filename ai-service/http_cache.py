@@ -0,0 +1,361 @@
+# On-disk HTTP response cache - compressed bodies, Cache-Control freshness, ETag/Last-Modified revalidation
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from http_client import get_http_pool
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Response headers kept with a cached body (validators, freshness, decoding)
+STORED_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control', 'expires', 'date')
+
+# Origin failures that may be answered from a stale entry (RFC 5861 stale-if-error)
+STALE_IF_ERROR_STATUSES = {500, 502, 503, 504}
+
+
+def parse_cache_control(value):
+    """'max-age=60, no-cache' -> {'max-age': '60', 'no-cache': None}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def _seconds(value, default=None):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class CachedResponse:
+    """A cache entry, shaped like the responses callers already handle (status_code, headers, content, text)"""
+
+    parsed = None
+
+    def __init__(self, url, status_code, headers, body, encoding, partial, stored_at, fresh_until, stale_until):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.encoding = encoding
+        self.partial = partial
+        self.complete = partial is None
+        self.stored_at = stored_at
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self._body = body
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = zlib.decompress(self._body)
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class HttpCache:
+    """
+    SQLite cache of GET responses keyed by URL, bodies zlib-compressed
+
+    Freshness follows the origin: Cache-Control max-age (minus Age), else
+    Expires, else 10% of the time since Last-Modified (capped at
+    `heuristic_max`). A stale entry is revalidated with If-None-Match /
+    If-Modified-Since and a 304 refreshes it without a body. Entries stay
+    usable for stale-if-error seconds (the directive, else
+    `stale_if_error`) when the origin errors or does not answer within
+    `revalidate_timeout`. Least recently used entries are evicted past `max_bytes`.
+    no-store responses are never written, unless `override_no_store` is set -
+    then callers passing min_fresh (pages known to change slowly) store them too.
+
+    A body the fetcher cut short is only stored with a `partial` tag naming
+    the limits it was read under, and only served to callers asking for the
+    same tag - anyone else sees a miss and downloads the page again.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, stale_if_error=24 * 3600,
+                 heuristic_max=24 * 3600, revalidate_timeout=5.0, level=6, override_no_store=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stale_if_error = stale_if_error
+        self.heuristic_max = heuristic_max
+        self.revalidate_timeout = revalidate_timeout
+        self.level = level
+        self.override_no_store = override_no_store
+        self.counters = {'hits': 0, 'revalidated': 0, 'stale_if_error': 0, 'misses': 0, 'stores': 0,
+                         'not_storable': 0, 'partial_skips': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(http_cache)')}
+        if columns and 'partial' not in columns:
+            # Older layout could not tell a cut-off body from a whole one - it is only a cache, start over
+            self._db.execute('DROP TABLE http_cache')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS http_cache (
+            key TEXT PRIMARY KEY,
+            url TEXT,
+            status INTEGER,
+            headers TEXT,
+            encoding TEXT,
+            body BLOB,
+            size INTEGER,
+            raw_size INTEGER,
+            partial TEXT,
+            stored_at REAL,
+            fresh_until REAL,
+            stale_until REAL,
+            last_access REAL,
+            hits INTEGER DEFAULT 0
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS http_cache_last_access ON http_cache (last_access)')
+        self._db.commit()
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    # ---- freshness ---------------------------------------------------------
+
+    def _lifetimes(self, headers, now, min_fresh=0):
+        """(fresh_until, stale_until) for a response, or None when it must not be stored"""
+        directives = parse_cache_control(headers.get('cache-control'))
+        if 'no-store' in directives and not (self.override_no_store and min_fresh):
+            return None
+        if 'no-cache' in directives:
+            fresh = 0
+        elif 'max-age' in directives:
+            fresh = _seconds(directives['max-age'], 0)
+        elif _http_date(headers.get('expires')) is not None:
+            fresh = _http_date(headers['expires']) - (_http_date(headers.get('date')) or now)
+        elif _http_date(headers.get('last-modified')) is not None:
+            fresh = min(0.1 * ((_http_date(headers.get('date')) or now) - _http_date(headers['last-modified'])), self.heuristic_max)
+        else:
+            fresh = 0
+        fresh = max(0, fresh - _seconds(headers.get('age'), 0), min_fresh)
+        stale = _seconds(directives.get('stale-if-error'), self.stale_if_error)
+        return now + fresh, now + fresh + stale
+
+    @staticmethod
+    def _validators(entry):
+        headers = {}
+        if entry.headers.get('etag'):
+            headers['If-None-Match'] = entry.headers['etag']
+        if entry.headers.get('last-modified'):
+            headers['If-Modified-Since'] = entry.headers['last-modified']
+        return headers
+
+    # ---- storage -----------------------------------------------------------
+
+    def lookup(self, url):
+        """The stored entry for url (fresh or not), or None"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status, headers, encoding, body, partial, stored_at, fresh_until, stale_until '
+                'FROM http_cache WHERE key = ?', (self.key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, encoding, body, partial, stored_at, fresh_until, stale_until = row
+        return CachedResponse(url, status, json.loads(headers), body, encoding, partial,
+                              stored_at, fresh_until, stale_until)
+
+    def store(self, url, status_code, headers, content, encoding=None, partial=None, min_fresh=0):
+        """
+        Cache a 200 response; returns the entry, or None when the origin forbids storing it
+        partial tags a cut-off body with the limits it was read under (None: the whole body)
+        """
+        now = time.time()
+        lifetimes = self._lifetimes(headers, now, min_fresh) if status_code == 200 else None
+        if lifetimes is None:
+            self.counters['not_storable'] += 1
+            return None
+        kept = {name: headers[name] for name in STORED_HEADERS if headers.get(name)}
+        body = zlib.compress(content, self.level)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO http_cache (key, url, status, headers, encoding, body, size, raw_size, partial, '
+                'stored_at, fresh_until, stale_until, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.key(url), url, status_code, json.dumps(kept), encoding, body, len(body), len(content),
+                 partial, now, *lifetimes, now)
+            )
+            self._evict()
+            self._db.commit()
+        self.counters['stores'] += 1
+        return CachedResponse(url, status_code, kept, body, encoding, partial, now, *lifetimes)
+
+    def refresh(self, entry, headers, min_fresh=0):
+        """Apply a 304 Not Modified: new validators / freshness, same body"""
+        now = time.time()
+        entry.headers.update({name: headers[name] for name in STORED_HEADERS if headers.get(name)})
+        lifetimes = self._lifetimes(entry.headers, now, min_fresh) or (now, now)
+        entry.stored_at, (entry.fresh_until, entry.stale_until) = now, lifetimes
+        with self._lock:
+            self._db.execute(
+                'UPDATE http_cache SET headers = ?, stored_at = ?, fresh_until = ?, stale_until = ?, last_access = ? '
+                'WHERE key = ?', (json.dumps(entry.headers), now, *lifetimes, now, self.key(entry.url))
+            )
+            self._db.commit()
+        return entry
+
+    def _touch(self, entry):
+        with self._lock:
+            self._db.execute('UPDATE http_cache SET last_access = ?, hits = hits + 1 WHERE key = ?',
+                             (time.time(), self.key(entry.url)))
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used until we are back under budget
+        freed = 0
+        victims = []
+        for key, size in self._db.execute('SELECT key, size FROM http_cache ORDER BY last_access'):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        self._db.executemany('DELETE FROM http_cache WHERE key = ?', victims)
+        self.counters['evictions'] += len(victims)
+
+    # ---- request flow ------------------------------------------------------
+
+    async def fetch(self, url, send, min_fresh=0, partial=None):
+        """
+        Serve url from the cache or through send(extra_headers)
+
+        send is an async callable doing the actual request with the given
+        conditional headers and returning a response-like object (status_code,
+        headers, content; optional encoding / complete). It should raise for
+        4xx/5xx except 304. min_fresh keeps entries fresh at least that many
+        seconds whatever the origin says (for pages known to change slowly).
+        partial names the limits under which this caller is fine with a
+        cut-off body (response.complete false); None means it needs the whole
+        body, so cut-off entries are a miss and cut-off responses are not stored.
+        Returns either send's response or a CachedResponse.
+        """
+        entry = await asyncio.to_thread(self.lookup, url)
+        if entry is not None and entry.partial is not None and entry.partial != partial:
+            # Read under other limits - no revalidation either, a 304 would keep the short body
+            self.counters['partial_skips'] += 1
+            entry = None
+        now = time.time()
+        if entry is not None and now < entry.fresh_until:
+            self.counters['hits'] += 1
+            await asyncio.to_thread(self._touch, entry)
+            return entry
+
+        usable_stale = entry is not None and now < entry.stale_until
+        try:
+            request = send(self._validators(entry) if entry is not None else {})
+            # A slow origin must not hold up an answer we already have
+            response = await (asyncio.wait_for(request, self.revalidate_timeout) if usable_stale else request)
+        except (httpx.TransportError, asyncio.TimeoutError, httpx.HTTPStatusError) as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if usable_stale and (status is None or status in STALE_IF_ERROR_STATUSES):
+                log.warning('http_cache_stale_if_error', url=url, error=type(e).__name__)
+                self.counters['stale_if_error'] += 1
+                return entry
+            raise
+
+        if response.status_code == 304 and entry is not None:
+            self.counters['revalidated'] += 1
+            return await asyncio.to_thread(self.refresh, entry, response.headers, min_fresh)
+
+        self.counters['misses'] += 1
+        if getattr(response, 'complete', True):
+            partial = None
+        elif partial is None:
+            self.counters['not_storable'] += 1
+            return response
+        await asyncio.to_thread(
+            self.store, url, response.status_code, response.headers, response.content,
+            getattr(response, 'encoding', None), partial, min_fresh
+        )
+        return response
+
+    async def get(self, url, headers=None, timeout=None, min_fresh=0):
+        """Cached GET through the shared HTTP pool"""
+        async def send(validators):
+            response = await get_http_pool().get(url, headers={**(headers or {}), **validators}, timeout=timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+            return response
+        return await self.fetch(url, send, min_fresh)
+
+    # ---- admin -------------------------------------------------------------
+
+    def purge(self, url=None):
+        """Delete one URL or everything; returns rows removed"""
+        with self._lock:
+            if url is not None:
+                cursor = self._db.execute('DELETE FROM http_cache WHERE key = ?', (self.key(url),))
+            else:
+                cursor = self._db.execute('DELETE FROM http_cache')
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            count, size, raw_size = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM http_cache'
+            ).fetchone()
+        served = self.counters['hits'] + self.counters['revalidated'] + self.counters['stale_if_error']
+        lookups = served + self.counters['misses']
+        return {
+            'path': self.path,
+            'entries': count,
+            'bytes': size,
+            'raw_bytes': raw_size,
+            'compression_ratio': round(raw_size / size, 2) if size else 0.0,
+            'max_bytes': self.max_bytes,
+            **self.counters,
+            'hit_rate': round(served / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# Process-wide cache, configured by the app (scripts run uncached)
+_cache = None
+
+
+def configure_http_cache(cache):
+    global _cache
+    _cache = cache
+    return cache
+
+
+def get_http_cache():
+    """The shared HttpCache, or None when caching is off"""
+    return _cache
+
+
+async def cached_get(url, headers=None, timeout=None, min_fresh=0):
+    """GET through the shared cache when there is one, straight through the pool otherwise"""
+    if _cache is None:
+        return await get_http_pool().get(url, headers=headers, timeout=timeout)
+    return await _cache.get(url, headers=headers, timeout=timeout, min_fresh=min_fresh)
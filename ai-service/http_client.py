@@ -0,0 +1,183 @@
+# Shared HTTP client pool - one keep-alive connection pool for every outbound call
+import os
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+import httpx
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+class HttpClientPool:
+    """
+    Application-scoped httpx.AsyncClient with HTTP/2 keep-alive,
+    per-host concurrency limits and connection-reuse metrics
+    """
+
+    def __init__(self, timeout=15.0, connect_timeout=5.0, max_connections=100,
+                 max_keepalive=20, keepalive_expiry=30.0, per_host_limit=10, http2=True):
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = per_host_limit
+        self.http2 = http2 and self._h2_available()
+        self.client = None
+
+        self._host_semaphores = {}
+        self._requests = defaultdict(int)
+        self._connections = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._in_flight = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a pool from HTTP_* environment variables"""
+        return cls(
+            timeout=_env_float('HTTP_TIMEOUT', 15.0),
+            connect_timeout=_env_float('HTTP_CONNECT_TIMEOUT', 5.0),
+            max_connections=_env_int('HTTP_MAX_CONNECTIONS', 100),
+            max_keepalive=_env_int('HTTP_MAX_KEEPALIVE', 20),
+            keepalive_expiry=_env_float('HTTP_KEEPALIVE_EXPIRY', 30.0),
+            per_host_limit=_env_int('HTTP_PER_HOST_LIMIT', 10),
+            http2=os.getenv('HTTP_HTTP2', '1') == '1',
+        )
+
+    @staticmethod
+    def _h2_available():
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            log.warning('http2_unavailable', reason='h2 not installed')
+            return False
+
+    def start(self):
+        """Create the underlying client (idempotent)"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=self.limits,
+                follow_redirects=True,
+                event_hooks={'request': [self._on_request]},
+            )
+            log.info('http_pool_ready', http2=self.http2, per_host_limit=self.per_host_limit)
+        return self
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            log.info('http_pool_closed')
+
+    async def _on_request(self, request):
+        # httpcore reports connection setup through the trace extension
+        host = request.url.host
+        self._requests[host] += 1
+
+        async def trace(event_name, info):
+            if event_name == 'connection.connect_tcp.complete':
+                self._connections[host] += 1
+
+        request.extensions['trace'] = trace
+
+    def _semaphore(self, host):
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return semaphore
+
+    async def request(self, method, url, **kwargs):
+        """Send a request through the shared client, at most per_host_limit at a time per host"""
+        self.start()
+        host = urlparse(url).hostname or ''
+        async with self._semaphore(host):
+            self._in_flight += 1
+            try:
+                return await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                self._errors[host] += 1
+                raise
+            finally:
+                self._in_flight -= 1
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """
+        Like request() but yields the response before the body is read
+        The host slot is held until the block exits; leaving early drops the rest of the body
+        """
+        self.start()
+        host = urlparse(url).hostname or ''
+        async with self._semaphore(host):
+            self._in_flight += 1
+            try:
+                async with self.client.stream(method, url, **kwargs) as response:
+                    yield response
+            except httpx.HTTPStatusError:
+                raise
+            except httpx.HTTPError:
+                self._errors[host] += 1
+                raise
+            finally:
+                self._in_flight -= 1
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Request / new-connection counts per host and overall reuse ratio"""
+        total_requests = sum(self._requests.values())
+        total_connections = sum(self._connections.values())
+        hosts = {
+            host: {
+                'requests': count,
+                'connections': self._connections[host],
+                'errors': self._errors[host],
+            }
+            for host, count in self._requests.items()
+        }
+        return {
+            'http2': self.http2,
+            'in_flight': self._in_flight,
+            'requests': total_requests,
+            'connections_opened': total_connections,
+            'reuse_ratio': round(1 - total_connections / total_requests, 4) if total_requests else 0.0,
+            'hosts': hosts,
+        }
+
+
+# Process-wide pool, started on FastAPI startup and closed on shutdown
+_pool = None
+
+
+def get_http_pool():
+    """Return the shared pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        _pool = HttpClientPool.from_env()
+    return _pool.start()
+
+
+async def close_http_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.aclose()
+        _pool = None
@@ -0,0 +1,228 @@
+# Index server - one ContentIndex shared by every uvicorn worker over a Unix socket
+#
+#   python index_server.py --socket /tmp/ai-index.sock
+#   INDEX_SOCKET=/tmp/ai-index.sock uvicorn app:app --workers 4
+#
+# The server process owns the FAISS index, its snapshots / WAL and the
+# near-duplicate fingerprints; workers keep fetching, parsing, embedding
+# and calling the LLM on their own cores and send only index operations
+# here. Frames are <header length, payload length> + JSON header + raw
+# float32 vector bytes.
+import argparse
+import asyncio
+import json
+import os
+import signal
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+_FRAME = struct.Struct('<II')
+
+
+class IndexServerError(Exception):
+    """The index server rejected or failed an operation"""
+
+
+async def _send(writer, header, payload=b''):
+    body = json.dumps(header).encode('utf-8')
+    writer.write(_FRAME.pack(len(body), len(payload)) + body + payload)
+    await writer.drain()
+
+
+async def _receive(reader):
+    header_len, payload_len = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    header = json.loads(await reader.readexactly(header_len))
+    payload = await reader.readexactly(payload_len) if payload_len else b''
+    return header, payload
+
+
+def _vector(payload):
+    return np.frombuffer(payload, dtype='float32') if payload else None
+
+
+class IndexServer:
+    """Serves a ContentIndex to IndexClients; each connection runs one request at a time"""
+
+    def __init__(self, index, path):
+        self.index = index
+        self.path = path
+        self.server = None
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self):
+        Path(self.path).unlink(missing_ok=True)
+        self.server = await asyncio.start_unix_server(self._serve, path=self.path)
+        log.info('index_server_listening', socket=self.path, vectors=self.index.store.size())
+        return self
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    header, payload = await _receive(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                self.requests += 1
+                try:
+                    result = await self._dispatch(header['op'], header.get('args', {}), _vector(payload))
+                    await _send(writer, {'ok': True, 'result': result})
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    self.errors += 1
+                    log.exception('index_request_failed', op=header.get('op'), error=str(e))
+                    await _send(writer, {'ok': False, 'error': f'{type(e).__name__}: {e}'})
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _dispatch(self, op, args, vector):
+        index = self.index
+        if op == 'hello':
+            return {'dimension': index.dimension, 'metric': index.metric}
+        if op == 'add':
+            return await index.add(args['url'], vector, args['record'])
+        if op == 'attach':
+            return await index.attach(args['url'], args['fields'])
+        if op == 'find_duplicate':
+            return await index.find_duplicate(args['url'], args['fingerprint'])
+        if op == 'similar':
+            return await index.similar(args['k'], where=args.get('where'), url=args.get('url'), vector=vector)
+        if op == 'stats':
+            return {**await index.stats(), 'index_server': self.stats()}
+        if op == 'compact':
+            return await index.compact()
+        raise ValueError(f'Unknown op: {op}')
+
+    def stats(self):
+        return {'connections': self.connections, 'requests': self.requests, 'errors': self.errors}
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        Path(self.path).unlink(missing_ok=True)
+
+
+class IndexClient:
+    """
+    ContentIndex interface backed by an IndexServer, with a small pool of
+    socket connections so one worker can have several requests in flight
+    """
+
+    def __init__(self, path, connections=8, connect_timeout=30.0):
+        self.path = path
+        self.max_connections = connections
+        self.connect_timeout = connect_timeout
+        self.dimension = None
+        self.metric = None
+        self._idle = []
+        self._slots = asyncio.Semaphore(connections)
+
+    async def start(self):
+        """Wait for the server (it may still be loading the index) and check it matches this worker"""
+        deadline = asyncio.get_running_loop().time() + self.connect_timeout
+        while True:
+            try:
+                hello = await self._request('hello')
+                break
+            except (ConnectionError, FileNotFoundError):
+                if asyncio.get_running_loop().time() >= deadline:
+                    raise
+                await asyncio.sleep(0.2)
+        self.dimension, self.metric = hello['dimension'], hello['metric']
+        log.info('index_server_connected', socket=self.path, dimension=self.dimension, metric=self.metric)
+        return self
+
+    async def _request(self, op, vector=None, **args):
+        payload = np.ascontiguousarray(vector, dtype='float32').tobytes() if vector is not None else b''
+        async with self._slots:
+            # A pooled connection may have been closed by a server restart - retry once on a fresh one
+            for attempt in range(2):
+                reader, writer = self._idle.pop() if self._idle else await asyncio.open_unix_connection(self.path)
+                try:
+                    await _send(writer, {'op': op, 'args': args}, payload)
+                    header, _ = await _receive(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if attempt:
+                        raise ConnectionError(f'Index server at {self.path} closed the connection')
+                    continue
+                except BaseException:
+                    writer.close()
+                    raise
+                self._idle.append((reader, writer))
+                if not header['ok']:
+                    raise IndexServerError(header['error'])
+                return header['result']
+
+    async def add(self, url, embedding, record):
+        return await self._request('add', vector=embedding, url=url, record=record)
+
+    async def attach(self, url, fields):
+        return await self._request('attach', url=url, fields=fields)
+
+    async def find_duplicate(self, url, fingerprint):
+        match = await self._request('find_duplicate', url=url, fingerprint=fingerprint)
+        return tuple(match) if match is not None else None
+
+    async def similar(self, k, where=None, url=None, vector=None):
+        results = await self._request('similar', vector=vector, k=k, where=where, url=url)
+        return [tuple(result) for result in results] if results is not None else None
+
+    async def stats(self):
+        return await self._request('stats')
+
+    async def compact(self):
+        return await self._request('compact')
+
+    async def snapshot_periodically(self, interval):
+        """The server snapshots its own store"""
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+async def serve(path, dimension, data_dir):
+    from content_index import ContentIndex
+
+    index = await asyncio.to_thread(ContentIndex.from_env, dimension, data_dir)
+    server = await IndexServer(index, path).start()
+    snapshots = asyncio.create_task(index.snapshot_periodically(float(os.getenv('VECTOR_SNAPSHOT_INTERVAL', 300))))
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        snapshots.cancel()
+        await server.close()
+        await index.close()
+        log.info('index_server_stopped', socket=path)
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    load_dotenv(Path(__file__).parent.parent / '.env')
+    parser = argparse.ArgumentParser(description='Shared vector index for multi-worker deployments')
+    parser.add_argument('--socket', default=os.getenv('INDEX_SOCKET') or '/tmp/ai-index.sock')
+    parser.add_argument('--dimension', type=int, default=int(os.getenv('EMBEDDING_DIMENSION', 768)),
+                        help='must match the workers\' embedding backend')
+    parser.add_argument('--data-dir', default=os.getenv('DATA_DIR', str(Path(__file__).parent / 'data')))
+    args = parser.parse_args()
+    Path(args.data_dir).mkdir(parents=True, exist_ok=True)
+    asyncio.run(serve(args.socket, args.dimension, Path(args.data_dir)))
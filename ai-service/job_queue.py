@@ -0,0 +1,381 @@
+# Durable local job queue (SQLite) and the async worker pool that drains it
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+FINISHED = ('done', 'failed')
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail a job without retrying it (e.g. the page has no content)"""
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of jobs: queued -> running -> done | failed
+
+    Higher `priority` runs first, then oldest first. A claimed job holds a
+    lease, which its worker renews while the job runs; if the worker dies
+    (or the service restarts) the lease runs out and the job is claimed
+    again, counting as another attempt. The attempt number identifies the
+    claim: renew / complete / fail / release from an older claim are
+    ignored. Failed attempts are retried with exponential backoff up to
+    `max_attempts`. Claims are a single UPDATE, so several processes can
+    share one file.
+    """
+
+    def __init__(self, path, max_attempts=3, backoff=5.0, retention=7 * 24 * 3600):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT,
+            key TEXT,
+            payload TEXT,
+            priority INTEGER,
+            status TEXT,
+            attempts INTEGER DEFAULT 0,
+            max_attempts INTEGER,
+            run_after REAL,
+            lease_until REAL,
+            created_at REAL,
+            started_at REAL,
+            finished_at REAL,
+            result TEXT,
+            error TEXT
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_key ON jobs (kind, key)')
+        self._db.commit()
+
+    def submit(self, kind, payload, key=None, priority=0, max_attempts=None):
+        """
+        Queue a job and return it; with `key`, an unfinished job of the
+        same kind and key is returned instead of queueing a second one
+        """
+        now = time.time()
+        with self._lock:
+            if key is not None:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE kind = ? AND key = ? AND status IN ('queued', 'running')",
+                    (kind, key)
+                ).fetchone()
+                if row is not None:
+                    return self._get(row[0])
+            job_id = uuid.uuid4().hex
+            self._db.execute(
+                'INSERT INTO jobs (id, kind, key, payload, priority, status, max_attempts, run_after, created_at) '
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, key, json.dumps(payload), priority, max_attempts or self.max_attempts, now, now)
+            )
+            self._db.commit()
+            return self._get(job_id)
+
+    def claim(self, lease):
+        """Take the next runnable job (or one whose lease ran out) for `lease` seconds; None if there is none"""
+        now = time.time()
+        with self._lock:
+            # A job that keeps taking its worker down with it stops being retried
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker lost (lease expired)', finished_at = ?, "
+                "lease_until = NULL WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                (now, now)
+            )
+            row = self._db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, lease_until = ? "
+                'WHERE id = (SELECT id FROM jobs '
+                "            WHERE (status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?) "
+                '            ORDER BY priority DESC, created_at LIMIT 1) '
+                'RETURNING id, kind, payload, attempts, max_attempts',
+                (now, now + lease, now, now)
+            ).fetchone()
+            self._db.commit()
+        if row is None:
+            return None
+        job_id, kind, payload, attempts, max_attempts = row
+        return {'id': job_id, 'kind': kind, 'payload': json.loads(payload), 'attempts': attempts,
+                'max_attempts': max_attempts}
+
+    def renew(self, job_id, attempt, lease):
+        """Extend the lease of claim `attempt` by `lease` seconds from now; False once the claim is lost"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (time.time() + lease, job_id, attempt)
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, attempt, result):
+        """Store the result of claim `attempt`; False (nothing written) if the job was claimed again since"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (json.dumps(result), time.time(), job_id, attempt)
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def fail(self, job_id, attempt, error, retry=True):
+        """
+        Record a failed attempt: back to the queue after a backoff, or failed
+        for good. Returns the new status, None if the claim was lost
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT max_attempts FROM jobs WHERE id = ? AND status = 'running' AND attempts = ?",
+                (job_id, attempt)
+            ).fetchone()
+            if row is None:
+                return None
+            if retry and attempt < row[0]:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, lease_until = NULL WHERE id = ?",
+                    (error, now + self.backoff * 2 ** (attempt - 1), job_id)
+                )
+                status = 'queued'
+            else:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                    (error, now, job_id)
+                )
+                status = 'failed'
+            self._db.commit()
+        return status
+
+    def release(self, job_id, attempt):
+        """Give a running job back to the queue untouched (worker shutting down)"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), run_after = ?, lease_until = NULL "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (time.time(), job_id, attempt)
+            )
+            self._db.commit()
+
+    def _get(self, job_id):
+        row = self._db.execute(
+            'SELECT id, kind, key, priority, status, attempts, max_attempts, run_after, created_at, started_at, '
+            'finished_at, result, error FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        (job_id, kind, key, priority, status, attempts, max_attempts, run_after, created_at, started_at,
+         finished_at, result, error) = row
+        return {
+            'id': job_id,
+            'kind': kind,
+            'key': key,
+            'priority': priority,
+            'status': status,
+            'attempts': attempts,
+            'max_attempts': max_attempts,
+            'run_after': run_after if status == 'queued' else None,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at,
+            'result': json.loads(result) if result is not None else None,
+            'error': error,
+        }
+
+    def get(self, job_id):
+        """The job as a dict (result decoded), or None"""
+        with self._lock:
+            return self._get(job_id)
+
+    def purge(self):
+        """Delete finished jobs older than `retention`; returns rows removed"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - self.retention,)
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            counts = dict(self._db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            oldest = self._db.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = 'queued' AND run_after <= ?", (now,)
+            ).fetchone()[0]
+        return {
+            'path': self.path,
+            **{status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'failed')},
+            'oldest_queued_seconds': round(now - oldest, 3) if oldest is not None else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobRunner:
+    """
+    `workers` asyncio tasks that claim jobs and run handlers[kind](payload)
+    A handler's return value is the job result; JobFailed fails the job
+    outright, any other exception is retried. While a handler runs its
+    lease is renewed every lease / 3 seconds; if the claim is lost anyway
+    (e.g. the process stalled past the lease and another worker took the
+    job) the handler is cancelled and its outcome dropped. Idle workers
+    poll every `poll_interval` seconds (other processes may queue work)
+    and wake at once on notify().
+    """
+
+    def __init__(self, queue, handlers, workers=4, lease=120.0, poll_interval=1.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.leases_lost = 0
+        self._tasks = []
+        self._running = {}
+        self._wakeup = asyncio.Event()
+        # job ID -> events of local waiters
+        self._finished = {}
+
+    @classmethod
+    def from_env(cls, queue, handlers):
+        return cls(
+            queue, handlers,
+            workers=int(os.getenv('JOB_WORKERS', 4)),
+            lease=float(os.getenv('JOB_LEASE', 120)),
+            poll_interval=float(os.getenv('JOB_POLL_INTERVAL', 1.0)),
+        )
+
+    def start(self):
+        if not self._tasks and self.workers > 0:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+            log.info('job_workers_started', workers=self.workers, queue=self.queue.path)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """New work was queued in this process"""
+        self._wakeup.set()
+
+    async def _work(self):
+        while True:
+            job = await asyncio.to_thread(self.queue.claim, self.lease)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._run(job)
+
+    async def _heartbeat(self, job, handler):
+        """Renew the job's lease until cancelled; cancel `handler` if the claim is lost"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if not await asyncio.to_thread(self.queue.renew, job['id'], job['attempts'], self.lease):
+                job['lease_lost'] = True
+                handler.cancel()
+                return
+
+    async def _run(self, job):
+        job_id, attempt = job['id'], job['attempts']
+        self._running[job_id] = job
+        start = time.perf_counter()
+        heartbeat = None
+        try:
+            handler = self.handlers.get(job['kind'])
+            if handler is None:
+                raise JobFailed(f"No handler for job kind {job['kind']!r}")
+            task = asyncio.ensure_future(handler(job['payload']))
+            heartbeat = asyncio.create_task(self._heartbeat(job, task))
+            try:
+                result = await task
+            finally:
+                heartbeat.cancel()
+        except asyncio.CancelledError:
+            if not job.get('lease_lost'):
+                # Shutting down - hand the job straight back rather than waiting out its lease
+                self.queue.release(job_id, attempt)
+                raise
+            self.leases_lost += 1
+            log.warning('job_lease_lost', id=job_id, kind=job['kind'], attempt=attempt)
+        except JobFailed as e:
+            if await asyncio.to_thread(self.queue.fail, job_id, attempt, str(e), False) is not None:
+                self.failed += 1
+            log.warning('job_failed', id=job_id, kind=job['kind'], error=str(e), retry=False)
+        except Exception as e:
+            status = await asyncio.to_thread(self.queue.fail, job_id, attempt, f'{type(e).__name__}: {e}')
+            if status == 'failed':
+                self.failed += 1
+            elif status == 'queued':
+                self.retried += 1
+            log.warning('job_failed', id=job_id, kind=job['kind'], error=str(e), attempt=attempt,
+                        retry=status == 'queued')
+        else:
+            if await asyncio.to_thread(self.queue.complete, job_id, attempt, result):
+                self.completed += 1
+                log.debug('job_done', id=job_id, kind=job['kind'], seconds=round(time.perf_counter() - start, 3))
+            else:
+                self.leases_lost += 1
+                log.warning('job_lease_lost', id=job_id, kind=job['kind'], attempt=attempt)
+        finally:
+            self._running.pop(job_id, None)
+        for event in self._finished.get(job_id, ()):
+            event.set()
+
+    async def wait(self, job_id, timeout):
+        """
+        The job once it is finished (or its state when `timeout` runs out)
+        Jobs finished by this process wake the waiter at once; jobs run by
+        other processes are noticed on the next poll
+        """
+        deadline = time.monotonic() + timeout
+        event = asyncio.Event()
+        waiters = self._finished.setdefault(job_id, set())
+        waiters.add(event)
+        try:
+            while True:
+                job = await asyncio.to_thread(self.queue.get, job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job['status'] in FINISHED or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(self.poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            waiters.discard(event)
+            if not waiters:
+                self._finished.pop(job_id, None)
+
+    def stats(self):
+        return {
+            'workers': len(self._tasks),
+            'in_progress': len(self._running),
+            'completed': self.completed,
+            'failed': self.failed,
+            'retried': self.retried,
+            'leases_lost': self.leases_lost,
+        }
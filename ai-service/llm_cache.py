@@ -0,0 +1,135 @@
+# Persistent content-addressed cache for parsed Gemini analysis results (SQLite)
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """
+    SQLite cache of parsed LLM answers keyed by sha256(model + prompt)
+    (`model` there names what was asked, e.g. a chain of fallback models;
+    each row records the model that actually answered)
+
+    Entries expire after `ttl` seconds; when the stored payloads exceed
+    `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            value TEXT,
+            size INTEGER,
+            created_at REAL,
+            last_access REAL,
+            hits INTEGER DEFAULT 0
+        )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)')
+        self._db.commit()
+
+    @staticmethod
+    def key(model, prompt):
+        return hashlib.sha256(f'{model}\0{prompt}'.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached result dict, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT value, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute('UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key))
+            self._db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, model, value):
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, model, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, model, payload, len(payload), now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM llm_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used until we are back under budget
+        freed = 0
+        victims = []
+        for key, size in self._db.execute('SELECT key, size FROM llm_cache ORDER BY last_access'):
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        self._db.executemany('DELETE FROM llm_cache WHERE key = ?', victims)
+
+    def entries(self, limit=50, offset=0):
+        """Most recently used entries, newest first"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT key, model, value, size, created_at, last_access, hits FROM llm_cache '
+                'ORDER BY last_access DESC LIMIT ? OFFSET ?', (limit, offset)
+            ).fetchall()
+        return [
+            {
+                'key': key,
+                'model': model,
+                'value': json.loads(value),
+                'size': size,
+                'created_at': created_at,
+                'last_access': last_access,
+                'hits': hits,
+                'expired': time.time() - created_at > self.ttl,
+            }
+            for key, model, value, size, created_at, last_access, hits in rows
+        ]
+
+    def purge(self, key=None, expired_only=False):
+        """Delete one entry, every expired entry, or everything; returns rows removed"""
+        with self._lock:
+            if key is not None:
+                cursor = self._db.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            elif expired_only:
+                cursor = self._db.execute('DELETE FROM llm_cache WHERE created_at < ?', (time.time() - self.ttl,))
+            else:
+                cursor = self._db.execute('DELETE FROM llm_cache')
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'entries': count,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
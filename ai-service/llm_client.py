@@ -0,0 +1,350 @@
+# Async LLM client - per-provider rate limits, bounded admission, hedged fallback
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from http_client import get_http_pool
+from logs import get_logger
+
+log = get_logger(__name__)
+
+
+class LLMError(Exception):
+    """A provider answered without usable text"""
+
+
+class LLMOverloaded(LLMError):
+    """Every admission slot is busy and the wait queue is full"""
+
+
+class TokenBucket:
+    """
+    `rate` calls per second on average with bursts of up to `burst`
+    A rate of 0 (or less) means unlimited
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self.waits = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available right now"""
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        """Wait for a token"""
+        waited = False
+        while not self.try_acquire():
+            waited = True
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+        self.waits += waited
+
+
+class Admission:
+    """
+    At most `limit` calls in progress; up to `max_waiting` more queue for
+    a slot and anything beyond that is rejected with LLMOverloaded
+    """
+
+    def __init__(self, limit, max_waiting):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise LLMOverloaded(f'LLM queue full ({self.running} running, {self.waiting} waiting)')
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+
+class LatencyWindow:
+    """The last `size` call durations of one provider, for percentile estimates"""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class GoogleProvider:
+    """
+    One GenerativeModel for the process. google-generativeai's async client
+    is gRPC only, so with the REST transport (custom endpoint) the blocking
+    call runs on a dedicated thread pool - sized like the admission limit
+    and kept apart from the default executor the embedding and parse
+    stages use
+    """
+
+    name = 'google'
+
+    def __init__(self, model, native_async=True, max_workers=16):
+        self.model_name = model
+        self.model = None
+        self.native_async = native_async
+        self._executor = None if native_async else ThreadPoolExecutor(max_workers, thread_name_prefix='gemini')
+
+    def start(self):
+        """Import google-generativeai (slow) and build the model - the app does this while warming up"""
+        if self.model is None:
+            import google.generativeai as genai
+            self.model = genai.GenerativeModel(self.model_name)
+        return self
+
+    async def generate(self, prompt):
+        if self.model is None:
+            self.start()
+        if self.native_async:
+            response = await self.model.generate_content_async(prompt)
+        else:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self._executor, self.model.generate_content, prompt)
+        return response.text
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class OpenRouterProvider:
+    """OpenAI-style chat completions over the shared HTTP pool"""
+
+    name = 'openrouter'
+
+    def __init__(self, url, api_key, model, timeout=60.0):
+        self.url = url
+        self.model_name = model
+        self.timeout = timeout
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def start(self):
+        return self
+
+    def close(self):
+        pass
+
+    async def generate(self, prompt):
+        data = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        response = await get_http_pool().post(self.url, headers=self.headers, json=data, timeout=self.timeout)
+        result = response.json()
+
+        if 'choices' in result:
+            return result['choices'][0]['message']['content']
+        if 'error' in result:
+            raise LLMError(result['error'].get('message', str(result['error'])))
+        raise LLMError(f'Unexpected OpenRouter response (HTTP {response.status_code})')
+
+
+class LLMClient:
+    """
+    Providers in preference order behind one admission queue, each with
+    its own token bucket. The first provider is called; if it fails the
+    next one is tried, and if it is still running past the
+    `hedge_percentile` of its recent latencies the next one is started
+    alongside it (a hedge) - whichever answers first wins and the other
+    call is cancelled. Hedges only fire when the backup has a token to
+    spare, so they never queue behind its rate limit.
+    """
+
+    def __init__(self, providers, rates=None, burst=1, max_concurrency=16, max_waiting=64,
+                 hedge_percentile=95, hedge_delay=8.0, hedge_min_delay=1.0, hedge_min_samples=20,
+                 observer=None):
+        self.providers = list(providers)
+        rates = rates or {}
+        self.buckets = {p.name: TokenBucket(rates.get(p.name, 0), burst) for p in self.providers}
+        self.latencies = {p.name: LatencyWindow() for p in self.providers}
+        self.admission = Admission(max_concurrency, max_waiting)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.observer = observer
+        self.counters = {'calls': 0, 'fallbacks': 0, 'hedges': 0, 'hedge_wins': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls, providers, observer=None):
+        """LLM_* environment variables; rates are per minute, 0 = unlimited"""
+        return cls(
+            providers,
+            rates={p.name: float(os.getenv(f'LLM_{p.name.upper()}_RPM', 0)) / 60 for p in providers},
+            burst=float(os.getenv('LLM_RATE_BURST', 5)),
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 16)),
+            max_waiting=int(os.getenv('LLM_MAX_QUEUE', 64)),
+            hedge_percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', 95)),
+            hedge_delay=float(os.getenv('LLM_HEDGE_DELAY', 8.0)),
+            hedge_min_delay=float(os.getenv('LLM_HEDGE_MIN_DELAY', 1.0)),
+            observer=observer,
+        )
+
+    def hedge_after(self, provider):
+        """Seconds to give `provider` before hedging; None when hedging is off"""
+        if not self.hedge_percentile:
+            return None
+        window = self.latencies[provider.name]
+        if len(window) < self.hedge_min_samples:
+            return self.hedge_delay
+        return max(self.hedge_min_delay, window.percentile(self.hedge_percentile))
+
+    async def _call(self, provider, prompt, has_token=False):
+        if not has_token:
+            await self.buckets[provider.name].acquire()
+        start = time.perf_counter()
+        try:
+            text = await provider.generate(prompt)
+        except asyncio.CancelledError:
+            # Lost a hedge race - still a lower bound on this provider's latency,
+            # without it the window would only ever hold the fast calls
+            self.latencies[provider.name].add(time.perf_counter() - start)
+            raise
+        except Exception:
+            self._observe(provider, time.perf_counter() - start, False)
+            raise
+        elapsed = time.perf_counter() - start
+        self.latencies[provider.name].add(elapsed)
+        self._observe(provider, elapsed, True)
+        return text
+
+    def _observe(self, provider, seconds, ok):
+        if self.observer is not None:
+            self.observer(provider.name, seconds, ok)
+
+    async def generate(self, prompt):
+        """Answer text from the first provider to succeed; raises the last error if all fail"""
+        text, _ = await self.answer(prompt)
+        return text
+
+    async def answer(self, prompt):
+        """(answer text, model that produced it) - the fallback or hedge may have answered"""
+        if not self.providers:
+            raise LLMError("No AI API key configured. Set GOOGLE_AI_API_KEY or OPENROUTER_API_KEY in .env")
+        async with self.admission.slot():
+            self.counters['calls'] += 1
+            try:
+                return await self._race(prompt)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.counters['failures'] += 1
+                raise
+
+    async def _race(self, prompt):
+        waiting = list(self.providers)
+        running = {}
+        error = None
+
+        def launch(has_token=False):
+            provider = waiting.pop(0)
+            task = asyncio.ensure_future(self._call(provider, prompt, has_token))
+            running[task] = provider
+            return task
+
+        launch()
+        hedged, hedge = False, None
+        try:
+            while running:
+                timeout = None
+                if waiting and not hedged:
+                    timeout = self.hedge_after(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    if self.buckets[waiting[0].name].try_acquire():
+                        self.counters['hedges'] += 1
+                        log.debug('llm_hedge', primary=next(iter(running.values())).name,
+                                  backup=waiting[0].name, after=round(timeout, 3))
+                        hedge = launch(has_token=True)
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters['hedge_wins'] += 1
+                        return task.result(), provider.model_name
+                    error = task.exception()
+                    log.warning('llm_provider_failed', provider=provider.name, error=str(error),
+                                fallback=waiting[0].name if waiting and not running else None)
+
+                if not running and waiting:
+                    self.counters['fallbacks'] += 1
+                    launch()
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
+    def start(self):
+        """Load every provider's client library (blocking - run it off the event loop)"""
+        for provider in self.providers:
+            provider.start()
+        return self
+
+    def close(self):
+        for provider in self.providers:
+            provider.close()
+
+    def stats(self):
+        return {
+            **self.counters,
+            'running': self.admission.running,
+            'waiting': self.admission.waiting,
+            'rejected': self.admission.rejected,
+            'max_concurrency': self.admission.limit,
+            'max_waiting': self.admission.max_waiting,
+            'providers': {
+                p.name: {
+                    'model': p.model_name,
+                    'rate_per_min': self.buckets[p.name].rate * 60,
+                    'rate_waits': self.buckets[p.name].waits,
+                    'hedge_after': self.hedge_after(p),
+                    'samples': len(self.latencies[p.name]),
+                }
+                for p in self.providers
+            },
+        }
@@ -0,0 +1,101 @@
+# Structured logging - one event name plus key=value fields per line (or JSON lines)
+import json
+import logging
+import os
+import sys
+
+# Every service logger lives under this namespace, so configuring it never touches uvicorn's
+ROOT_LOGGER = 'ai'
+
+_configured = False
+
+
+class StructFormatter(logging.Formatter):
+    """
+    text: 2024-06-03 12:00:00,123 INFO    ai.app page_extracted url=https://... chars=2931
+    json: {"ts": 1717416000.123, "level": "info", "logger": "ai.app", "event": "page_extracted", ...}
+    """
+
+    def __init__(self, fmt='text'):
+        super().__init__()
+        self.json = fmt == 'json'
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        if self.json:
+            payload = {'ts': round(record.created, 3), 'level': record.levelname.lower(),
+                       'logger': record.name, 'event': record.getMessage(), **fields}
+            if record.exc_info:
+                payload['exc'] = self.formatException(record.exc_info)
+            return json.dumps(payload, default=str)
+
+        line = f'{self.formatTime(record)} {record.levelname:<7} {record.name} {record.getMessage()}'
+        if fields:
+            line += ' ' + ' '.join(f'{key}={_text_value(value)}' for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def _text_value(value):
+    text = str(value)
+    return json.dumps(text) if not text or any(c.isspace() or c in '"=' for c in text) else text
+
+
+class StructLogger:
+    """
+    Thin wrapper over a stdlib logger: log.info('event', key=value, ...)
+    Disabled levels return before any formatting, so debug calls on the hot path cost one check
+    """
+
+    __slots__ = ('_logger',)
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={'fields': fields}, exc_info=exc_info, stacklevel=3)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        """error() with the current exception's traceback"""
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def is_enabled(self, level):
+        return self._logger.isEnabledFor(level)
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    Attach a stderr handler to the 'ai' logger tree
+    LOG_LEVEL (default INFO) and LOG_FORMAT (text | json) apply when not given
+    """
+    global _configured
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(StructFormatter(fmt or os.getenv('LOG_FORMAT', 'text')))
+    root.addHandler(handler)
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name):
+    """Structured logger for a module (configures logging from the environment on first use)"""
+    if not _configured:
+        configure_logging()
+    return StructLogger(logging.getLogger(f'{ROOT_LOGGER}.{name}'))
@@ -0,0 +1,159 @@
+# Minimal Prometheus metrics - counters, histograms, scrape-time gauges, text exposition format
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds - from a cache lookup up to a slow LLM call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set; the name should end in _total"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{_labels(self.label_names, key)} {_number(value)}'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def lines(self):
+        with self._lock:
+            series = [(key, list(values)) for key, values in self._series.items()]
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), values):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.label_names, key, [("le", _number(bound))])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.label_names, key)} {_number(values[-1])}'
+            yield f'{self.name}_count{_labels(self.label_names, key)} {cumulative}'
+
+
+class Registry:
+    """
+    Metrics rendered on /metrics: counters and histograms updated in place,
+    plus collectors - callables run at scrape time that return gauge
+    families as (name, help, [(labels dict, value), ...])
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name!r} already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn):
+        """Register fn() -> iterable of gauge families; usable as a decorator"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        out = []
+        for metric in self._metrics.values():
+            out.append(f'# HELP {metric.name} {metric.help}')
+            out.append(f'# TYPE {metric.name} {metric.kind}')
+            out.extend(metric.lines())
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                out.append(f'# collector {getattr(collect, "__name__", collect)} failed: {_escape(e)}')
+                continue
+            for name, help, samples in families:
+                out.append(f'# HELP {name} {help}')
+                out.append(f'# TYPE {name} gauge')
+                for labels, value in samples:
+                    out.append(f'{name}{_labels(labels.keys(), labels.values())} {_number(value)}')
+        return '\n'.join(out) + '\n'
+
+
+def stats_gauges(prefix, stats, help, labels=None):
+    """
+    Gauge families from the numeric fields of a component's stats() dict
+    ({'hits': 3, 'hit_rate': 0.5} -> prefix_hits, prefix_hit_rate); nested values are skipped
+    """
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            yield f'{prefix}_{key}', f'{help} ({key})', [(labels or {}, value)]
+
+
+# Process-wide registry served by the app
+REGISTRY = Registry()
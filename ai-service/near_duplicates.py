@@ -0,0 +1,108 @@
+# Near-duplicate detection - 64-bit SimHash fingerprints with a banded lookup index
+import hashlib
+import re
+from itertools import combinations
+
+import numpy as np
+
+FINGERPRINT_BITS = 64
+
+_WORD = re.compile(r'\w+')
+
+
+def simhash(text, shingle=3):
+    """
+    64-bit SimHash of the word `shingle`-grams of `text` (None if it has too few words)
+    Texts that share most of their shingles get fingerprints a few bits apart
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < shingle:
+        return None
+    grams = {' '.join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'little') for gram in grams),
+        dtype=np.uint64, count=len(grams),
+    )
+    # Bit b of the fingerprint is set when most shingle hashes have bit b set
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(grams)
+    return int.from_bytes(np.packbits(votes, bitorder='little').tobytes(), 'little')
+
+
+class SimHashIndex:
+    """
+    key -> fingerprint, queryable for any stored fingerprint within
+    `max_distance` bits (Hamming distance)
+
+    The 64 bits are cut into `bands` bands and every fingerprint is filed
+    under each of its band values. Two fingerprints at most max_distance
+    bits apart differ in at most max_distance // bands bits of some band
+    (pigeonhole), so a query probes each band value with up to that many
+    bits flipped and compares only the keys filed there. Three bands of
+    ~21 bits keep buckets near-empty at millions of entries, so a query
+    at the default distance is a few hundred dict probes.
+    """
+
+    def __init__(self, max_distance=6, bands=3):
+        self.max_distance = max_distance
+        widths = [FINGERPRINT_BITS // bands + (i < FINGERPRINT_BITS % bands) for i in range(bands)]
+        self._bands = []  # (shift, mask, flip masks to probe)
+        shift = 0
+        for width in widths:
+            flips = [sum(1 << bit for bit in bits)
+                     for r in range(max_distance // bands + 1) for bits in combinations(range(width), r)]
+            self._bands.append((shift, (1 << width) - 1, flips))
+            shift += width
+        self._tables = [{} for _ in self._bands]
+        self._fingerprints = {}
+        self.lookups = 0
+        self.matches = 0
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def _band_values(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask, _ in self._bands]
+
+    def add(self, key, fingerprint):
+        """Store (or replace) the fingerprint for `key`"""
+        self.remove(key)
+        self._fingerprints[key] = fingerprint
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            table.setdefault(value, []).append(key)
+
+    def remove(self, key):
+        fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is None:
+            return False
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            bucket = table[value]
+            bucket.remove(key)
+            if not bucket:
+                del table[value]
+        return True
+
+    def query(self, fingerprint, exclude=None):
+        """(key, distance) of the closest stored fingerprint within max_distance, else None"""
+        self.lookups += 1
+        best = None
+        for table, (shift, mask, flips) in zip(self._tables, self._bands):
+            value = (fingerprint >> shift) & mask
+            candidates = [key for flip in flips for key in table.get(value ^ flip, ())]
+            for key in candidates:
+                if key == exclude:
+                    continue
+                distance = (fingerprint ^ self._fingerprints[key]).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+        if best is not None:
+            self.matches += 1
+        return best
+
+    def stats(self):
+        return {
+            'fingerprints': len(self._fingerprints),
+            'max_distance': self.max_distance,
+            'lookups': self.lookups,
+            'matches': self.matches,
+        }
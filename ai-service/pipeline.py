@@ -0,0 +1,77 @@
+# Tiny async stage graph - runs each stage as soon as its dependencies are done
+import asyncio
+import contextlib
+import time
+
+
+class StageGraph:
+    """
+    Dependency graph of async stages
+
+    Each stage is an async function whose keyword arguments are the
+    results of the stages it depends on. Independent stages overlap;
+    the first failure cancels everything still running.
+
+    `observer(name, seconds, ok)` is told how long each stage ran once its
+    dependencies were done (time spent waiting on them is not counted).
+    """
+
+    def __init__(self, observer=None):
+        self._stages = {}
+        self.observer = observer
+
+    def stage(self, name, fn, deps=()):
+        """Register `fn` as stage `name`, called with the results of `deps`"""
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f'Stage {name!r} depends on unknown stage {dep!r}')
+        self._stages[name] = (fn, tuple(deps))
+        return self
+
+    async def run(self):
+        """Run every stage and return {stage name: result}"""
+        tasks = {}
+
+        async def run_stage(name):
+            fn, deps = self._stages[name]
+            if deps:
+                await asyncio.gather(*(tasks[dep] for dep in deps))
+            if self.observer is None:
+                return await fn(**{dep: tasks[dep].result() for dep in deps})
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = await fn(**{dep: tasks[dep].result() for dep in deps})
+                ok = True
+                return result
+            finally:
+                self.observer(name, time.perf_counter() - start, ok)
+
+        # Stages are registered in dependency order, so every dep task exists first
+        for name in self._stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
+
+
+class StageLimits:
+    """
+    Per-stage concurrency caps (e.g. fetch=16, llm=4, search=2)
+    shared by every pipeline run that is handed the same instance
+    """
+
+    def __init__(self, **limits):
+        self.limits = {stage: n for stage, n in limits.items() if n}
+        self._semaphores = {stage: asyncio.Semaphore(n) for stage, n in self.limits.items()}
+
+    def limit(self, stage):
+        """Async context manager holding a slot of `stage` (no-op when uncapped)"""
+        return self._semaphores.get(stage) or contextlib.nullcontext()
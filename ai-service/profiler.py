@@ -0,0 +1,100 @@
+# Sampling profiler - switched on at runtime, no tracing overhead while off
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler: a daemon thread snapshots every other thread's
+    stack each `interval` seconds and counts the stacks. Cost while
+    running is one sys._current_frames() walk per sample; nothing at all
+    while stopped. Report: hottest functions (self / total samples) and
+    collapsed stacks for flamegraph.pl / speedscope.
+    """
+
+    def __init__(self):
+        self.interval = 0.005
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stacks = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._data_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.005, duration=None):
+        """Start sampling (clears the previous profile); stops by itself after `duration` seconds"""
+        with self._lock:
+            if self.running:
+                return False
+            self.interval = interval
+            self.samples = 0
+            self._stacks = Counter()
+            self.started_at, self.stopped_at = time.time(), None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration,), name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.report()
+
+    def _run(self, duration):
+        me = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop.wait(self.interval):
+            stacks = [self._stack(frame) for thread_id, frame in sys._current_frames().items() if thread_id != me]
+            with self._data_lock:
+                for stack in stacks:
+                    self._stacks[stack] += 1
+                self.samples += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _stack(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return tuple(reversed(names))
+
+    def collapsed(self):
+        """'outer;inner;leaf count' lines"""
+        with self._data_lock:
+            stacks = self._stacks.copy()
+        return '\n'.join(f'{";".join(stack)} {count}' for stack, count in stacks.most_common())
+
+    def report(self, limit=30):
+        with self._data_lock:
+            stacks = self._stacks.copy()
+        own, total = Counter(), Counter()
+        for stack, count in stacks.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                total[name] += count
+        return {
+            'running': self.running,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'started_at': self.started_at,
+            'stopped_at': self.stopped_at,
+            'top_self': [{'function': name, 'samples': count} for name, count in own.most_common(limit)],
+            'top_total': [{'function': name, 'samples': count} for name, count in total.most_common(limit)],
+        }
+
+
+profiler = SamplingProfiler()
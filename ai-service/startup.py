@@ -0,0 +1,118 @@
+# Cold start - lazy imports for heavy modules and the warm-up phase that runs before the service reports ready
+import asyncio
+import importlib.util
+import sys
+import time
+
+from logs import get_logger
+
+log = get_logger(__name__)
+
+
+def lazy_import(name):
+    """
+    The module `name`, loaded on first attribute access instead of now
+    (importlib.util.LazyLoader). For heavy modules only some processes use,
+    e.g. faiss in an IndexClient worker. The first access is not
+    thread-safe on Python < 3.12, so touch the module once during warm-up.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f'No module named {name!r}')
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def module_available(name):
+    """Whether `name` can be imported, without importing it (parent packages are imported)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+class Warmup:
+    """
+    Named start-up steps (sync ones run in a worker thread) and the
+    readiness state they lead to: starting -> ready, or failed when a
+    required step raised. Optional steps only log their errors.
+    """
+
+    def __init__(self):
+        self.status = 'starting'
+        self.import_seconds = None
+        self.started = None
+        self.finished = None
+        self.steps = {}
+        self.errors = {}
+        self._ready = asyncio.Event()
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    async def step(self, name, func, *args, required=True):
+        """Run one step and record its time; returns its result (None when an optional step failed)"""
+        start = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(func):
+                return await func(*args)
+            return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            self.errors[name] = f'{type(e).__name__}: {e}'
+            if required:
+                raise
+            log.warning('warmup_step_failed', step=name, error=str(e))
+            return None
+        finally:
+            self.steps[name] = round(time.perf_counter() - start, 4)
+            log.debug('warmup_step', step=name, seconds=self.steps[name])
+
+    async def run(self, warm_up):
+        """Run the `warm_up` coroutine function (made of step() calls) and settle the status"""
+        self.started = time.perf_counter()
+        try:
+            await warm_up(self)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.status = 'failed'
+            log.exception('warmup_failed', error=str(e), steps=self.steps)
+        else:
+            self.status = 'ready'
+            log.info('service_ready', import_seconds=self.import_seconds, warmup_seconds=self.warmup_seconds,
+                     steps=self.steps)
+        finally:
+            self.finished = time.perf_counter()
+            self._ready.set()
+
+    @property
+    def warmup_seconds(self):
+        if self.started is None:
+            return None
+        return round((self.finished or time.perf_counter()) - self.started, 4)
+
+    async def wait(self, timeout):
+        """True once ready; False on timeout or when warm-up failed"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.ready
+
+    def stats(self):
+        return {
+            'status': self.status,
+            'ready': self.ready,
+            'import_seconds': self.import_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'steps': dict(self.steps),
+            'errors': dict(self.errors),
+        }
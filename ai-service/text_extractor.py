@@ -1,8 +1,183 @@
-# BeautifulSoup web scraper - extracts text from URLs
-import requests
-from bs4 import BeautifulSoup
+# Web scraper - extracts text from URLs (lxml single pass, BeautifulSoup fallback)
+import os
+import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import httpx
 import re
 
+from content_parser import ContentStream, parse_content
+from http_cache import get_http_cache
+from http_client import get_http_pool
+from logs import get_logger
+
+log = get_logger(__name__)
+
+# Better headers to mimic a real browser
+# (no Connection header - it is illegal over HTTP/2 and keep-alive is the default anyway)
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+FETCH_TIMEOUT = 15
+
+# 'lxml' (single pass over parser events) or 'bs4' (the original DOM-walking extractor)
+HTML_PARSER = os.getenv('EXTRACT_PARSER', 'lxml')
+
+# Pages are streamed and never buffered past this many (decoded) bytes
+FETCH_MAX_BYTES = int(os.getenv('EXTRACT_MAX_BYTES', 2 * 1024 * 1024))
+# Main-text characters the analysis prompt uses (/extract truncates the text to this) -
+# the streaming parser stops the download once it has this much
+TEXT_BUDGET = int(os.getenv('EXTRACT_TEXT_BUDGET', 3000))
+CHUNK_SIZE = 64 * 1024
+HTML_CONTENT_TYPES = {'text/html', 'application/xhtml+xml', 'application/xml', 'text/xml', 'text/plain'}
+
+# Bounded pool for the CPU-heavy HTML parse, so it never runs on the event loop
+_parse_executor = None
+
+# Keep-alive session for the blocking helper, created on first use (scripts only - the
+# service uses the shared async pool and never imports requests)
+_session = None
+
+
+def get_parse_executor():
+    """
+    Lazily create the shared parse pool
+    EXTRACT_PARSE_EXECUTOR picks 'thread' (default) or 'process',
+    EXTRACT_PARSE_WORKERS bounds how many pages are parsed at once
+    """
+    global _parse_executor
+    if _parse_executor is None:
+        workers = int(os.getenv('EXTRACT_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+        if os.getenv('EXTRACT_PARSE_EXECUTOR', 'thread') == 'process':
+            _parse_executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _parse_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='html-parse')
+    return _parse_executor
+
+
+def shutdown_extractor():
+    """Release the parse pool (called on app shutdown)"""
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+
+
+class PageRejected(Exception):
+    """The URL answered with something that is not a page (PDF, image, video...)"""
+
+
+class FetchedPage:
+    """
+    A streamed response body - all of it, or as much as the byte cap / early stop allowed
+    parsed is the finished ContentParser when the body was parsed while downloading
+    """
+
+    def __init__(self, url, status_code, headers, content, encoding=None, complete=True, parsed=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.complete = complete
+        self.parsed = parsed
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class DownloadStats:
+    """How many bytes page downloads read, and how many the cap and the early stop skipped"""
+
+    def __init__(self):
+        self.pages = 0
+        self.complete = 0
+        self.stopped_early = 0
+        self.truncated = 0
+        self.rejected = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self.unknown_length_skips = 0
+
+    def record(self, downloaded, content_length, stop_reason):
+        self.pages += 1
+        self.bytes_downloaded += downloaded
+        if stop_reason is None:
+            self.complete += 1
+            return
+        setattr(self, stop_reason, getattr(self, stop_reason) + 1)
+        # Savings are only known when the origin announced a length (chunked bodies count separately)
+        if content_length and content_length.isdigit():
+            self.bytes_saved += max(0, int(content_length) - downloaded)
+        else:
+            self.unknown_length_skips += 1
+
+    def stats(self):
+        total = self.bytes_downloaded + self.bytes_saved
+        return {
+            'pages': self.pages,
+            'complete': self.complete,
+            'stopped_early': self.stopped_early,
+            'truncated': self.truncated,
+            'rejected': self.rejected,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_saved': self.bytes_saved,
+            'saved_ratio': round(self.bytes_saved / total, 4) if total else 0.0,
+            'unknown_length_skips': self.unknown_length_skips,
+            'max_bytes': FETCH_MAX_BYTES,
+            'text_budget': TEXT_BUDGET,
+        }
+
+
+download_stats = DownloadStats()
+
+
+class _Download:
+    """Per-chunk bookkeeping shared by the blocking and async fetchers"""
+
+    def __init__(self, url, content_type, extract):
+        mime = (content_type or '').split(';')[0].strip().lower()
+        if mime and mime not in HTML_CONTENT_TYPES:
+            download_stats.rejected += 1
+            raise PageRejected(f'{url} is {mime}, not an HTML page')
+        self.url = url
+        self.stream = ContentStream(TEXT_BUDGET) if extract and HTML_PARSER == 'lxml' else None
+        self.chunks = []
+        self.size = 0
+        self.stop_reason = None
+
+    def add(self, chunk):
+        """Keep (and parse) the next chunk; sets stop_reason once reading further is pointless"""
+        chunk = chunk[:FETCH_MAX_BYTES - self.size]
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.stream is not None:
+            self.stream.feed(chunk)
+            if self.stream.done:
+                self.stop_reason = 'stopped_early'
+        if self.stop_reason is None and self.size >= FETCH_MAX_BYTES:
+            self.stop_reason = 'truncated'
+
+    def finish(self, status_code, headers, encoding, downloaded):
+        download_stats.record(downloaded, headers.get('content-length'), self.stop_reason)
+        if self.stop_reason:
+            log.debug('download_stopped', url=self.url, bytes=self.size, reason=self.stop_reason)
+        parsed = None
+        if self.stream is not None:
+            try:
+                parsed = self.stream.close()
+            except Exception:
+                parsed = None  # nothing parseable yet - callers fall back to parsing the content
+        return FetchedPage(self.url, status_code, headers, b''.join(self.chunks), encoding,
+                           complete=self.stop_reason is None, parsed=parsed)
+
+
 def clean_text(text):
     """
     Clean and preprocess extracted text
@@ -15,40 +190,55 @@ def clean_text(text):
     text = text.strip()
     return text
 
-def extract_text_from_url(url):
+
+def parse_html(content, url):
     """
-    Extract main content text from a URL
-    Handles paywalled sites by extracting what's available
+    Extract main content text from already-downloaded HTML
+    Pure CPU work - safe to run in a worker thread or process
+    """
+    if HTML_PARSER == 'bs4':
+        return parse_html_bs4(content, url)
+    return parse_html_lxml(content, url)
+
+
+def parse_html_lxml(content, url):
+    """
+    Single pass over lxml parser events (content_parser) - no DOM tree,
+    and each piece of text is emitted once instead of once per ancestor
     """
     try:
-        print(f'🌐 Fetching URL: {url}')
-        
-        # Better headers to mimic a real browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-        
-        # Fetch the page
-        response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        response.raise_for_status()
-        
+        return _parsed_result(parse_content(content), url)
+    except Exception as e:
+        return _error_result(url, e)
+
+
+def _parsed_result(page, url):
+    """Extraction result from a finished ContentParser"""
+    title_text = page.page_title or 'No title'
+    return _extraction_result(page.blocks(), title_text, page.meta_description or '', url)
+
+
+def parse_html_bs4(content, url):
+    """
+    BeautifulSoup extractor - builds the full DOM and collects every small
+    text-bearing element, so nested blocks repeat their children's text
+    Kept for comparison (EXTRACT_PARSER=bs4, benchmarks/bench_html_extract.py)
+    """
+    from bs4 import BeautifulSoup
+
+    try:
         # Parse HTML
-        soup = BeautifulSoup(response.content, 'lxml')
-        
+        soup = BeautifulSoup(content, 'lxml')
+
         # Get title first (before removing elements)
         title = soup.find('title')
         title_text = title.get_text().strip() if title else 'No title'
-        
+
         # Also try og:title or article title
         og_title = soup.find('meta', property='og:title')
         if og_title and og_title.get('content'):
             title_text = og_title.get('content').strip()
-        
+
         # Get meta description as backup content
         meta_desc = soup.find('meta', attrs={'name': 'description'})
         og_desc = soup.find('meta', property='og:description')
@@ -57,13 +247,13 @@ def extract_text_from_url(url):
             meta_content = og_desc.get('content')
         elif meta_desc and meta_desc.get('content'):
             meta_content = meta_desc.get('content')
-        
+
         # Remove non-content elements
         for tag in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'noscript', 'iframe']):
             tag.decompose()
-        
+
         text_parts = []
-        
+
         # Try multiple content selectors
         content_selectors = [
             'article',
@@ -76,7 +266,7 @@ def extract_text_from_url(url):
             '#article-body',
             '.content',
         ]
-        
+
         main_content = None
         for selector in content_selectors:
             try:
@@ -85,11 +275,11 @@ def extract_text_from_url(url):
                     break
             except:
                 continue
-        
+
         # Fallback to body
         if not main_content:
             main_content = soup.find('body')
-        
+
         if main_content:
             # Get all text-bearing elements
             for element in main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'li', 'span', 'div']):
@@ -99,43 +289,165 @@ def extract_text_from_url(url):
                 text = element.get_text().strip()
                 if len(text) > 30:  # Only substantial text
                     text_parts.append(text)
-        
-        # Join and clean
-        full_text = ' '.join(text_parts)
-        cleaned_text = clean_text(full_text)
-        
-        # If very little content, use title + meta description
-        if len(cleaned_text) < 100:
-            print(f'⚠️ Limited content extracted, using metadata')
-            cleaned_text = f"{title_text}. {meta_content}"
-            cleaned_text = clean_text(cleaned_text)
-        
-        # Minimum content check - use title at minimum
-        if len(cleaned_text) < 20:
-            cleaned_text = title_text
-        
-        print(f'✅ Extracted {len(cleaned_text)} characters')
-        
-        return {
-            'text': cleaned_text,
-            'title': title_text,
-            'url': url
-        }
-        
-    except requests.exceptions.HTTPError as e:
-        print(f'❌ HTTP Error: {str(e)}')
-        # Try to get title from URL for paywalled content
-        return {
-            'text': f'Article from {url}',
-            'title': url.split('/')[-1].replace('-', ' ').title(),
-            'url': url,
-            'error': str(e)
-        }
+
+        return _extraction_result(text_parts, title_text, meta_content, url)
+
     except Exception as e:
-        print(f'❌ Error extracting text: {str(e)}')
-        return {
-            'text': '',
-            'title': 'Error',
-            'url': url,
-            'error': str(e)
-        }
+        return _error_result(url, e)
+
+
+def _extraction_result(text_parts, title_text, meta_content, url):
+    """Join and clean the collected text, falling back to page metadata"""
+    # Join and clean
+    full_text = ' '.join(text_parts)
+    cleaned_text = clean_text(full_text)
+
+    # If very little content, use title + meta description
+    if len(cleaned_text) < 100:
+        log.debug('extract_used_metadata', url=url)
+        cleaned_text = f"{title_text}. {meta_content}"
+        cleaned_text = clean_text(cleaned_text)
+
+    # Minimum content check - use title at minimum
+    if len(cleaned_text) < 20:
+        cleaned_text = title_text
+
+    log.debug('page_extracted', url=url, chars=len(cleaned_text))
+
+    return {
+        'text': cleaned_text,
+        'title': title_text,
+        'url': url
+    }
+
+
+def _http_error_result(url, e):
+    log.warning('page_fetch_failed', url=url, error=str(e))
+    # Try to get title from URL for paywalled content
+    return {
+        'text': f'Article from {url}',
+        'title': url.split('/')[-1].replace('-', ' ').title(),
+        'url': url,
+        'error': str(e)
+    }
+
+
+def _error_result(url, e):
+    log.warning('page_extract_failed', url=url, error=str(e))
+    return {
+        'text': '',
+        'title': 'Error',
+        'url': url,
+        'error': str(e)
+    }
+
+
+def extract_text_from_url(url):
+    """
+    Extract main content text from a URL
+    Handles paywalled sites by extracting what's available
+    Blocking - use extract_text_from_url_async inside request handlers
+    """
+    global _session
+    import requests
+
+    try:
+        log.debug('page_fetch', url=url)
+        if _session is None:
+            _session = requests.Session()
+
+        # Stream the page, parsing as it arrives and stopping once there is enough text
+        with _session.get(url, headers=BROWSER_HEADERS, timeout=FETCH_TIMEOUT, allow_redirects=True, stream=True) as response:
+            response.raise_for_status()
+            download = _Download(url, response.headers.get('content-type'), extract=True)
+            for chunk in response.iter_content(CHUNK_SIZE):
+                download.add(chunk)
+                if download.stop_reason:
+                    break
+            page = download.finish(response.status_code, response.headers, response.encoding, response.raw.tell())
+
+        if page.parsed is not None:
+            return _parsed_result(page.parsed, url)
+        return parse_html(page.content, url)
+
+    except (requests.exceptions.HTTPError, PageRejected) as e:
+        return _http_error_result(url, e)
+    except Exception as e:
+        return _error_result(url, e)
+
+
+async def fetch_page(url, extract=False, min_fresh=0):
+    """
+    Stream a page through the shared HTTP pool, keeping at most FETCH_MAX_BYTES
+    With extract=True the body is fed to the incremental lxml parser as it
+    arrives (in the parse pool) and the download stops once the parser has
+    the head metadata and TEXT_BUDGET characters of main text
+    Goes through the HTTP cache when one is configured (min_fresh: see HttpCache.fetch)
+    Raises httpx.HTTPStatusError on 4xx/5xx and PageRejected for non-HTML bodies
+    """
+    # A process pool can't keep parser state between chunks - parse once at the end instead
+    extract = extract and isinstance(get_parse_executor(), ThreadPoolExecutor) and HTML_PARSER == 'lxml'
+    cache = get_http_cache()
+    if cache is None:
+        return await _download_page(url, extract)
+    # A cut-off body is only reusable by a fetch that would cut it at the same point
+    partial = f'text:{TEXT_BUDGET}:{FETCH_MAX_BYTES}' if extract else f'bytes:{FETCH_MAX_BYTES}'
+    return await cache.fetch(url, lambda validators: _download_page(url, extract, validators), min_fresh, partial)
+
+
+async def _download_page(url, extract, validators=None):
+    log.debug('page_fetch', url=url)
+    loop = asyncio.get_running_loop()
+    headers = {**BROWSER_HEADERS, **(validators or {})}
+    async with get_http_pool().stream('GET', url, headers=headers, timeout=FETCH_TIMEOUT) as response:
+        if response.status_code == 304:
+            return FetchedPage(url, 304, response.headers, b'')
+        response.raise_for_status()
+        download = _Download(url, response.headers.get('content-type'), extract)
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            if download.stream is not None:
+                await loop.run_in_executor(get_parse_executor(), download.add, chunk)
+            else:
+                download.add(chunk)
+            if download.stop_reason:
+                break
+        return download.finish(response.status_code, response.headers, response.charset_encoding,
+                               response.num_bytes_downloaded)
+
+
+async def parse_html_async(content, url):
+    """Run parse_html in the bounded parse pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parse_executor(), parse_html, content, url)
+
+
+async def parse_page_async(page, url):
+    """Extraction result for a fetched page - reuses the parse done while streaming when there was one"""
+    parsed = getattr(page, 'parsed', None)
+    if parsed is None:
+        return await parse_html_async(page.content, url)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parse_executor(), _parsed_result, parsed, url)
+
+
+def extraction_error(url, e):
+    """Fallback extraction result for a failed fetch (or a non-HTML URL)"""
+    # A requests error only comes from the blocking helper, which has imported requests by then
+    requests = sys.modules.get('requests')
+    if isinstance(e, (httpx.HTTPStatusError, PageRejected)) or (
+            requests is not None and isinstance(e, requests.exceptions.HTTPError)):
+        return _http_error_result(url, e)
+    return _error_result(url, e)
+
+
+async def extract_text_from_url_async(url):
+    """
+    Async version of extract_text_from_url
+    Fetches through the shared HTTP pool and parses in the bounded parse pool,
+    so a slow site or a huge page never stalls the event loop
+    """
+    try:
+        page = await fetch_page(url, extract=True)
+        return await parse_page_async(page, url)
+    except Exception as e:
+        return extraction_error(url, e)
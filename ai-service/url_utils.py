@@ -0,0 +1,61 @@
+# URL normalization - one canonical form per piece of content
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, unquote_plus
+
+# Query parameters that only track where a click came from
+# (not a bare `ref` - it selects a branch / version on GitHub and other APIs)
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'ref_src', 'ref_url', 'spm', 'si', 'feature',
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_')
+
+YOUTUBE_HOSTS = {'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com'}
+
+
+def _is_tracking(param):
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+
+def _query_params(query):
+    """(decoded name, raw `name=value` or bare `name`) per query parameter, encoding left as sent"""
+    return [(unquote_plus(part.partition('=')[0]), part) for part in query.split('&') if part]
+
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for caching and de-duplication:
+    lower-case scheme/host, no default port, no fragment, no tracking
+    params, sorted query, and youtu.be / m.youtube.com / shorts links
+    rewritten to https://www.youtube.com/watch?v=ID
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = f'https://{url}'
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    path = parts.path or '/'
+    # Parameters are kept as sent (a bare `?foo` is not `?foo=` to every server), just filtered and sorted
+    query = sorted(param for param in _query_params(parts.query) if not _is_tracking(param[0]))
+
+    # YouTube: every share form of a video becomes the watch URL with only ?v=
+    video_id = None
+    if host == 'youtu.be':
+        video_id = path.strip('/').split('/')[0]
+    elif host in YOUTUBE_HOSTS:
+        if path == '/watch':
+            video_id = dict(parse_qsl(parts.query)).get('v')
+        elif path.startswith('/shorts/'):
+            video_id = path.split('/')[2]
+    if video_id:
+        return f'https://www.youtube.com/watch?v={video_id}'
+
+    netloc = host
+    if parts.port and not (scheme == 'http' and parts.port == 80) and not (scheme == 'https' and parts.port == 443):
+        netloc = f'{host}:{parts.port}'
+    if parts.username:
+        netloc = f'{parts.username}@{netloc}'
+
+    return urlunsplit((scheme, netloc, path, '&'.join(part for _, part in query), ''))
@@ -1,55 +1,973 @@
 # FAISS vector store for similarity search
-import faiss
+import json
+import math
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
 import numpy as np
 
+from logs import get_logger
+from startup import lazy_import
+
+# Loaded when the first store is built - IndexClient workers never need it
+faiss = lazy_import('faiss')
+
+log = get_logger(__name__)
+
+# WAL record header: vector id, metadata length, crc32 of (vector + metadata)
+_WAL_HEADER = struct.Struct('<qII')
+# Metadata length marking a removal record (no payload)
+_WAL_REMOVE = 0xFFFFFFFF
+# ... and a metadata update: a uint32 length, then the JSON fields to merge
+_WAL_UPDATE = 0xFFFFFFFE
+_WAL_LENGTH = struct.Struct('<I')
+
+# (minimum size, index_factory description) - {nlist} is filled in when the tier is built
+DEFAULT_TIERS = [
+    (0, 'Flat'),
+    (50_000, 'HNSW32'),
+    (2_000_000, 'IVF{nlist},PQ48'),
+]
+
+METRICS = ('l2', 'ip')
+
+
+def metric_type(metric):
+    """FAISS metric constant for 'l2' / 'ip'"""
+    return faiss.METRIC_L2 if metric == 'l2' else faiss.METRIC_INNER_PRODUCT
+
+
+# Vectors copied per lock hold during a rebuild, so adds and searches keep flowing
+_REBUILD_CHUNK = 65_536
+_TRAIN_SAMPLE = 100_000
+
+# Compressed vector codes per storage mode (bytes per 768-d vector: 3072 / 1536 / 768 / m)
+STORAGE_CODECS = {'float32': 'Flat', 'fp16': 'SQfp16', 'sq8': 'SQ8', 'pq': 'PQ{m}'}
+
+# A codec that needs training stays on exact Flat until this many vectors exist
+MIN_TRAIN_SIZE = 10_000
+
+# Rebuild without removed vectors once they hold this share of the index slots
+COMPACT_RATIO = 0.1
+
+# Filters matching less than this share of the vectors run inside the FAISS search
+# (IDSelectorBatch); broader ones over-fetch and drop the misses afterwards
+FILTER_IN_SEARCH_RATIO = 0.3
+# Filters matching at most this many vectors are scored exactly, vector by vector
+FILTER_EXACT_MAX = 4096
+
+
+def parse_tiers(spec):
+    """'0=Flat;50000=HNSW32;2000000=IVF{nlist},PQ48' -> [(0, 'Flat'), ...]"""
+    tiers = []
+    for part in spec.split(';'):
+        if part.strip():
+            threshold, _, description = part.partition('=')
+            tiers.append((int(threshold), description.strip()))
+    return sorted(tiers)
+
+
+def storage_tiers(tiers, storage, pq_m=48):
+    """
+    Swap the float32 vector storage of each tier for `storage`:
+    'Flat' -> 'SQ8', 'HNSW32' -> 'HNSW32,SQ8', 'IVF{nlist},Flat' -> 'IVF{nlist},SQ8'
+    Tiers that already name a codec (e.g. IVF-PQ) are kept as they are
+    """
+    codec = STORAGE_CODECS[storage].format(m=pq_m)
+    result = []
+    for threshold, description in tiers:
+        parts = description.split(',')
+        if parts[-1] == 'Flat':
+            parts[-1] = codec
+        elif len(parts) == 1 and parts[0].startswith('HNSW') and codec != 'Flat':
+            parts.append(codec)
+        result.append((threshold, ','.join(parts)))
+    return result
+
+
+def exact_rerank(queries, candidates, vectors, k, metric='l2'):
+    """
+    Re-score candidate IDs (nq, n) with the original float32 vectors and keep the best k
+    Returns (distances, indices) like an index search
+    """
+    valid = candidates >= 0
+    rows = vectors[np.where(valid, candidates, 0)]  # (nq, n, dim)
+    if metric == 'ip':
+        scores = np.einsum('qnd,qd->qn', rows, queries)
+        scores[~valid] = -np.inf
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    else:
+        scores = ((rows - queries[:, None, :]) ** 2).sum(axis=2)
+        scores[~valid] = np.inf
+        order = np.argsort(scores, axis=1, kind='stable')[:, :k]
+    indices = np.take_along_axis(candidates, order, axis=1)
+    return np.take_along_axis(scores, order, axis=1).astype('float32'), indices
+
+
+class RawVectors:
+    """
+    Append-only float32 copy of every vector (row = vector ID), memory-mapped for reads
+    Lets a quantized index re-rank with exact scores and rebuild without
+    compounding quantization error; lives in a temp file without `path`
+    """
+
+    def __init__(self, dimension, path=None):
+        self.dimension = dimension
+        self.row_bytes = 4 * dimension
+        self.file = open(path, 'a+b') if path else tempfile.TemporaryFile()
+        self.file.seek(0, os.SEEK_END)
+        self.count = self.file.tell() // self.row_bytes
+        self._mmap = None
+
+    def append(self, vectors):
+        self.file.seek(self.count * self.row_bytes)
+        self.file.write(np.ascontiguousarray(vectors, dtype='float32').tobytes())
+        self.file.flush()
+        self.count += len(vectors)
+
+    def truncate(self, count):
+        self.file.truncate(count * self.row_bytes)
+        self.count = min(self.count, count)
+        self._mmap = None
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+
+    def view(self):
+        """(count, dimension) read-only memmap"""
+        if self.count == 0:
+            return np.zeros((0, self.dimension), dtype='float32')
+        if self._mmap is None or len(self._mmap) < self.count:
+            self._mmap = np.memmap(self.file, dtype='float32', mode='r', shape=(self.count, self.dimension))
+        return self._mmap[:self.count]
+
+    def close(self):
+        self._mmap = None
+        self.file.close()
+
+
+def _facet_value(value):
+    """Filter values compare case-insensitively"""
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def _code_size(index):
+    """Bytes per stored vector code (HNSW graph links not included)"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    try:
+        return index.sa_code_size()
+    except RuntimeError:
+        return None
+
+
+class SlotTable:
+    """
+    Dense index slots <-> stable vector IDs
+
+    FAISS numbers vectors by position (slot); IDs outlive removals and
+    rebuilds. A removed vector's slot stays in the index as a tombstone
+    bit that searches skip (IDSelectorBitmap) until compaction drops it.
+    """
+
+    def __init__(self, ids=()):
+        ids = np.asarray(ids, dtype='int64')
+        self.count = len(ids)
+        self.ids = np.full(max(1024, -(-self.count // 8) * 8), -1, dtype='int64')
+        self.ids[:self.count] = ids
+        self.dead = np.zeros(len(self.ids) // 8, dtype=np.uint8)
+        alive = ids >= 0
+        self.dead[:(self.count + 7) // 8] = np.packbits(~alive, bitorder='little')
+        self.dead_count = int(self.count - alive.sum())
+        self.slot_of = dict(zip(ids[alive].tolist(), np.flatnonzero(alive).tolist()))
+
+    def append(self, vector_id):
+        if self.count == len(self.ids):
+            self.ids = np.concatenate([self.ids, np.full(len(self.ids), -1, dtype='int64')])
+            self.dead = np.concatenate([self.dead, np.zeros(len(self.dead), dtype=np.uint8)])
+        self.ids[self.count] = vector_id
+        self.slot_of[vector_id] = self.count
+        self.count += 1
+
+    def kill(self, vector_id):
+        """Tombstone the slot holding `vector_id`; False if it is not stored"""
+        slot = self.slot_of.pop(vector_id, None)
+        if slot is None:
+            return False
+        self.ids[slot] = -1
+        self.dead[slot >> 3] |= 1 << (slot & 7)
+        self.dead_count += 1
+        return True
+
+    def ids_for(self, slots):
+        """Vector IDs for search result slots (-1 stays -1)"""
+        return np.where(slots >= 0, self.ids[np.maximum(slots, 0)], -1)
+
+    def live_slots(self, stop):
+        return np.flatnonzero(self.ids[:stop] >= 0)
+
+    def selector(self):
+        """IDSelector accepting live slots; keep the returned refs alive during the search"""
+        bitmap = faiss.IDSelectorBitmap(len(self.dead), faiss.swig_ptr(self.dead))
+        return faiss.IDSelectorNot(bitmap), (bitmap, self.dead)
+
+
 class VectorStore:
-    """FAISS-based vector database for k-NN similarity search"""
-    
-    def __init__(self, dimension=768):
+    """
+    FAISS-based vector database for k-NN similarity search
+
+    Vectors get stable IDs. A record whose key (metadata['url'] by default)
+    is already stored replaces the old vector, so a URL is indexed once;
+    remove() tombstones IDs and compaction rebuilds the index without them
+    once they pass COMPACT_RATIO of its slots. Metadata `filter_fields`
+    are indexed so search(where={'category': ...}) filters inside FAISS.
+
+    Index tiers: the store starts on the first tier (exact Flat) and once
+    its size crosses the next tier's threshold it trains and fills that
+    index (HNSW, IVF-Flat, IVF-PQ, ...) in a background thread while the
+    old index keeps serving, then swaps it in. metric='ip' ranks by inner
+    product, i.e. cosine similarity for the L2-normalized embeddings
+    (larger is closer).
+
+    Storage: 'fp16', 'sq8' or 'pq' keep compressed codes in the index
+    instead of float32 (2x / 4x / 64x smaller at 768-d with pq_m=48).
+    rerank=N fetches k*N candidates and re-scores them exactly against a
+    memory-mapped float32 copy (vectors.f32), so RAM holds only the codes.
+
+    With `persist_dir` set the store is durable:
+      snapshot-N/      index.faiss + slots.npy + metadata.json + manifest.json, written atomically
+      CURRENT          name of the live snapshot
+      wal-N.log        adds and removals since snapshot N
+    Startup loads the live snapshot (memory-mapped where FAISS supports it)
+    and replays the write-ahead logs, so IDs and metadata always agree.
+    WAL records are fsynced before add() / remove() return, so they survive
+    a power loss too. wal_sync_interval > 0 fsyncs at most that often
+    (group commit - a power loss can drop the records since the last
+    fsync); < 0 only flushes, which covers a process crash but not the OS.
+    """
+
+    def __init__(self, dimension=768, persist_dir=None, mmap=True, metric='l2', tiers=None,
+                 nprobe=16, ef_search=64, storage='float32', pq_m=48, rerank=0, key_field='url',
+                 filter_fields=('category', 'is_youtube'), wal_sync_interval=0.0):
         """Initialize FAISS index with given dimension"""
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric: {metric}')
+        if storage not in STORAGE_CODECS:
+            raise ValueError(f'Unknown storage: {storage}')
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
+        self.metric = metric
+        self.storage = storage
+        self.tiers = storage_tiers(tiers or DEFAULT_TIERS, storage, pq_m)
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.rerank = rerank
+        self.key_field = key_field
+        self.tier = 0
+        if not self._build_index(0, 0).is_trained:
+            # Nothing to train on yet: start exact, promote once there is enough data
+            self.tiers = [(0, 'Flat')] + [(max(t, MIN_TRAIN_SIZE), d) for t, d in self.tiers]
+        self.index = self._build_index(0, 0)
+        # In-RAM index for vectors added on top of a read-only (memory-mapped) one
+        self.delta = None
+        self.slots = SlotTable()
+        self.metadata = {}
+        self.keys = {}
+        # field -> value -> IDs, for filtered search
+        self.facets = {field: {} for field in filter_fields}
         self.next_id = 0
-        print(f'📊 FAISS index initialized (dimension={dimension})')
-    
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.mmap = mmap
+        self.generation = 0
+        self.dirty = False
+        self.rebuilding = False
+        # Adds / removals made while a rebuild copies the index (None when idle)
+        self._pending = None
+        self._retry_at = 0
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._wal = None
+        self.wal_sync_interval = wal_sync_interval
+        self._wal_synced_at = 0.0
+        self._wal_unsynced = False
+        self.raw = None
+        if rerank:
+            if self.persist_dir:
+                self.persist_dir.mkdir(parents=True, exist_ok=True)
+            self.raw = RawVectors(dimension, self.persist_dir / 'vectors.f32' if self.persist_dir else None)
+
+        if self.persist_dir:
+            self._open()
+        log.info('vector_store_ready', dimension=dimension, tier=self.tier_name, vectors=self.size())
+        self._maybe_rebuild()
+
+    # ---- tiers -------------------------------------------------------------
+
+    @property
+    def tier_name(self):
+        return self.tiers[self.tier][1]
+
+    def _build_index(self, tier, size):
+        """Empty index for `tier`, with nlist sized for about `size` vectors"""
+        nlist = max(16, int(4 * math.sqrt(max(size, 1))))
+        description = self.tiers[tier][1].format(nlist=nlist)
+        return self._tune(faiss.index_factory(self.dimension, description, metric_type(self.metric)))
+
+    def _tune(self, index):
+        """Apply search-time parameters (nprobe / efSearch) where the index has them"""
+        params = faiss.ParameterSpace()
+        if faiss.try_extract_index_ivf(index) is not None:
+            params.set_index_parameter(index, 'nprobe', self.nprobe)
+        if isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+            params.set_index_parameter(index, 'efSearch', self.ef_search)
+        return index
+
+    def _target_tier(self, size):
+        tier = self.tier
+        while tier + 1 < len(self.tiers) and size >= self.tiers[tier + 1][0]:
+            tier += 1
+        return tier
+
+    def _maybe_rebuild(self, force=False):
+        """Start a background rebuild to promote a tier or drop tombstoned slots"""
+        with self._lock:
+            if self.rebuilding or (self.size() < self._retry_at and not force):
+                return
+            promote = self._target_tier(self.size()) != self.tier
+            compact = self.slots.dead_count > COMPACT_RATIO * self.slots.count
+            if not (promote or compact or (force and self.slots.dead_count)):
+                return
+            self.rebuilding = True
+        threading.Thread(target=self._rebuild, name='vector-rebuild', daemon=True).start()
+
+    def _copy_vectors(self, start, stop, live):
+        """Live vectors among slots [start, stop) (caller holds the lock)"""
+        if self.raw is not None:
+            return np.array(self.raw.view()[self.slots.ids[live]])
+        base_total = self.index.ntotal
+        parts = []
+        if start < base_total:
+            parts.append(self.index.reconstruct_n(start, min(stop, base_total) - start))
+        if stop > base_total:
+            first = max(start, base_total)
+            parts.append(self.delta.reconstruct_n(first - base_total, stop - first))
+        return np.vstack(parts)[live - start]
+
+    def _read_chunks(self, live):
+        """Copy the vectors of `live` slots, one lock hold per chunk"""
+        for start in range(0, int(live[-1]) + 1 if len(live) else 0, _REBUILD_CHUNK):
+            stop = start + _REBUILD_CHUNK
+            in_chunk = live[(live >= start) & (live < stop)]
+            if len(in_chunk):
+                with self._lock:
+                    chunk = self._copy_vectors(start, min(stop, self.slots.count), in_chunk)
+                yield chunk
+
+    def _rebuild(self):
+        """Train and fill an index for the target tier in the background, then swap it in"""
+        total = self.size()
+        try:
+            with self._lock:
+                total = self.size()
+                tier = self._target_tier(total)
+                live = self.slots.live_slots(self.slots.count)
+                ids = self.slots.ids[live]
+                self._pending = []
+                ivf = faiss.try_extract_index_ivf(self.index)
+                if ivf is not None:
+                    ivf.make_direct_map()  # needed by reconstruct_n
+            action = 'Promoting' if tier != self.tier else 'Compacting'
+            log.info('vector_index_rebuild_started', action=action.lower(), vectors=total, tier=self.tier_name, target=self.tiers[tier][1])
+
+            new_index = self._build_index(tier, total)
+            if not new_index.is_trained:
+                # Train on an evenly spread sample of what is stored
+                sample_rows = np.unique(np.linspace(0, total - 1, min(total, _TRAIN_SAMPLE)).astype('int64'))
+                new_index.train(self._sample(live[sample_rows]))
+
+            for chunk in self._read_chunks(live):
+                new_index.add(chunk)
+
+            with self._lock:
+                # Replay what happened during the rebuild, in order
+                slots = SlotTable(ids)
+                for op, vector_id, embedding in self._pending:
+                    if op == 'add':
+                        new_index.add(embedding)
+                        slots.append(vector_id)
+                    else:
+                        slots.kill(vector_id)
+                self.index = new_index
+                self.slots = slots
+                self.delta = None
+                self.tier = tier
+                self.dirty = True
+            log.info('vector_index_rebuilt', tier=self.tier_name, vectors=self.size())
+        except Exception as e:
+            # Keep serving the current index; try again after 10% growth
+            self._retry_at = int(total * 1.1) + 1
+            log.exception('vector_index_rebuild_failed', error=str(e))
+        finally:
+            with self._lock:
+                self.rebuilding = False
+                self._pending = None
+        self._maybe_rebuild()
+
+    def _sample(self, slots):
+        return np.vstack(list(self._read_chunks(slots)))
+
+    # ---- public API --------------------------------------------------------
+
     def add(self, embedding, metadata=None):
-        """Add a vector to the index, returns vector ID"""
+        """
+        Add a vector to the index, returns vector ID
+        If metadata[key_field] is already stored, that vector is replaced
+        """
         if embedding.ndim == 1:
             embedding = embedding.reshape(1, -1)
-        
-        self.index.add(embedding)
-        current_id = self.next_id
-        self.next_id += 1
-        
-        print(f'➕ Added vector (ID={current_id}, total={self.index.ntotal})')
+        embedding = np.ascontiguousarray(embedding, dtype='float32')
+
+        with self._lock:
+            current_id = self.next_id
+            if self._wal is not None:
+                self._append_wal(current_id, embedding, metadata)
+            self._apply_add(current_id, embedding, metadata)
+            self.dirty = True
+
+        log.debug('vector_added', id=current_id, total=self.size())
+        self._maybe_rebuild()
         return current_id
-    
-    def search(self, query_embedding, k=5):
-        """Find k most similar vectors using L2 distance"""
+
+    def upsert(self, key, embedding, metadata=None):
+        """Insert or replace the vector stored for `key` (e.g. a URL), returns its new ID"""
+        return self.add(embedding, {**(metadata or {}), self.key_field: key})
+
+    def update_metadata(self, vector_id, fields):
+        """
+        Merge `fields` into a stored vector's metadata without touching the
+        vector; False if the ID is not stored. The key and filter fields
+        cannot change this way - upsert instead
+        """
+        vector_id = int(vector_id)
+        if self.key_field in fields or any(field in self.facets for field in fields):
+            raise ValueError('update_metadata cannot change key or filter fields')
+        with self._lock:
+            if not isinstance(self.metadata.get(vector_id), dict):
+                return False
+            if self._wal is not None:
+                self._append_update(vector_id, fields)
+            self._apply_update(vector_id, fields)
+            self.dirty = True
+        return True
+
+    def remove(self, ids):
+        """Remove vectors by ID, returns how many were stored"""
+        removed = 0
+        with self._lock:
+            for vector_id in ids:
+                vector_id = int(vector_id)
+                if vector_id in self.slots.slot_of:
+                    if self._wal is not None:
+                        self._append_removal(vector_id)
+                    removed += self._apply_remove(vector_id)
+            if removed:
+                self.dirty = True
+        if removed:
+            log.info('vectors_removed', removed=removed, total=self.size())
+            self._maybe_rebuild()
+        return removed
+
+    def compact(self):
+        """Rebuild without tombstoned slots now instead of waiting for COMPACT_RATIO"""
+        self._maybe_rebuild(force=True)
+
+    def get_id(self, key):
+        """ID of the vector stored for `key` (None if absent)"""
+        return self.keys.get(key)
+
+    def get_vector(self, vector_id):
+        """Stored vector for an ID (decoded from the index unless rerank keeps float32 copies)"""
+        with self._lock:
+            slot = self.slots.slot_of.get(int(vector_id))
+            if slot is None:
+                return None
+            return self._vectors_at(np.array([slot]))[0]
+
+    def _vectors_at(self, slots):
+        """Vectors of sorted `slots` (caller holds the lock)"""
+        if self.raw is not None:
+            return np.array(self.raw.view()[self.slots.ids[slots]])
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+        base_total = self.index.ntotal
+        base, delta = slots[slots < base_total], slots[slots >= base_total] - base_total
+        parts = [self.index.reconstruct_batch(base)] if len(base) else []
+        if len(delta):
+            parts.append(self.delta.reconstruct_batch(delta))
+        return np.vstack(parts) if parts else np.zeros((0, self.dimension), dtype='float32')
+
+    def _index_facets(self, vector_id, metadata):
+        if isinstance(metadata, dict):
+            for field, values in self.facets.items():
+                if field in metadata:
+                    values.setdefault(_facet_value(metadata[field]), set()).add(vector_id)
+
+    def _matching(self, where):
+        """IDs whose metadata matches every field of `where`"""
+        matched = None
+        for field, value in where.items():
+            if field not in self.facets:
+                raise ValueError(f'{field!r} is not a filter field')
+            ids = self.facets[field].get(_facet_value(value), set())
+            matched = ids if matched is None else matched & ids
+        return matched
+
+    def _apply_add(self, vector_id, embedding, metadata):
+        key = metadata.get(self.key_field) if isinstance(metadata, dict) else None
+        replaced = self.keys.get(key) if key is not None else None
+        (self.delta if self.delta is not None else self.index).add(embedding)
+        self.slots.append(vector_id)
+        if self.raw is not None:
+            self.raw.append(embedding)
+        self.metadata[vector_id] = metadata
+        self.next_id = max(self.next_id, vector_id + 1)
+        if self._pending is not None:
+            self._pending.append(('add', vector_id, embedding))
+        if replaced is not None:
+            self._apply_remove(replaced)
+        if key is not None:
+            self.keys[key] = vector_id
+        self._index_facets(vector_id, metadata)
+
+    def _apply_update(self, vector_id, fields):
+        record = self.metadata.get(vector_id)
+        if isinstance(record, dict):
+            self.metadata[vector_id] = {**record, **fields}
+
+    def _apply_remove(self, vector_id):
+        if not self.slots.kill(vector_id):
+            return False
+        record = self.metadata.pop(vector_id, None)
+        key = record.get(self.key_field) if isinstance(record, dict) else None
+        if key is not None and self.keys.get(key) == vector_id:
+            del self.keys[key]
+        if isinstance(record, dict):
+            for field, values in self.facets.items():
+                if field in record:
+                    values.get(_facet_value(record[field]), set()).discard(vector_id)
+        if self._pending is not None:
+            self._pending.append(('remove', vector_id, None))
+        return True
+
+    def search(self, query_embedding, k=5, rerank=None, where=None):
+        """
+        Find k most similar vectors (L2 distance, or inner product with metric='ip')
+        Returns (ids, distances); rerank: candidate multiplier for exact re-scoring,
+        where: {filter field: value} every result must match
+        """
         if query_embedding.ndim == 1:
             query_embedding = query_embedding.reshape(1, -1)
-        
-        k = min(k, self.index.ntotal)
-        
-        if k == 0:
-            return np.array([[]]), np.array([[]])
-        
-        distances, indices = self.index.search(query_embedding, k)
-        
-        print(f'🔍 Found {k} similar vectors')
+        query_embedding = np.ascontiguousarray(query_embedding, dtype='float32')
+
+        with self._lock:
+            allowed = None
+            if where:
+                matched = self._matching(where)
+                allowed = np.sort(np.fromiter(map(self.slots.slot_of.__getitem__, matched), dtype='int64', count=len(matched)))
+            k = min(k, self.size() if allowed is None else len(allowed))
+
+            if k == 0:
+                return np.array([[]]), np.array([[]])
+
+            rerank = self.rerank if rerank is None else rerank
+            candidates = min(k * rerank, self.size()) if rerank and self.raw is not None else k
+            distances, slots = self._search_slots(query_embedding, candidates, allowed)
+            indices = self.slots.ids_for(slots)
+            if candidates > k:
+                distances, indices = exact_rerank(query_embedding, indices, self.raw.view(), k, self.metric)
+
         return indices, distances
-    
+
+    def _search_params(self, selector):
+        """SearchParameters restricting the base index to `selector` (None if unsupported)"""
+        if isinstance(self.index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = self.ef_search
+        elif faiss.try_extract_index_ivf(self.index) is not None:
+            params = faiss.SearchParametersIVF()
+            params.nprobe = self.nprobe
+        elif isinstance(self.index, faiss.IndexPQ):
+            return None  # no selector support in FAISS 1.7.x
+        else:
+            params = faiss.SearchParameters()
+        params.sel = selector
+        return params
+
+    def _search_slots(self, query_embedding, n, allowed=None, in_search=False):
+        """Best `n` live slots (of `allowed`, if given) across index + delta (caller holds the lock)"""
+        dead = self.slots.dead_count
+        base_total = self.index.ntotal
+        fetch = n
+        selector = refs = None
+        if allowed is not None and (in_search or len(allowed) <= FILTER_IN_SEARCH_RATIO * self.size()):
+            if len(allowed) <= FILTER_EXACT_MAX or self._search_params(None) is None:
+                return self._score_slots(query_embedding, n, allowed)
+            # Selective filter: FAISS only scores matching slots
+            in_search = True
+            selector = faiss.IDSelectorBatch(allowed[allowed < base_total])
+        else:
+            if dead:
+                selector, refs = self.slots.selector()
+            if allowed is not None:
+                # Broad filter: fetch enough candidates for about 2n matches
+                fetch = 2 * n * self.size() // len(allowed) + 1
+        params = self._search_params(selector) if selector is not None else None
+        if selector is not None and params is None:
+            fetch += dead  # over-fetch, drop tombstones below
+        distances, slots = self.index.search(query_embedding, fetch, params=params)
+
+        if self.delta is not None and self.delta.ntotal:
+            delta_fetch = self.delta.ntotal if allowed is not None else min(n + dead, self.delta.ntotal)
+            delta_distances, delta_slots = self.delta.search(query_embedding, delta_fetch)
+            distances = np.hstack([distances, delta_distances])
+            slots = np.hstack([slots, np.where(delta_slots >= 0, delta_slots + base_total, -1)])
+        del refs
+
+        worst = -np.inf if self.metric == 'ip' else np.inf
+        drop = slots < 0
+        if dead:
+            drop |= self.slots.ids_for(slots) < 0
+        if allowed is not None:
+            drop |= ~np.isin(slots, allowed)
+        if drop.any():
+            slots = np.where(drop, -1, slots)
+            distances = np.where(drop, worst, distances)
+        order = np.argsort(-distances if self.metric == 'ip' else distances, axis=1, kind='stable')[:, :n]
+        distances, slots = np.take_along_axis(distances, order, axis=1), np.take_along_axis(slots, order, axis=1)
+
+        if allowed is not None and not in_search and ((slots >= 0).sum(axis=1) < min(n, len(allowed))).any():
+            # The broad guess came up short: score only the matching slots
+            return self._search_slots(query_embedding, n, allowed, in_search=True)
+        return distances, slots
+
+    def _score_slots(self, query_embedding, n, slots):
+        """Exact top `n` among a small set of slots"""
+        vectors = self._vectors_at(slots)
+        if self.metric == 'ip':
+            scores = query_embedding @ vectors.T
+            order = np.argsort(-scores, axis=1, kind='stable')[:, :n]
+        else:
+            scores = ((query_embedding ** 2).sum(axis=1, keepdims=True) - 2 * query_embedding @ vectors.T
+                      + (vectors ** 2).sum(axis=1))
+            order = np.argsort(scores, axis=1, kind='stable')[:, :n]
+        return np.take_along_axis(scores, order, axis=1).astype('float32'), slots[order]
+
+    def get_metadata(self, vector_id):
+        """Metadata stored with a vector ID (None if unknown)"""
+        return self.metadata.get(int(vector_id))
+
     def size(self):
         """Get number of vectors in index"""
-        return self.index.ntotal
-    
+        return self.slots.count - self.slots.dead_count
+
+    def stats(self):
+        """Tier, size, tombstones and persistence state"""
+        return {
+            'vectors': self.size(),
+            'slots': self.slots.count,
+            'removed_slots': self.slots.dead_count,
+            'tier': self.tier_name,
+            'index': type(self.index).__name__,
+            'metric': self.metric,
+            'storage': self.storage,
+            'code_bytes_per_vector': _code_size(self.index),
+            'rerank': self.rerank,
+            'rebuilding': self.rebuilding,
+            'delta_vectors': self.delta.ntotal if self.delta is not None else 0,
+            'generation': self.generation,
+        }
+
     def save(self, filepath):
         """Save index to disk"""
-        faiss.write_index(self.index, filepath)
-        print(f'💾 Index saved to {filepath}')
-    
+        faiss.write_index(self._materialize(), filepath)
+        log.info('vector_index_saved', path=str(filepath))
+
     def load(self, filepath):
         """Load index from disk"""
-        self.index = faiss.read_index(filepath)
+        self.index = self._tune(faiss.read_index(filepath))
+        self.delta = None
+        self.slots = SlotTable(np.arange(self.index.ntotal))
         self.next_id = self.index.ntotal
-        print(f'📂 Index loaded from {filepath} ({self.next_id} vectors)')
+        log.info('vector_index_loaded', path=str(filepath), vectors=self.next_id)
+
+    # ---- persistence -------------------------------------------------------
+
+    def _wal_path(self, generation):
+        return self.persist_dir / f'wal-{generation:06d}.log'
+
+    def _snapshot_path(self, generation):
+        return self.persist_dir / f'snapshot-{generation:06d}'
+
+    def _read_index(self, path):
+        """
+        Load a snapshot index and, if it came back read-only, an empty delta index
+        IO_FLAG_MMAP maps IVF inverted lists from disk so a large index starts fast
+        and pages in lazily (FAISS 1.7.x still copies flat and HNSW indexes into
+        RAM). Mapped lists cannot be appended to, so new vectors go to the delta
+        until the next snapshot merges them.
+        """
+        index = faiss.read_index(str(path), faiss.IO_FLAG_MMAP if self.mmap else 0)
+        ivf = faiss.try_extract_index_ivf(index)
+        read_only = ivf is not None and getattr(faiss.downcast_InvertedLists(ivf.invlists), 'read_only', False)
+        delta = faiss.IndexFlat(self.dimension, metric_type(self.metric)) if read_only else None
+        return self._tune(index), delta
+
+    def _materialize(self, delta_count=None):
+        """A writable copy of index + delta (or only its first `delta_count` vectors)"""
+        with self._lock:
+            if self.delta is None:
+                return faiss.deserialize_index(faiss.serialize_index(self.index))
+            path = self._snapshot_path(self.generation) / 'index.faiss'
+            count = self.delta.ntotal if delta_count is None else delta_count
+            delta_vectors = self.delta.reconstruct_n(0, count) if count else None
+        # The mapped index is the live snapshot file; re-read it writable
+        full = faiss.read_index(str(path))
+        if delta_vectors is not None:
+            full.add(delta_vectors)
+        return full
+
+    def _open(self):
+        """Load the live snapshot and replay every WAL written since"""
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        current = self.persist_dir / 'CURRENT'
+
+        if current.exists():
+            self.generation = int(current.read_text().strip())
+            snapshot = self._snapshot_path(self.generation)
+            manifest = {}
+            if (snapshot / 'manifest.json').exists():
+                manifest = json.loads((snapshot / 'manifest.json').read_text())
+                names = [description for _, description in self.tiers]
+                self.tier = names.index(manifest['tier']) if manifest['tier'] in names else self.tier
+            self.index, self.delta = self._read_index(snapshot / 'index.faiss')
+            with open(snapshot / 'metadata.json') as f:
+                self.metadata = {int(k): v for k, v in json.load(f).items()}
+            # Snapshots from before stable IDs are positional: slot == ID
+            if (snapshot / 'slots.npy').exists():
+                self.slots = SlotTable(np.load(snapshot / 'slots.npy'))
+            else:
+                self.slots = SlotTable(np.arange(self.index.ntotal))
+            self.next_id = manifest.get('next_id', self.index.ntotal)
+            self._index_keys()
+            log.info('vector_snapshot_loaded', generation=self.generation, vectors=self.size(), index=type(self.index).__name__)
+
+        if self.raw is not None:
+            self._sync_raw()
+
+        # WALs >= the live generation hold everything not in the snapshot
+        replayed = 0
+        for wal in sorted(self.persist_dir.glob('wal-*.log')):
+            if int(wal.stem.split('-')[1]) >= self.generation:
+                replayed += self._replay_wal(wal)
+        if replayed:
+            self.dirty = True
+            log.info('vector_wal_replayed', records=replayed)
+
+        self._wal = open(self._wal_path(self.generation), 'ab')
+
+    def _index_keys(self):
+        """Rebuild key -> ID and the filter facets, dropping older duplicates left by earlier versions"""
+        self.keys = {}
+        duplicates = []
+        for vector_id in sorted(self.metadata):
+            record = self.metadata[vector_id]
+            key = record.get(self.key_field) if isinstance(record, dict) else None
+            if key is None:
+                continue
+            if key in self.keys:
+                duplicates.append(self.keys[key])
+            self.keys[key] = vector_id
+        for vector_id in duplicates:
+            self.slots.kill(vector_id)
+            self.metadata.pop(vector_id, None)
+        self.facets = {field: {} for field in self.facets}
+        for vector_id, record in self.metadata.items():
+            self._index_facets(vector_id, record)
+        if duplicates:
+            self.dirty = True
+            log.info('vector_duplicates_dropped', count=len(duplicates))
+
+    def _sync_raw(self):
+        """Align vectors.f32 with the snapshot: drop rows past it, backfill missing ones"""
+        if self.raw.count > self.next_id:
+            self.raw.truncate(self.next_id)
+        if self.raw.count < self.next_id:
+            # Re-rank enabled on an existing store: best effort from the index codes
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                ivf.make_direct_map()
+            rows = np.zeros((self.next_id - self.raw.count, self.dimension), dtype='float32')
+            for row, vector_id in enumerate(range(self.raw.count, self.next_id)):
+                slot = self.slots.slot_of.get(vector_id)
+                if slot is not None:
+                    rows[row] = self._copy_vectors(slot, slot + 1, np.array([slot]))[0]
+            self.raw.append(rows)
+
+    def _append_wal(self, vector_id, embedding, metadata):
+        payload = embedding.tobytes() + json.dumps(metadata).encode('utf-8')
+        meta_len = len(payload) - embedding.nbytes
+        self._wal.write(_WAL_HEADER.pack(vector_id, meta_len, zlib.crc32(payload)) + payload)
+        self._sync_wal()
+
+    def _append_update(self, vector_id, fields):
+        payload = json.dumps(fields).encode('utf-8')
+        payload = _WAL_LENGTH.pack(len(payload)) + payload
+        self._wal.write(_WAL_HEADER.pack(vector_id, _WAL_UPDATE, zlib.crc32(payload)) + payload)
+        self._sync_wal()
+
+    def _append_removal(self, vector_id):
+        self._wal.write(_WAL_HEADER.pack(vector_id, _WAL_REMOVE, zlib.crc32(b'')))
+        self._sync_wal()
+
+    def _sync_wal(self, force=False):
+        """Flush the WAL and fsync it as wal_sync_interval allows (always when forced)"""
+        self._wal.flush()
+        self._wal_unsynced = True
+        if self.wal_sync_interval < 0 and not force:
+            return
+        now = time.monotonic()
+        if force or now - self._wal_synced_at >= self.wal_sync_interval:
+            os.fsync(self._wal.fileno())
+            self._wal_synced_at = now
+            self._wal_unsynced = False
+
+    def _replay_wal(self, path):
+        vector_bytes = 4 * self.dimension
+        replayed = 0
+        with open(path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset < len(data):
+            payload = None
+            if offset + _WAL_HEADER.size <= len(data):
+                vector_id, meta_len, crc = _WAL_HEADER.unpack_from(data, offset)
+                start = offset + _WAL_HEADER.size
+                if meta_len == _WAL_REMOVE:
+                    end = start
+                elif meta_len == _WAL_UPDATE:
+                    end = len(data) + 1
+                    if start + _WAL_LENGTH.size <= len(data):
+                        end = start + _WAL_LENGTH.size + _WAL_LENGTH.unpack_from(data, start)[0]
+                else:
+                    end = start + vector_bytes + meta_len
+                if end <= len(data) and zlib.crc32(data[start:end]) == crc:
+                    payload = data[start:end]
+            if payload is None:
+                # Crash mid-write: cut the torn tail so later appends stay readable
+                log.warning('vector_wal_torn_record', file=path.name, offset=offset)
+                os.truncate(path, offset)
+                break
+            offset = end
+            if meta_len == _WAL_REMOVE:
+                replayed += self._apply_remove(vector_id)
+            elif meta_len == _WAL_UPDATE:
+                self._apply_update(vector_id, json.loads(payload[_WAL_LENGTH.size:]))
+                replayed += 1
+            elif vector_id >= self.next_id:
+                embedding = np.frombuffer(payload[:vector_bytes], dtype='float32').reshape(1, -1)
+                self._apply_add(vector_id, embedding, json.loads(payload[vector_bytes:]))
+                replayed += 1
+        return replayed
+
+    def snapshot(self):
+        """
+        Atomically write a new snapshot and retire the old one plus its WAL
+        Adds keep flowing (into the next WAL) while the files are written
+        """
+        if self.persist_dir is None:
+            return False
+        with self._snapshot_lock:
+            with self._lock:
+                if not self.dirty:
+                    return False
+                generation = self.generation + 1
+                metadata = dict(self.metadata)
+                slot_ids = self.slots.ids[:self.slots.count].copy()
+                total = self.size()
+                manifest = {'tier': self.tier_name, 'metric': self.metric, 'vectors': total, 'next_id': self.next_id}
+                base = self.index
+                captured_delta = self.delta.ntotal if self.delta is not None else 0
+                serialized = faiss.serialize_index(self.index) if self.delta is None else None
+                # From here on new vectors land in the next generation's WAL
+                if self._wal_unsynced:
+                    self._sync_wal(force=True)
+                self._wal.close()
+                self._wal = open(self._wal_path(generation), 'ab')
+                self.dirty = False
+
+            try:
+                if serialized is None:
+                    # Read-only mapped index: merge it with the delta into a full copy
+                    serialized = faiss.serialize_index(self._materialize(captured_delta))
+                tmp = self.persist_dir / f'.snapshot-{generation:06d}.tmp'
+                shutil.rmtree(tmp, ignore_errors=True)
+                tmp.mkdir()
+                with open(tmp / 'index.faiss', 'wb') as f:
+                    f.write(serialized.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(tmp / 'slots.npy', 'wb') as f:
+                    np.save(f, slot_ids)
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(tmp / 'metadata.json', 'w') as f:
+                    json.dump(metadata, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                (tmp / 'manifest.json').write_text(json.dumps(manifest))
+                os.replace(tmp, self._snapshot_path(generation))
+                if self.raw is not None:
+                    self.raw.sync()
+
+                current_tmp = self.persist_dir / 'CURRENT.tmp'
+                current_tmp.write_text(str(generation))
+                os.replace(current_tmp, self.persist_dir / 'CURRENT')
+            except Exception:
+                with self._lock:
+                    self.dirty = True
+                raise
+
+            previous = self.generation
+            with self._lock:
+                self.generation = generation
+                if self.delta is not None and self.index is base:
+                    # Map the merged snapshot; the delta keeps only vectors added since the capture
+                    newer = self.delta.ntotal - captured_delta
+                    newer_vectors = self.delta.reconstruct_n(captured_delta, newer) if newer else None
+                    self.index, self.delta = self._read_index(self._snapshot_path(generation) / 'index.faiss')
+                    if newer_vectors is not None:
+                        self.delta.add(newer_vectors)
+            shutil.rmtree(self._snapshot_path(previous), ignore_errors=True)
+            self._wal_path(previous).unlink(missing_ok=True)
+            log.info('vector_snapshot_written', generation=generation, vectors=total)
+            return True
+
+    def close(self):
+        """Final snapshot (if anything changed) and release the WAL"""
+        if self.persist_dir is not None:
+            self.snapshot()
+        with self._lock:
+            if self._wal is not None:
+                if self._wal_unsynced:
+                    self._sync_wal(force=True)
+                self._wal.close()
+                self._wal = None
+            if self.raw is not None:
+                self.raw.close()
+                self.raw = None
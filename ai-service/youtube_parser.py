@@ -0,0 +1,252 @@
+# YouTube page parsing - walks the ytInitialData / ytInitialPlayerResponse JSON instead of regex-scanning the HTML
+import html
+import json
+import json.scanner
+import re
+from itertools import repeat
+
+try:
+    import orjson
+except ImportError:  # stdlib decoder - same results, slower full decodes
+    orjson = None
+
+# Renderers that describe one video: search results, watch-page sidebar, channel grids
+VIDEO_RENDERERS = frozenset(('videoRenderer', 'compactVideoRenderer', 'gridVideoRenderer'))
+# Containers on the way from the top of ytInitialData to the result lists - everything else is skipped
+RESULT_CONTAINERS = frozenset((
+    'contents', 'content', 'items', 'results',
+    'twoColumnSearchResultsRenderer', 'primaryContents', 'secondaryContents', 'sectionListRenderer',
+    'itemSectionRenderer', 'shelfRenderer', 'verticalListRenderer', 'horizontalListRenderer',
+    'twoColumnWatchNextResults', 'secondaryResults', 'richGridRenderer', 'richItemRenderer',
+    'richSectionRenderer', 'gridRenderer',
+))
+_scan = json.scanner.make_scanner(json.JSONDecoder())
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_VIDEO_ID = re.compile(r'"videoId":"([a-zA-Z0-9_-]{11})"')
+_RUNS_TITLE = re.compile(r'"title":\{"runs":\[\{"text":"([^"]+)"\}')
+_TITLE_PATTERNS = (
+    re.compile(r'<title>([^<]+)</title>'),
+    re.compile(r'"title":"([^"]+)"'),
+    re.compile(r'<meta name="title" content="([^"]+)"'),
+)
+
+
+def _blob_start(page, name):
+    """Index of the '{' opening `var name = {` / `window["name"] = {`, or -1"""
+    i = page.find(name)
+    while i != -1:
+        j = i + len(name)
+        if page.startswith('"]', j):
+            j += 2
+        while page.startswith(' ', j):
+            j += 1
+        if page.startswith('=', j):
+            j += 1
+            while page.startswith(' ', j):
+                j += 1
+            if page.startswith('{', j):
+                return j
+        i = page.find(name, j)
+    return -1
+
+
+def initial_data(page, name='ytInitialData'):
+    """The decoded `name` object of a YouTube page (ytInitialData, ytInitialPlayerResponse), or None"""
+    start = _blob_start(page, name)
+    if start == -1:
+        return None
+    if orjson is not None:
+        # Cut at the last '}' of the inline script and decode in one go; script code after the
+        # object that contains braces spoils the cut, and the stdlib decoder below handles that
+        script_end = page.find('</script>', start)
+        end = page.rfind('}', start, script_end if script_end != -1 else len(page))
+        try:
+            return orjson.loads(page[start:end + 1])
+        except orjson.JSONDecodeError:
+            pass
+    try:
+        return json.JSONDecoder().raw_decode(page, start)[0]
+    except ValueError:
+        return None
+
+
+def lazy_values(page, start, wanted, descend=frozenset()):
+    """
+    Values of the `wanted` keys in the JSON object at page[start], decoded
+    straight from the page text in document order
+    Only objects and arrays under `descend` keys are walked into; any other
+    value is stepped over by the C scanner, and nothing past the last value
+    the caller takes is read at all. Stops quietly at malformed JSON.
+    """
+    ws = _WHITESPACE.match
+    stack, i = ['{'], start + 1
+    try:
+        while stack:
+            i = ws(page, i).end()
+            c = page[i]
+            if c == '}' or c == ']':
+                stack.pop()
+                i = ws(page, i + 1).end()
+                if page.startswith(',', i):
+                    i += 1
+                continue
+            if stack[-1] == '{':
+                key, i = _scan(page, i)
+                i = ws(page, ws(page, i).end() + 1).end()  # past ':'
+                c = page[i]
+                if key in wanted:
+                    value, i = _scan(page, i)
+                    yield value
+                elif key in descend and (c == '{' or c == '['):
+                    stack.append(c)
+                    i += 1
+                    continue
+                else:
+                    _, i = _scan(page, i)
+            elif c == '{' or c == '[':
+                stack.append(c)
+                i += 1
+                continue
+            else:
+                _, i = _scan(page, i)
+            i = ws(page, i).end()
+            if page.startswith(',', i):
+                i += 1
+    except (StopIteration, IndexError):
+        return
+
+
+def iter_video_renderers(data):
+    """
+    Video renderer dicts in document order
+    A generator over an explicit stack, so stopping after the first N
+    results leaves the rest of the tree unvisited
+    """
+    stack = [iter(((None, data),))]
+    while stack:
+        for key, value in stack[-1]:
+            if isinstance(value, dict):
+                if key in VIDEO_RENDERERS:
+                    yield value
+                else:
+                    stack.append(iter(value.items()))
+                    break
+            elif isinstance(value, list):
+                stack.append(zip(repeat(None), value))
+                break
+        else:
+            stack.pop()
+
+
+def text(value):
+    """Plain text of a YouTube text object: {"simpleText": ...} or {"runs": [{"text": ...}, ...]}"""
+    if not isinstance(value, dict):
+        return None
+    if 'simpleText' in value:
+        return value['simpleText']
+    runs = value.get('runs')
+    return ''.join(run.get('text', '') for run in runs) if runs else None
+
+
+def format_duration(seconds):
+    """1240 -> '20:40', 3723 -> '1:02:03'"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+
+
+def video_from_renderer(renderer):
+    """{'videoId', 'title', 'duration', 'channel'} from one video renderer, None without an ID"""
+    video_id = renderer.get('videoId')
+    if not video_id:
+        return None
+    channel = renderer.get('ownerText') or renderer.get('longBylineText') or renderer.get('shortBylineText')
+    return {
+        'videoId': video_id,
+        'title': text(renderer.get('title')),
+        'duration': text(renderer.get('lengthText')),
+        'channel': text(channel),
+    }
+
+
+def _first_videos(renderers, limit):
+    videos, seen = [], set()
+    for renderer in renderers:
+        video = video_from_renderer(renderer) if isinstance(renderer, dict) else None
+        if video is None or video['videoId'] in seen:
+            continue
+        seen.add(video['videoId'])
+        videos.append(video)
+        if len(videos) >= limit:
+            break
+    return videos
+
+
+def search_videos(page, limit):
+    """
+    The first `limit` distinct videos of a results page
+    Decodes only the result containers up to the last video needed; a
+    layout with results elsewhere gets a full decode and walk, and a page
+    without ytInitialData the old regex scan
+    """
+    start = _blob_start(page, 'ytInitialData')
+    if start == -1:
+        return regex_search_videos(page, limit)
+    videos = _first_videos(lazy_values(page, start, VIDEO_RENDERERS, RESULT_CONTAINERS), limit)
+    if len(videos) < limit:
+        data = initial_data(page)
+        if data is not None:
+            videos = max(videos, _first_videos(iter_video_renderers(data), limit), key=len)
+    return videos
+
+
+def regex_search_videos(page, limit):
+    """
+    The previous scan: every videoId and every runs title in the page, paired by position
+    Renderers repeat their videoId and not every videoId has a runs title, so pairs drift
+    """
+    video_ids = _VIDEO_ID.findall(page)
+    titles = _RUNS_TITLE.findall(page)
+    videos, seen = [], set()
+    for i, video_id in enumerate(video_ids[:30]):
+        if video_id not in seen and len(videos) < limit:
+            seen.add(video_id)
+            videos.append({'videoId': video_id, 'title': titles[i] if i < len(titles) else 'Video',
+                           'duration': None, 'channel': None})
+    return videos
+
+
+def video_details(page):
+    """{'videoId', 'title', 'duration', 'channel'} of a watch page from ytInitialPlayerResponse, or None"""
+    # videoDetails comes after the stream formats, so there is nothing to gain from lazy_values here
+    player = initial_data(page, 'ytInitialPlayerResponse')
+    details = player.get('videoDetails') if isinstance(player, dict) else None
+    if not details or not details.get('title'):
+        return None
+    length = details.get('lengthSeconds')
+    return {
+        'videoId': details.get('videoId'),
+        'title': details['title'],
+        'duration': format_duration(length) if str(length or '').isdigit() else None,
+        'channel': details.get('author'),
+    }
+
+
+def video_title(page):
+    """Title of a watch page: videoDetails when the player response is there, else the page's title tags"""
+    details = video_details(page)
+    if details is not None:
+        return details['title']
+    return regex_video_title(page)
+
+
+def regex_video_title(page):
+    """<title>, then any "title" string, then <meta name="title"> - the first longer than 5 characters"""
+    for pattern in _TITLE_PATTERNS:
+        match = pattern.search(page)
+        if match:
+            title = html.unescape(match.group(1)).replace(' - YouTube', '').strip()
+            if title and len(title) > 5:
+                return title
+    return None